@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Alt3r Bot
+Drives the real handler functions (browse, search, likes, menu) with
+in-process Telegram stand-ins against a database seeded by
+generate_dataset at several sizes, and reports latency percentiles, SQL
+statements per call and peak Python memory. Results can be saved as a
+baseline; later runs fail (exit 1) when a scenario regresses past it.
+
+Usage:
+    python benchmark.py --sizes 1000,10000 --save-baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000,10000 --baseline benchmark_baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# main.py refuses to import without a token; the benchmark never talks to Telegram
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:benchmark')
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_ITERATIONS = 30
+DEFAULT_TOLERANCE = 0.25  # allowed slowdown over baseline before failing
+DEFAULT_WARMUP = 2  # untimed calls per scenario (lazy imports, caches, proximity table)
+MUTATING_SCENARIOS = {'handle_like_profile'}  # write to the seeded data; re-seed after them
+
+
+class FakeMessage:
+    """Message stand-in: reply_*/edit_*/delete record the call and return a new FakeMessage"""
+    _counter = 0
+
+    def __init__(self, chat_id: int, bot: 'FakeBot'):
+        FakeMessage._counter += 1
+        self.message_id = FakeMessage._counter
+        self.chat_id = chat_id
+        self.chat = SimpleNamespace(id=chat_id)
+        self.from_user = SimpleNamespace(id=chat_id)
+        self.text = ''
+        self.caption = None
+        self.photo = []
+        self.video = None
+        self._bot = bot
+
+    def __getattr__(self, name: str):
+        if name.startswith(('reply_', 'edit_', 'delete', 'pin', 'copy', 'forward')):
+            return self._bot.method(name, self.chat_id)
+        raise AttributeError(name)
+
+
+class FakeBot:
+    """Bot stand-in: every API method succeeds instantly and is counted"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.id = 0
+        self.username = 'benchmark_bot'
+
+    def method(self, name: str, chat_id: Optional[int] = None):
+        async def call(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return FakeMessage(kwargs.get('chat_id', chat_id) or 0, self)
+        return call
+
+    def __getattr__(self, name: str):
+        if name.startswith(('send_', 'edit_', 'delete_', 'answer_', 'get_', 'set_', 'copy_', 'forward_')):
+            return self.method(name)
+        raise AttributeError(name)
+
+
+class FakeJobQueue:
+    """Follow-ups are scheduled but never run during a benchmark"""
+
+    def run_once(self, *args, **kwargs):
+        return None
+
+    def get_jobs_by_name(self, name):
+        return ()
+
+
+class FakeQuery:
+    def __init__(self, user_id: int, bot: FakeBot, data: str = ''):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.data = data
+        self.message = FakeMessage(user_id, bot)
+        self._bot = bot
+
+    def __getattr__(self, name: str):
+        if name.startswith(('answer', 'edit_', 'delete_')):
+            return self._bot.method(name, self.from_user.id)
+        raise AttributeError(name)
+
+
+def make_context(bot: FakeBot):
+    application = SimpleNamespace(bot=bot, job_queue=FakeJobQueue(), update_processor=None)
+    return SimpleNamespace(bot=bot, job_queue=application.job_queue, application=application,
+                           user_data={}, chat_data={}, bot_data={})
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+def build_scenarios(main) -> Dict[str, Callable[[Any, Any, int, int], Awaitable[Any]]]:
+    """Scenario name -> coroutine(query, context, user_id, other_user_id)"""
+    async def get_main_menu(query, context, user_id, other_id):
+        return main.get_main_menu(user_id)
+
+    return {
+        'start_browsing_profiles': lambda q, c, u, o: main.start_browsing_profiles(q, c, u),
+        'search_by_traits': lambda q, c, u, o: main.search_by_traits(q, c, u),
+        'compatibility_search': lambda q, c, u, o: main.compatibility_search(q, c, u),
+        'show_recommendations': lambda q, c, u, o: main.show_recommendations(q, c, u),
+        'handle_like_profile': lambda q, c, u, o: main.handle_like_profile(q, c, u, o),
+        'show_my_likes_direct': lambda q, c, u, o: main.show_my_likes_direct(q, c, u),
+        'get_main_menu': get_main_menu,
+    }
+
+
+async def run_scenario(name: str, scenario, user_ids: List[int], iterations: int,
+                       rng: random.Random, warmup: int = DEFAULT_WARMUP) -> Dict[str, Any]:
+    from query_tracker import query_scope
+
+    bot = FakeBot()
+    latencies, queries, errors = [], [], 0
+
+    async def once(user_id: int):
+        query = FakeQuery(user_id, bot)
+        other = rng.choice(user_ids)
+        await scenario(query, make_context(bot), user_id, other)
+
+    # First calls pay one-off costs (NumPy import, table builds) that would skew p95
+    for _ in range(warmup):
+        try:
+            await once(rng.choice(user_ids))
+        except Exception:
+            pass
+
+    for _ in range(iterations):
+        user_id = rng.choice(user_ids)
+        with query_scope(report=False) as scope:
+            started = time.perf_counter()
+            try:
+                await once(user_id)
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).debug(f"{name} failed for {user_id}: {e}")
+            latencies.append(time.perf_counter() - started)
+        queries.append(scope.count)
+
+    # Peak Python allocation of one call, measured separately so tracing does not skew timings
+    tracemalloc.start()
+    try:
+        await once(rng.choice(user_ids))
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'queries_p50': percentile(queries, 0.5),
+        'queries_max': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+        'errors': errors,
+        'api_calls': sum(bot.calls.values()),
+    }
+
+
+def seed(size: int, max_size: int, seed_value: int) -> List[int]:
+    """Replace the synthetic id range with `size` generated profiles; returns their ids"""
+    import generate_dataset
+    from sqlalchemy import delete
+    from models import User, engine
+
+    with engine.begin() as conn:
+        conn.execute(delete(User.__table__).where(User.user_id.between(
+            generate_dataset.DEFAULT_ID_START, generate_dataset.DEFAULT_ID_START + max_size - 1)))
+    rng = random.Random(seed_value)
+    genders, interests = generate_dataset.assign_genders(rng, size)
+    graph = generate_dataset.build_like_graph(rng, genders, interests, 12.0, 0.3)
+    rows = generate_dataset.generate_rows(rng, size, generate_dataset.DEFAULT_ID_START, genders,
+                                          interests, graph, generate_dataset.datetime.utcnow())
+    generate_dataset.load(rows, 5000, 'auto', size)
+    return list(range(generate_dataset.DEFAULT_ID_START, generate_dataset.DEFAULT_ID_START + size))
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline` (same size/scenario keys)"""
+    failures = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if current[metric] > base[metric] * (1 + tolerance) and current[metric] - base[metric] > 1.0:
+                failures.append(f"{key}: {metric} {current[metric]} > baseline {base[metric]}")
+        if current['queries_max'] > base['queries_max']:
+            failures.append(f"{key}: queries_max {current['queries_max']} > baseline {base['queries_max']}")
+        if current['errors'] > base['errors']:
+            failures.append(f"{key}: errors {current['errors']} > baseline {base['errors']}")
+    return failures
+
+
+async def run(args) -> Dict[str, Dict]:
+    import main
+    from models import engine
+    from metrics import instrument_engine
+    from migrations import upgrade as upgrade_schema
+    from database_manager import db_manager
+    from message_dispatcher import message_dispatcher
+
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    upgrade_schema(engine)
+    instrument_engine(engine)
+    # Same one-off loading the bot does in the background after startup
+    main.warm_up_subsystems()
+    scenarios = build_scenarios(main)
+    if args.only:
+        scenarios = {k: v for k, v in scenarios.items() if k in args.only.split(',')}
+
+    await message_dispatcher.start()
+    results = {}
+    try:
+        def prepare(size: int) -> List[int]:
+            user_ids = seed(size, max(args.sizes), args.seed)
+            main.geo_index.load(db_manager.get_user_locations())
+            main.normalize_city.cache_clear()
+            return user_ids
+
+        for size in args.sizes:
+            print(f"\n🌱 Seeding {size} profiles...")
+            user_ids = prepare(size)
+
+            print(f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'queries':>9}{'peak KB':>10}{'errors':>8}")
+            for name, scenario in scenarios.items():
+                rng = random.Random(f"{args.seed}:{size}:{name}")
+                result = await run_scenario(name, scenario, user_ids, args.iterations, rng, args.warmup)
+                results[f"{size}/{name}"] = result
+                print(f"{name:<26}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['max_ms']:>10}"
+                      f"{result['queries_max']:>9}{result['peak_kb']:>10}{result['errors']:>8}")
+                if name in MUTATING_SCENARIOS:
+                    # Later scenarios (and repeat runs) must see the same dataset
+                    user_ids = prepare(size)
+    finally:
+        await message_dispatcher.stop(timeout=1)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Alt3r handlers against a seeded database")
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')], default=list(DEFAULT_SIZES),
+                        help="comma-separated dataset sizes (default 1000,10000)")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help="untimed calls per scenario")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help="comma-separated scenario names")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="fail if results regress past this baseline JSON")
+    parser.add_argument('--save-baseline', help="write results as the new baseline JSON")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed latency slowdown over baseline (default 0.25)")
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"💾 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.tolerance)
+        if failures:
+            print("\n❌ Regressions against baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
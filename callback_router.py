@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Callback query router for Alt3r Bot
+Maps callback_data to handlers with an exact-match dict plus a prefix trie
+for parameterized routes (like_<id>, report_reason_<reason>_<id>), parses
+typed route arguments and records per-route latencies in the metrics registry.
+"""
+
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import CALLBACK_LATENCY, CALLBACK_ERRORS
+from query_tracker import set_route
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class CallbackArgumentError(ValueError):
+    """Raised when a parameterized callback carries malformed arguments"""
+
+
+@dataclass
+class Route:
+    name: str
+    handler: Handler
+    arg_types: Tuple[type, ...] = ()
+    pass_update: bool = False
+
+    def parse(self, rest: str) -> List[Any]:
+        """Split the text after the prefix into typed arguments.
+
+        The last argument is split off from the right, so every argument but
+        the first must be free of underscores (ids, amounts).
+        """
+        if not self.arg_types:
+            return []
+        parts = rest.rsplit('_', len(self.arg_types) - 1) if len(self.arg_types) > 1 else [rest]
+        if len(parts) != len(self.arg_types) or not all(parts):
+            raise CallbackArgumentError(f"expected {len(self.arg_types)} arguments, got {rest!r}")
+        try:
+            return [arg_type(part) for arg_type, part in zip(self.arg_types, parts)]
+        except ValueError as e:
+            raise CallbackArgumentError(f"bad argument in {rest!r}: {e}") from e
+
+
+class _TrieNode:
+    __slots__ = ('children', 'route')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.route: Optional[Route] = None
+
+
+class CallbackRouter:
+    """Exact-match and longest-prefix dispatch of callback_data"""
+
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._root = _TrieNode()
+
+    def add_exact(self, data: str, handler: Handler, pass_update: bool = False):
+        """Route callback_data equal to `data` to `handler(query, context, user_id)`"""
+        self._exact[data] = Route(data, handler, pass_update=pass_update)
+
+    def add_prefix(self, prefix: str, handler: Handler, *arg_types: type, pass_update: bool = False):
+        """Route callback_data starting with `prefix` to `handler(query, context, user_id, *args)`.
+
+        The remainder is parsed into `arg_types`; with no types the handler
+        gets the raw remainder as a single string.
+        """
+        node = self._root
+        for ch in prefix:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.route = Route(f"{prefix}*", handler, arg_types or (str,), pass_update)
+
+    def exact(self, data: str, pass_update: bool = False):
+        """Decorator form of add_exact"""
+        def decorator(handler: Handler) -> Handler:
+            self.add_exact(data, handler, pass_update)
+            return handler
+        return decorator
+
+    def prefix(self, prefix: str, *arg_types: type, pass_update: bool = False):
+        """Decorator form of add_prefix"""
+        def decorator(handler: Handler) -> Handler:
+            self.add_prefix(prefix, handler, *arg_types, pass_update=pass_update)
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, List[Any]]]:
+        """Find the route for `data` (exact first, then longest prefix) and parse its arguments"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, []
+
+        best, best_end = None, 0
+        node = self._root
+        for i, ch in enumerate(data):
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.route is not None:
+                best, best_end = node.route, i + 1
+        if best is None:
+            return None
+        return best, best.parse(data[best_end:])
+
+    async def dispatch(self, update, context, user_id: int, data: str) -> Tuple[bool, Any]:
+        """Run the handler for `data`; returns (matched, handler result)"""
+        resolved = self.resolve(data)
+        if resolved is None:
+            return False, None
+        route, args = resolved
+
+        first = update if route.pass_update else update.callback_query
+        set_route(route.name)
+        started = time.perf_counter()
+        try:
+            return True, await route.handler(first, context, user_id, *args)
+        except Exception:
+            CALLBACK_ERRORS.inc(route.name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            CALLBACK_LATENCY.observe(route.name, value=elapsed)
+            logger.debug(f"Callback {route.name} for user {user_id} took {elapsed * 1000:.1f}ms")
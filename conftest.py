@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+
+# test_overlap.py is a standalone script run against a live bot, not a pytest module
+collect_ignore = ["test_overlap.py"]
+
+
+class FakeClock:
+    """Stands in for a module's time.monotonic/perf_counter (and optionally asyncio.sleep).
+
+    Sleeps return at once and advance the clock, so waits can be checked exactly;
+    the event loop itself keeps the real clock.
+    """
+
+    def __init__(self, monkeypatch):
+        self._monkeypatch = monkeypatch
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def install(self, module, sleep: bool = False) -> 'FakeClock':
+        """Point `module.time` (and with sleep=True `module.asyncio.sleep`) at this clock"""
+        self._monkeypatch.setattr(module, 'time', SimpleNamespace(monotonic=self, perf_counter=self))
+        if sleep:
+            self._monkeypatch.setattr(module, 'asyncio', SimpleNamespace(sleep=self.sleep))
+        return self
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    return FakeClock(monkeypatch)
@@ -7,7 +7,7 @@ import os
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, JSON
+from sqlalchemy import create_engine, Column, BigInteger, Integer, String, Text, Boolean, DateTime, JSON
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 # Database setup
@@ -28,7 +28,7 @@ class User(Base):
     
     # Primary identifiers
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, unique=True, nullable=False, index=True)
+    user_id = Column(BigInteger, unique=True, nullable=False, index=True)
     
     # User preferences
     lang = Column(String(5), default='en')
@@ -64,13 +64,12 @@ class Feedback(Base):
     __tablename__ = 'feedback'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False, index=True)
     feedback_type = Column(String(50))  # 'bug', 'feature', 'general', etc.
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-# Create all tables
-Base.metadata.create_all(engine)
+# Tables are created and upgraded by migrations.py, never at import
 
 # ===== DATABASE OPERATIONS =====
 
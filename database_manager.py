@@ -7,18 +7,29 @@ Handles PostgreSQL operations and data migration from TinyDB
 import json
 import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from models import User, Feedback, AISession, engine, SessionLocal, create_tables
+from sqlalchemy import String, and_, or_, update, bindparam, cast
+from models import User, Feedback, AISession, engine, SessionLocal
+from geo_index import geo_index
 
 logger = logging.getLogger(__name__)
 
+_DATETIME_COLUMNS = ('created_at', 'updated_at', 'last_active')
+
+
+def _coerce_datetimes(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn ISO strings from db_operations dicts back into datetimes (SQLite rejects strings)"""
+    for key in _DATETIME_COLUMNS:
+        value = user_data.get(key)
+        if isinstance(value, str):
+            user_data[key] = datetime.fromisoformat(value)
+    return user_data
+
+
 class DatabaseManager:
-    def __init__(self):
-        # Create tables if they don't exist
-        create_tables()
-        
+    """User/feedback queries; the schema itself is managed by migrations.py"""
+    
     def get_session(self) -> Session:
         """Get database session with optimized settings"""
         session = SessionLocal()
@@ -47,6 +58,7 @@ class DatabaseManager:
     
     def create_or_update_user(self, user_data: Dict[str, Any]) -> User:
         """Create new user or update existing"""
+        user_data = _coerce_datetimes(dict(user_data))
         session = self.get_session()
         try:
             user = session.query(User).filter(User.user_id == user_data['user_id']).first()
@@ -54,9 +66,9 @@ class DatabaseManager:
             if user:
                 # Update existing user
                 for key, value in user_data.items():
-                    if hasattr(user, key):
+                    if hasattr(user, key) and key != 'updated_at':
                         setattr(user, key, value)
-                # updated_at will be handled by SQLAlchemy onupdate
+                # updated_at is left to SQLAlchemy onupdate (incremental backups rely on it)
             else:
                 # Create new user
                 user = User(**user_data)
@@ -64,6 +76,9 @@ class DatabaseManager:
             
             session.commit()
             session.refresh(user)
+            # Keep the in-memory spatial index in sync with stored coordinates
+            if geo_index.loaded:
+                geo_index.upsert(user.user_id, user.latitude, user.longitude)
             return user
         finally:
             session.close()
@@ -203,6 +218,134 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_users_by_ids(self, user_ids: List[int], chunk_size: int = 1000) -> List[User]:
+        """Get users by a list of Telegram user IDs"""
+        session = self.get_session()
+        try:
+            users = []
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                users.extend(session.query(User).filter(User.user_id.in_(chunk)).all())
+            return users
+        finally:
+            session.close()
+    
+    def get_unlocated_users_by_city_slug(self, city_slug: str, limit: int = 1000) -> List[User]:
+        """Get users in a city who have no coordinates (the geo index cannot find them)"""
+        session = self.get_session()
+        try:
+            return (session.query(User)
+                    .filter(User.city_slug == city_slug,
+                            or_(User.latitude.is_(None), User.longitude.is_(None)))
+                    .limit(limit)
+                    .all())
+        finally:
+            session.close()
+
+    def get_user_locations(self) -> List[tuple]:
+        """Get (user_id, latitude, longitude) for every user with coordinates"""
+        session = self.get_session()
+        try:
+            return [
+                tuple(row) for row in session.query(User.user_id, User.latitude, User.longitude)
+                .filter(User.latitude.isnot(None), User.longitude.isnot(None))
+                .all()
+            ]
+        finally:
+            session.close()
+
+    def pop_unnotified_likes(self, user_id: int, liker_ids: Optional[List[int]] = None) -> List[int]:
+        """Atomically remove and return a user's unnotified likes (all, or only `liker_ids`)"""
+        session = self.get_session()
+        try:
+            user = session.query(User).filter(User.user_id == user_id).with_for_update().first()
+            if not user or not user.unnotified_likes:
+                return []
+            pending = list(user.unnotified_likes)
+            if liker_ids is None:
+                popped, remaining = pending, []
+            else:
+                wanted = set(liker_ids)
+                popped = [uid for uid in pending if uid in wanted]
+                remaining = [uid for uid in pending if uid not in wanted]
+            if popped:
+                user.unnotified_likes = remaining
+                session.commit()
+            return popped
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error popping unnotified likes for {user_id}: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_users_with_unnotified_likes(self) -> List[int]:
+        """Get ids of users with likes still waiting for a digest"""
+        session = self.get_session()
+        try:
+            rows = (session.query(User.user_id, User.unnotified_likes)
+                    .filter(User.unnotified_likes.isnot(None),
+                            cast(User.unnotified_likes, String).notin_(['[]', 'null']))
+                    .all())
+            return [user_id for user_id, pending in rows if pending]
+        finally:
+            session.close()
+
+    def get_users_missing_city_slug(self, after_user_id: int = 0, limit: int = 500) -> List[tuple]:
+        """Get a keyset page of (user_id, city, latitude, longitude) for users with a city but no city_slug"""
+        session = self.get_session()
+        try:
+            return [
+                tuple(row) for row in session.query(User.user_id, User.city, User.latitude, User.longitude)
+                .filter(User.city_slug.is_(None), User.city.isnot(None), User.user_id > after_user_id)
+                .order_by(User.user_id)
+                .limit(limit)
+                .all()
+            ]
+        finally:
+            session.close()
+
+    def bulk_update_city_slugs(self, rows: List[Dict[str, Any]]) -> List[Tuple[int, float, float]]:
+        """Set city_slug (and coordinates when present) for many users in one transaction.
+
+        Each row needs 'user_id' and 'city_slug'; 'latitude'/'longitude' are optional.
+        Returns the (user_id, latitude, longitude) rows whose coordinates were written.
+        The geo index is left to the caller, since this usually runs in a worker
+        thread and GeoIndex may only be touched from the event loop.
+        """
+        if not rows:
+            return []
+        users = User.__table__
+        session = self.get_session()
+        try:
+            slug_only = [{'b_user_id': r['user_id'], 'b_city_slug': r['city_slug']}
+                         for r in rows if r.get('latitude') is None or r.get('longitude') is None]
+            with_coords = [{'b_user_id': r['user_id'], 'b_city_slug': r['city_slug'],
+                            'b_latitude': r['latitude'], 'b_longitude': r['longitude']}
+                           for r in rows if r.get('latitude') is not None and r.get('longitude') is not None]
+            if slug_only:
+                session.execute(
+                    update(users).where(users.c.user_id == bindparam('b_user_id'))
+                    .values(city_slug=bindparam('b_city_slug')),
+                    slug_only
+                )
+            if with_coords:
+                session.execute(
+                    update(users).where(users.c.user_id == bindparam('b_user_id'))
+                    .values(city_slug=bindparam('b_city_slug'),
+                            latitude=bindparam('b_latitude'),
+                            longitude=bindparam('b_longitude')),
+                    with_coords
+                )
+            session.commit()
+            return [(r['b_user_id'], r['b_latitude'], r['b_longitude']) for r in with_coords]
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error bulk updating city slugs: {e}")
+            raise
+        finally:
+            session.close()
+
     def delete_user(self, user_id: int) -> bool:
         """Delete user from database"""
         session = self.get_session()
@@ -211,6 +354,7 @@ class DatabaseManager:
             if user:
                 session.delete(user)
                 session.commit()
+                geo_index.remove(user_id)
                 return True
             return False
         except Exception as e:
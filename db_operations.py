@@ -93,6 +93,24 @@ class DBOperations:
             logger.error(f"Error getting all users: {e}")
             return []
     
+    def get_users_by_ids(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get several users by ID - PostgreSQL method"""
+        try:
+            users = db_manager.get_users_by_ids(list(user_ids))
+            return [self._model_to_dict(user) for user in users]
+        except Exception as e:
+            logger.error(f"Error getting users by ids: {e}")
+            return []
+    
+    def get_unlocated_users_by_city_slug(self, city_slug: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get users in a city who have no GPS coordinates - PostgreSQL method"""
+        try:
+            users = db_manager.get_unlocated_users_by_city_slug(city_slug, limit)
+            return [self._model_to_dict(user) for user in users]
+        except Exception as e:
+            logger.error(f"Error getting unlocated users for {city_slug}: {e}")
+            return []
+    
     def create_or_update_user(self, user_id_or_data, data=None) -> bool:
         """Create or update user - PostgreSQL method"""
         try:
@@ -152,6 +170,7 @@ class DBOperations:
             'gender': user.gender,
             'interest': user.interest,
             'city': user.city,
+            'city_slug': user.city_slug,
             'bio': user.bio,
             'photos': user.photos if user.photos is not None else [],
             'photo_id': user.photo_id,
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Scheduled follow-up actions for Alt3r Bot
+Delayed UI steps (next card after a like, menu refresh after a language
+change) run as JobQueue jobs instead of sleeping inside the handler, so
+the handler returns immediately. A user's next update supersedes any
+follow-up still pending for them.
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# user_id -> token of that user's pending follow-up
+_pending: Dict[int, object] = {}
+
+
+def _job_name(user_id: int) -> str:
+    return f"followup:{user_id}"
+
+
+def schedule_followup(context: ContextTypes.DEFAULT_TYPE, user_id: int, delay: float,
+                      callback: Callable[..., Awaitable[Any]], *args, **kwargs):
+    """Run `callback(*args, **kwargs)` after `delay` seconds unless the user acts first.
+
+    Only one follow-up is kept per user; scheduling a new one replaces the old.
+    """
+    cancel_followups(context, user_id)
+    token = object()
+    _pending[user_id] = token
+    context.job_queue.run_once(
+        _run_followup, delay,
+        data=(token, callback, args, kwargs),
+        name=_job_name(user_id),
+        user_id=user_id,
+    )
+
+
+def cancel_followups(context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    """Drop the user's pending follow-up, including one already waiting to run"""
+    if _pending.pop(user_id, None) is None:
+        return
+    for job in context.job_queue.get_jobs_by_name(_job_name(user_id)):
+        job.schedule_removal()
+
+
+async def supersede_followups(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler (group -1): any new update from a user cancels their pending follow-up"""
+    if update.effective_user is not None:
+        cancel_followups(context, update.effective_user.id)
+
+
+async def _run_followup(context: ContextTypes.DEFAULT_TYPE):
+    token, callback, args, kwargs = context.job.data
+    user_id = context.job.user_id
+
+    async def run():
+        # Re-check inside the user's slot: an update may have arrived while we waited
+        if _pending.get(user_id) is not token:
+            return
+        del _pending[user_id]
+        await callback(*args, **kwargs)
+
+    run_serialized = getattr(context.application.update_processor, 'run_serialized', None)
+    try:
+        if run_serialized is not None:
+            await run_serialized(user_id, run())
+        else:
+            await run()
+    except Exception as e:
+        logger.error(f"Follow-up {getattr(callback, '__name__', callback)} for user {user_id} failed: {e}")
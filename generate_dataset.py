@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator for Alt3r Bot
+Produces production-scale user tables (10k-1M profiles) for local
+benchmarking:
+1. Cities drawn by population from CITIES_WITH_COORDS, with jittered GPS
+2. Correlated trait/symptom distributions
+3. Power-law like graph (heavy-tailed activity and popularity, reciprocity)
+4. Realistic signup growth and last-active recency
+Rows are bulk loaded with COPY (PostgreSQL) or executemany batches.
+
+Usage: python generate_dataset.py --users 100000 [--replace] [--seed 42]
+"""
+
+import io
+import csv
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import delete, insert
+
+from models import User, engine
+from migrations import upgrade as upgrade_schema
+from populate_fake_profiles import CITIES_WITH_COORDS, FEMALE_NAMES, MALE_NAMES, BIO_TEMPLATES, generate_bio
+
+# Relative city sizes, in CITIES_WITH_COORDS order (millions of residents)
+CITY_WEIGHTS = [13.0, 5.6, 1.6, 1.5, 1.2, 1.3, 1.2, 1.1, 1.2, 1.1,
+                1.1, 1.2, 1.0, 1.0, 1.0, 1.0, 0.9, 0.8, 0.7, 0.6]
+GPS_SHARE = 0.7  # profiles that shared a location
+GPS_JITTER_DEG = 0.08  # ~9 km spread around the city centre
+
+# Trait prevalence and the symptoms each trait tends to bring
+TRAIT_WEIGHTS = {
+    "adhd": 0.45, "autism": 0.35, "anxiety": 0.40, "depression": 0.25, "bipolar": 0.06,
+    "ocd": 0.08, "ptsd": 0.08, "sensory": 0.15, "dyslexia": 0.07, "highly_sensitive": 0.20,
+    "introvert": 0.30, "empath": 0.15, "creative": 0.20,
+}
+TRAIT_SYMPTOMS = {
+    "adhd": ["hyperfocus", "executive_dysfunction", "time_blindness", "rejection_sensitive",
+             "procrastination", "hyperactivity", "impulsivity", "inattention"],
+    "autism": ["sensory_overload", "stimming", "special_interests", "routine_dependent",
+               "social_masking", "meltdowns", "shutdowns", "literal_thinking"],
+    "anxiety": ["overthinking", "catastrophizing", "perfectionism", "avoidance", "panic_attacks",
+                "social_anxiety"],
+    "depression": ["anhedonia", "brain_fog", "fatigue", "emotional_numbness", "sleep_issues"],
+    "sensory": ["hypersensitivity", "hyposensitivity", "sound_sensitivity", "light_sensitivity",
+                "texture_sensitivity"],
+}
+
+PHOTO_SHARE = 0.85
+DEFAULT_ID_START = 900_000_000  # well inside the BIGINT users.user_id range, far from real test accounts
+COLUMNS = ['user_id', 'lang', 'name', 'age', 'gender', 'interest', 'city', 'city_slug', 'bio',
+           'photos', 'photo_id', 'media_type', 'media_id', 'latitude', 'longitude',
+           'nd_traits', 'nd_symptoms', 'seeking_traits', 'likes', 'sent_likes', 'received_likes',
+           'unnotified_likes', 'declined_likes', 'ratings', 'total_rating', 'rating_count',
+           'created_at', 'updated_at', 'last_active']
+JSON_COLUMNS = {'photos', 'nd_traits', 'nd_symptoms', 'seeking_traits', 'likes', 'sent_likes',
+                'received_likes', 'unnotified_likes', 'declined_likes', 'ratings'}
+
+
+class LikeGraph:
+    """Directed like edges between user indexes, stored compactly (CSR by source and by target)"""
+
+    def __init__(self, n: int, sources: array, targets: array):
+        self.n = n
+        self.out_offsets, self.out_edges = self._csr(n, sources, targets)
+        self.in_offsets, self.in_edges = self._csr(n, targets, sources)
+
+    @staticmethod
+    def _csr(n: int, keys: array, values: array):
+        offsets = array('l', [0]) * (n + 1)
+        for k in keys:
+            offsets[k + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        cursor = array('l', offsets)
+        edges = array('l', [0]) * len(keys)
+        for k, v in zip(keys, values):
+            edges[cursor[k]] = v
+            cursor[k] += 1
+        return offsets, edges
+
+    def sent(self, i: int) -> Sequence[int]:
+        return self.out_edges[self.out_offsets[i]:self.out_offsets[i + 1]]
+
+    def received(self, i: int) -> Sequence[int]:
+        return self.in_edges[self.in_offsets[i]:self.in_offsets[i + 1]]
+
+    @property
+    def edges(self) -> int:
+        return len(self.out_edges)
+
+
+def assign_genders(rng: random.Random, n: int):
+    genders, interests = [], []
+    for _ in range(n):
+        gender = rng.choices(("female", "male", "other"), (0.48, 0.47, 0.05))[0]
+        if gender == "other" or rng.random() < 0.2:
+            interest = "both"
+        else:
+            interest = "male" if gender == "female" else "female"
+        genders.append(gender)
+        interests.append(interest)
+    return genders, interests
+
+
+def build_like_graph(rng: random.Random, genders: List[str], interests: List[str],
+                     avg_likes: float, reciprocity: float, max_likes: int = 500) -> LikeGraph:
+    """Heavy-tailed out-degree (Pareto) and popularity (Zipf) restricted to each liker's interest"""
+    n = len(genders)
+    popularity = [1.0 / (rank + 1) ** 0.8 for rank in range(n)]
+    rng.shuffle(popularity)
+
+    wanted_genders = {"female": {"female"}, "male": {"male"}, "both": {"female", "male", "other"}}
+    pools = {}
+    for interest, wanted in wanted_genders.items():
+        members = [i for i in range(n) if genders[i] in wanted]
+        pools[interest] = (members, list(itertools.accumulate(popularity[i] for i in members)))
+
+    alpha = 1.6
+    scale = avg_likes * (alpha - 1) / alpha
+    sources, targets = array('l'), array('l')
+    seen = set()  # (src, dst) pairs encoded as src * n + dst, so each like is recorded once
+
+    def add_edge(src: int, dst: int):
+        key = src * n + dst
+        if key not in seen:
+            seen.add(key)
+            sources.append(src)
+            targets.append(dst)
+
+    for i in range(n):
+        members, cum_weights = pools[interests[i]]
+        if not members:
+            continue
+        k = min(int(rng.paretovariate(alpha) * scale), max_likes, len(members) - 1)
+        if k <= 0:
+            continue
+        total = cum_weights[-1]
+        chosen = {members[bisect_left(cum_weights, rng.random() * total)] for _ in range(k)}
+        chosen.discard(i)
+        for j in chosen:
+            add_edge(i, j)
+            # A like is only returned by someone interested in the liker's gender
+            if genders[i] in wanted_genders[interests[j]] and rng.random() < reciprocity:
+                add_edge(j, i)
+    return LikeGraph(n, sources, targets)
+
+
+def pick_traits(rng: random.Random) -> List[str]:
+    traits = [t for t, p in TRAIT_WEIGHTS.items() if rng.random() < p]
+    return traits[:4] or [rng.choice(list(TRAIT_WEIGHTS))]
+
+
+def pick_symptoms(rng: random.Random, traits: List[str]) -> List[str]:
+    symptoms = []
+    for trait in traits:
+        options = TRAIT_SYMPTOMS.get(trait)
+        if options:
+            symptoms.extend(rng.sample(options, rng.randint(1, min(3, len(options)))))
+    return list(dict.fromkeys(symptoms))
+
+
+def generate_rows(rng: random.Random, n: int, id_start: int, genders: List[str], interests: List[str],
+                  graph: LikeGraph, now: datetime) -> Iterator[Dict]:
+    """One users-table row per profile"""
+    user_ids = range(id_start, id_start + n)
+    personalities = list(BIO_TEMPLATES)
+    for i in range(n):
+        gender = genders[i]
+        city, slug, lat, lon = rng.choices(CITIES_WITH_COORDS, CITY_WEIGHTS)[0]
+        if rng.random() < GPS_SHARE:
+            lat = round(lat + rng.gauss(0, GPS_JITTER_DEG), 5)
+            lon = round(lon + rng.gauss(0, GPS_JITTER_DEG / math.cos(math.radians(lat))), 5)
+        else:
+            lat = lon = None
+
+        traits = pick_traits(rng)
+        # Growing signups: recent days are more likely; activity decays from signup
+        signup_days = 365 * (1 - math.sqrt(rng.random()))
+        created_at = now - timedelta(days=signup_days)
+        if rng.random() < 0.2:
+            idle_days = rng.uniform(0, signup_days)  # churned
+        else:
+            idle_days = min(signup_days, rng.expovariate(1 / 3))
+        last_active = now - timedelta(days=idle_days)
+
+        photo = f"synthetic-photo-{id_start + i}" if rng.random() < PHOTO_SHARE else None
+        name_pool = FEMALE_NAMES if gender == "female" else MALE_NAMES if gender == "male" \
+            else FEMALE_NAMES + MALE_NAMES
+        sent = [user_ids[j] for j in graph.sent(i)]
+        received = [user_ids[j] for j in graph.received(i)]
+        sent_set = set(sent)
+        rating_count = rng.randint(0, 20)
+
+        yield {
+            'user_id': user_ids[i],
+            'lang': 'ru' if rng.random() < 0.8 else 'en',
+            'name': rng.choice(name_pool),
+            'age': max(18, min(60, int(rng.lognormvariate(math.log(27), 0.2)))),
+            'gender': gender,
+            'interest': interests[i],
+            'city': city,
+            'city_slug': slug,
+            'bio': generate_bio(rng.choice(personalities), traits),
+            'photos': [photo] if photo else [],
+            'photo_id': photo,
+            'media_type': 'photo',
+            'media_id': photo,
+            'latitude': lat,
+            'longitude': lon,
+            'nd_traits': traits,
+            'nd_symptoms': pick_symptoms(rng, traits),
+            'seeking_traits': rng.sample(list(TRAIT_WEIGHTS), rng.randint(0, 2)),
+            'likes': [],
+            'sent_likes': sent,
+            'received_likes': received,
+            # Likes that arrived since the recipient was last seen and are not matches yet
+            'unnotified_likes': [u for u in received[-3:] if u not in sent_set] if idle_days > 1 else [],
+            'declined_likes': [],
+            'ratings': [],
+            'total_rating': round(rng.uniform(3.5, 5.0), 1) if rating_count else 0.0,
+            'rating_count': rating_count,
+            'created_at': created_at,
+            'updated_at': last_active,
+            'last_active': last_active,
+        }
+
+
+def batched(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_batch(raw_conn, batch: List[Dict]):
+    """COPY one batch through psycopg2 as CSV"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([
+            json.dumps(row[c], ensure_ascii=False) if c in JSON_COLUMNS
+            else '' if row[c] is None
+            else row[c].isoformat(sep=' ') if isinstance(row[c], datetime)
+            else row[c]
+            for c in COLUMNS
+        ])
+    buf.seek(0)
+    with raw_conn.cursor() as cur:
+        cur.copy_expert(f"COPY users ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def load(rows: Iterator[Dict], batch_size: int, method: str, total: int) -> int:
+    """Bulk insert `rows`; returns the number loaded"""
+    if method == 'auto':
+        method = 'copy' if engine.dialect.name == 'postgresql' else 'executemany'
+    loaded = 0
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        raw = conn.connection.dbapi_connection if method == 'copy' else None
+        for batch in batched(rows, batch_size):
+            if raw is not None:
+                copy_batch(raw, batch)
+            else:
+                conn.execute(insert(User.__table__), batch)
+            loaded += len(batch)
+            rate = loaded / max(time.perf_counter() - started, 1e-9)
+            print(f"  {loaded}/{total} rows ({rate:,.0f} rows/s, {method})", end='\r', flush=True)
+    print()
+    return loaded
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate and bulk load synthetic Alt3r profiles")
+    parser.add_argument('--users', type=int, default=10_000, help="number of profiles (default 10000)")
+    parser.add_argument('--id-start', type=int, default=DEFAULT_ID_START, help="first synthetic user_id")
+    parser.add_argument('--avg-likes', type=float, default=12.0, help="mean likes sent per user")
+    parser.add_argument('--reciprocity', type=float, default=0.3, help="chance a like is returned")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--method', choices=('auto', 'copy', 'executemany'), default='auto')
+    parser.add_argument('--seed', type=int, default=None, help="RNG seed for a reproducible dataset")
+    parser.add_argument('--replace', action='store_true', help="delete existing rows in the synthetic id range first")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    n = args.users
+    if args.id_start + n > 2 ** 63 - 1:
+        parser.error("user_id range exceeds the 64-bit users.user_id column")
+
+    upgrade_schema()
+
+    if args.replace:
+        with engine.begin() as conn:
+            result = conn.execute(delete(User.__table__).where(
+                User.user_id.between(args.id_start, args.id_start + n - 1)))
+        print(f"🗑️  Deleted {result.rowcount} existing synthetic profiles")
+
+    started = time.perf_counter()
+    print(f"🕸️  Building like graph for {n} users...")
+    genders, interests = assign_genders(rng, n)
+    graph = build_like_graph(rng, genders, interests, args.avg_likes, args.reciprocity)
+    print(f"   {graph.edges} likes in {time.perf_counter() - started:.1f}s")
+
+    print("👥 Loading profiles...")
+    rows = generate_rows(rng, n, args.id_start, genders, interests, graph, datetime.utcnow())
+    loaded = load(rows, args.batch_size, args.method, n)
+    print(f"✅ Loaded {loaded} profiles in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
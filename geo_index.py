@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Spatial index for Alt3r Bot
+In-memory KD-tree over unit-sphere vectors for "users within R km" queries.
+
+Great-circle distance is monotonic in the straight-line (chord) distance
+between unit vectors, so a 3D KD-tree range query with a chord radius
+returns exactly the users inside a spherical cap, with no special cases
+at the poles or the antimeridian.
+
+NumPy is only needed by the batch distance and city proximity code, so it
+is imported on first use (or by warm_up() once the bot is serving) rather
+than on import, keeping it off the startup path.
+"""
+
+from __future__ import annotations
+
+import math
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Upper bounds of the location priority bands used by calculate_location_priority:
+# 0 = same neighbourhood, 1 = same city/metro, 2 = region, 3 = country, 4 = continent, 5 = farther
+PRIORITY_BANDS_KM = (5, 25, 100, 500, 2000)
+
+Vector = Tuple[float, float, float]
+
+# Band code returned by batch_distances_km when no coordinates are available
+NO_BAND = -1
+
+
+def to_unit_vector(lat: float, lon: float) -> Vector:
+    """Convert latitude/longitude in degrees to a unit vector"""
+    phi = math.radians(lat)
+    lmb = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lmb), cos_phi * math.sin(lmb), math.sin(phi))
+
+
+def chord_for_km(km: float) -> float:
+    """Chord length on the unit sphere for a great-circle distance in km"""
+    angle = min(km / EARTH_RADIUS_KM, math.pi)
+    return 2.0 * math.sin(angle / 2.0)
+
+
+def km_for_chord(chord: float) -> float:
+    """Great-circle distance in km for a chord length on the unit sphere"""
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(chord / 2.0, 1.0))
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle distance in km; infinity when any coordinate is missing"""
+    if None in (lat1, lon1, lat2, lon2):
+        return float('inf')
+
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlmb = math.radians(lon2 - lon1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_band(distance_km: float) -> int:
+    """Map a distance to its priority band (0-5)"""
+    for band, limit in enumerate(PRIORITY_BANDS_KM):
+        if distance_km <= limit:
+            return band
+    return len(PRIORITY_BANDS_KM)
+
+
+def _as_coord_array(values: Sequence[Optional[float]]) -> np.ndarray:
+    """Convert a sequence of coordinates (None allowed) to a float array with NaN for missing"""
+    import numpy as np
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def batch_distances_km(lat: Optional[float], lon: Optional[float],
+                       lats: Sequence[Optional[float]], lons: Sequence[Optional[float]],
+                       fallback_lats: Optional[Sequence[Optional[float]]] = None,
+                       fallback_lons: Optional[Sequence[Optional[float]]] = None,
+                       fallback_lat: Optional[float] = None,
+                       fallback_lon: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Distances and priority bands from one point to many, in a single NumPy pass.
+
+    Missing candidate coordinates (None/NaN) are filled from the optional
+    fallback arrays (e.g. city centroids), and a missing origin from
+    fallback_lat/fallback_lon. Distances that rely on a fallback are city
+    precision, so their band is never better than 1 (same city/metro).
+    Returns (distances_km, bands) where unresolved entries are NaN and NO_BAND.
+    """
+    import numpy as np
+
+    lats_arr = _as_coord_array(lats)
+    lons_arr = _as_coord_array(lons)
+    approximate = np.isnan(lats_arr) | np.isnan(lons_arr)
+
+    if fallback_lats is not None and fallback_lons is not None:
+        fb_lats = _as_coord_array(fallback_lats)
+        fb_lons = _as_coord_array(fallback_lons)
+        lats_arr = np.where(approximate, fb_lats, lats_arr)
+        lons_arr = np.where(approximate, fb_lons, lons_arr)
+
+    if lat is None or lon is None:
+        lat, lon = fallback_lat, fallback_lon
+        approximate = np.ones_like(approximate)
+    if lat is None or lon is None:
+        return np.full(lats_arr.shape, np.nan), np.full(lats_arr.shape, NO_BAND, dtype=np.int8)
+
+    p1 = math.radians(lat)
+    p2 = np.radians(lats_arr)
+    dphi = p2 - p1
+    dlmb = np.radians(lons_arr - lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dlmb / 2) ** 2
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    bands = np.searchsorted(np.asarray(PRIORITY_BANDS_KM, dtype=np.float64), distances, side='left').astype(np.int8)
+    bands = np.where(approximate, np.maximum(bands, 1), bands).astype(np.int8)
+    bands[np.isnan(distances)] = NO_BAND
+    return distances, bands
+
+
+class CityProximityTable:
+    """Precomputed city-to-city proximity keyed by compact slug ids.
+
+    Built once from region membership and city centroids. `band()` is an
+    O(1) lookup of the location priority between two city slugs: 1 for the
+    same city or region, otherwise the centroid distance band when both
+    centroids are known (never better than 1, city precision), 4 if not.
+    Empty slugs are never entered, so they always look up as unknown.
+    """
+
+    SAME_AREA_BAND = 1
+    DEFAULT_BAND = 4
+
+    def __init__(self, regions: Dict[str, Iterable[str]], centroids: Dict[str, Tuple[float, float]]):
+        import numpy as np
+
+        regions = {region: [slug for slug in members if slug] for region, members in regions.items()}
+        centroids = {slug: coords for slug, coords in centroids.items() if slug}
+        self.region_names = sorted(regions)
+        slugs = sorted({slug for members in regions.values() for slug in members} | set(centroids))
+        self.slug_ids: Dict[str, int] = {slug: i for i, slug in enumerate(slugs)}
+        size = len(slugs)
+
+        self.region_ids = np.full(size, -1, dtype=np.int16)
+        for region_id, region in enumerate(self.region_names):
+            for slug in regions[region]:
+                self.region_ids[self.slug_ids[slug]] = region_id
+
+        self.centroids = np.full((size, 2), np.nan)
+        for slug, (lat, lon) in centroids.items():
+            self.centroids[self.slug_ids[slug]] = (lat, lon)
+
+        self.matrix = np.full((size, size), self.DEFAULT_BAND, dtype=np.int8)
+        for i in range(size):
+            _, bands = batch_distances_km(
+                None, None, self.centroids[:, 0], self.centroids[:, 1],
+                fallback_lat=_nan_to_none(self.centroids[i, 0]),
+                fallback_lon=_nan_to_none(self.centroids[i, 1]),
+            )
+            known = bands != NO_BAND
+            self.matrix[i, known] = bands[known]
+        # Same region stays a floor: centroid distance only ranks cities across regions
+        same_region = (self.region_ids[:, None] == self.region_ids[None, :]) & (self.region_ids[:, None] >= 0)
+        self.matrix[same_region] = self.SAME_AREA_BAND
+        np.fill_diagonal(self.matrix, self.SAME_AREA_BAND)
+
+    def __len__(self) -> int:
+        return len(self.slug_ids)
+
+    def band(self, slug_a: Optional[str], slug_b: Optional[str]) -> Optional[int]:
+        """Priority band between two city slugs, or None if either is unknown"""
+        i = self.slug_ids.get(slug_a)
+        j = self.slug_ids.get(slug_b)
+        if i is None or j is None:
+            return None
+        return int(self.matrix[i, j])
+
+    def same_region(self, slug_a: Optional[str], slug_b: Optional[str]) -> bool:
+        """Whether both slugs belong to the same region"""
+        i = self.slug_ids.get(slug_a)
+        j = self.slug_ids.get(slug_b)
+        if i is None or j is None:
+            return False
+        return bool(self.region_ids[i] >= 0 and self.region_ids[i] == self.region_ids[j])
+
+    def centroid(self, slug: Optional[str]) -> Optional[Tuple[float, float]]:
+        """Centroid coordinates of a city slug, if known"""
+        i = self.slug_ids.get(slug)
+        if i is None or math.isnan(self.centroids[i, 0]):
+            return None
+        return float(self.centroids[i, 0]), float(self.centroids[i, 1])
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+def warm_up():
+    """Import NumPy ahead of the first browse; run off the event loop (asyncio.to_thread)"""
+    import numpy  # noqa: F401
+
+
+class _KDTree:
+    """Static 3D KD-tree stored as flat parallel lists"""
+
+    __slots__ = ('ids', 'vecs', 'left', 'right', 'axis', 'root')
+
+    def __init__(self, items: List[Tuple[int, Vector]]):
+        self.ids: List[int] = []
+        self.vecs: List[Vector] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.axis: List[int] = []
+        self.root = self._build(items, 0)
+
+    def _build(self, items: List[Tuple[int, Vector]], depth: int) -> int:
+        if not items:
+            return -1
+        axis = depth % 3
+        items.sort(key=lambda item: item[1][axis])
+        mid = len(items) // 2
+        node = len(self.ids)
+        self.ids.append(items[mid][0])
+        self.vecs.append(items[mid][1])
+        self.axis.append(axis)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.left[node] = self._build(items[:mid], depth + 1)
+        self.right[node] = self._build(items[mid + 1:], depth + 1)
+        return node
+
+    def query_radius(self, center: Vector, chord: float) -> Iterable[Tuple[float, int, Vector]]:
+        """Yield (squared chord, user_id, vector) for points within `chord` of center"""
+        limit = chord * chord
+        cx, cy, cz = center
+        stack = [self.root] if self.root >= 0 else []
+        while stack:
+            node = stack.pop()
+            vx, vy, vz = vec = self.vecs[node]
+            d2 = (vx - cx) ** 2 + (vy - cy) ** 2 + (vz - cz) ** 2
+            if d2 <= limit:
+                yield d2, self.ids[node], vec
+            diff = center[self.axis[node]] - vec[self.axis[node]]
+            near, far = (self.left[node], self.right[node]) if diff <= 0 else (self.right[node], self.left[node])
+            if near >= 0:
+                stack.append(near)
+            if far >= 0 and diff * diff <= limit:
+                stack.append(far)
+
+
+class GeoIndex:
+    """Mutable spatial index of user locations.
+
+    Writes go to a small pending buffer that is scanned linearly; the
+    KD-tree is rebuilt once the buffer (plus stale tree entries) grows
+    past `rebuild_threshold`, keeping both writes and queries cheap.
+    Not thread-safe: read and write it from the event loop only.
+    """
+
+    def __init__(self, rebuild_threshold: int = 256):
+        self.rebuild_threshold = rebuild_threshold
+        self.loaded = False
+        self._points: Dict[int, Vector] = {}
+        self._pending: Dict[int, Vector] = {}
+        self._tree = _KDTree([])
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._points
+
+    def load(self, rows: Iterable[Tuple[int, Optional[float], Optional[float]]]):
+        """Replace the index contents with (user_id, latitude, longitude) rows"""
+        self._points = {
+            user_id: to_unit_vector(lat, lon)
+            for user_id, lat, lon in rows
+            if lat is not None and lon is not None
+        }
+        self._rebuild()
+        self.loaded = True
+        logger.info(f"Geo index loaded with {len(self._points)} located users")
+
+    def upsert(self, user_id: int, lat: Optional[float], lon: Optional[float]):
+        """Insert or move a user; missing coordinates remove them"""
+        if lat is None or lon is None:
+            self.remove(user_id)
+            return
+        vec = to_unit_vector(lat, lon)
+        old = self._points.get(user_id)
+        if old == vec:
+            return
+        if old is not None and user_id not in self._pending:
+            self._stale += 1
+        self._points[user_id] = vec
+        self._pending[user_id] = vec
+        self._maybe_rebuild()
+
+    def remove(self, user_id: int):
+        """Drop a user from the index"""
+        if self._points.pop(user_id, None) is None:
+            return
+        if self._pending.pop(user_id, None) is None:
+            self._stale += 1
+        self._maybe_rebuild()
+
+    def within(self, lat: float, lon: float, radius_km: float,
+               exclude: Optional[Iterable[int]] = None) -> List[Tuple[float, int]]:
+        """Return (distance_km, user_id) for users within radius_km, nearest first"""
+        center = to_unit_vector(lat, lon)
+        chord = chord_for_km(radius_km)
+        excluded = set(exclude) if exclude else ()
+        results = []
+
+        for d2, user_id, vec in self._tree.query_radius(center, chord):
+            # Skip entries that moved or were removed since the last rebuild
+            if user_id in excluded or user_id in self._pending or self._points.get(user_id) != vec:
+                continue
+            results.append((km_for_chord(math.sqrt(d2)), user_id))
+
+        limit = chord * chord
+        cx, cy, cz = center
+        for user_id, (vx, vy, vz) in self._pending.items():
+            if user_id in excluded:
+                continue
+            d2 = (vx - cx) ** 2 + (vy - cy) ** 2 + (vz - cz) ** 2
+            if d2 <= limit:
+                results.append((km_for_chord(math.sqrt(d2)), user_id))
+
+        results.sort()
+        return results
+
+    def within_bands(self, lat: float, lon: float,
+                     exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float, int]]:
+        """Return (band, distance_km, user_id) for users inside the outermost priority band"""
+        return [
+            (distance_band(distance), distance, user_id)
+            for distance, user_id in self.within(lat, lon, PRIORITY_BANDS_KM[-1], exclude)
+        ]
+
+    def _maybe_rebuild(self):
+        if len(self._pending) + self._stale > self.rebuild_threshold:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._tree = _KDTree(list(self._points.items()))
+        self._pending = {}
+        self._stale = 0
+
+
+# Global instance
+geo_index = GeoIndex()
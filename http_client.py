@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for Alt3r Bot
+One application-lifetime aiohttp session for all outbound HTTP calls
+(geocoding services, TON Center API) with connection pooling,
+per-host limits, DNS caching and a unified timeout/retry policy.
+"""
+
+import os
+import time
+import asyncio
+import random
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Pool and timeout settings (overridable via environment)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10'))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60'))
+HTTP_TOTAL_TIMEOUT = float(os.getenv('HTTP_TOTAL_TIMEOUT', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+
+# Retry policy
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.3'))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+USER_AGENT = "Alt3r Dating Bot"
+
+
+class HTTPClient:
+    """Pooled aiohttp client shared by the whole application"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Create the shared session (idempotent)"""
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=HTTP_POOL_LIMIT,
+                    limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                    enable_cleanup_closed=True,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(
+                        total=HTTP_TOTAL_TIMEOUT,
+                        connect=HTTP_CONNECT_TIMEOUT,
+                    ),
+                    headers={'User-Agent': USER_AGENT},
+                    raise_for_status=False,
+                )
+                logger.info(
+                    f"HTTP client started (pool={HTTP_POOL_LIMIT}, per_host={HTTP_POOL_LIMIT_PER_HOST}, "
+                    f"dns_ttl={HTTP_DNS_CACHE_TTL}s)"
+                )
+            return self._session
+
+    async def close(self):
+        """Close the shared session and release pooled connections"""
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                logger.info("HTTP client closed")
+            self._session = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, starting it lazily if needed"""
+        if self.is_running:
+            return self._session
+        return await self.start()
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None,
+                       headers: Optional[Dict[str, str]] = None,
+                       timeout: Optional[float] = None,
+                       retries: Optional[int] = None) -> Any:
+        """GET a URL and decode its JSON body.
+
+        Retries connection errors, timeouts and retryable statuses with
+        exponential backoff plus jitter. Raises aiohttp.ClientResponseError
+        for a final non-2xx status and the last network error otherwise.
+        """
+        session = await self.get_session()
+        max_retries = HTTP_MAX_RETRIES if retries is None else retries
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+
+        attempt = 0
+        while True:
+            try:
+                async with session.get(url, params=params, headers=headers,
+                                       timeout=request_timeout) as response:
+                    if response.status in RETRYABLE_STATUSES and attempt < max_retries:
+                        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                        await asyncio.sleep(retry_after or _backoff_delay(attempt))
+                        attempt += 1
+                        continue
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= max_retries:
+                    raise
+                logger.debug(f"Retrying {url} after error: {e!r}")
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    base = HTTP_RETRY_BACKOFF * (2 ** attempt)
+    return base + random.uniform(0, base)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds"""
+    if not value:
+        return None
+    try:
+        return min(float(value), 30.0)
+    except ValueError:
+        return None
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is attempted through an open circuit breaker"""
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures and skips the
+    provider for `reset_timeout` seconds, then lets a single trial call
+    through (half-open). A success closes the circuit again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go through right now"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._trial_in_flight:
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit opened for {self.name} after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `factory()` through the breaker, recording the outcome"""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        if self.state == 'half_open':
+            self._trial_in_flight = True
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            # Losing a hedge race says nothing about provider health
+            self._trial_in_flight = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+async def hedged_first(factories: List[Callable[[], Awaitable[Any]]],
+                       hedge_delay: float) -> Any:
+    """Return the first non-None result from a list of coroutine factories.
+
+    The first call starts immediately; each further call starts after
+    `hedge_delay` seconds without an answer, or right away when an
+    earlier call fails or returns None. Calls still running once an
+    answer arrives are cancelled. Returns None if every call fails.
+    """
+    remaining = list(factories)
+    pending = set()
+
+    def launch():
+        pending.add(asyncio.ensure_future(remaining.pop(0)()))
+
+    if not remaining:
+        return None
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # Hedge timer fired - start the next provider alongside
+                launch()
+                continue
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None and task.result() is not None:
+                    return task.result()
+            if remaining and not pending:
+                launch()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Global instance
+http_client = HTTPClient()
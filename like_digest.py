@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Like digest scheduler for Alt3r Bot
+Coalesces like notifications: instead of one message per like, likes for a
+recipient accumulate in users.unnotified_likes and a single digest is sent
+once the collection window closes. Recipients who are active right now
+still get notified immediately.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from message_dispatcher import message_dispatcher, PRIORITY_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+LIKE_DIGEST_WINDOW = float(os.getenv('LIKE_DIGEST_WINDOW', '300'))  # seconds to collect likes
+LIKE_DIGEST_ACTIVE_WINDOW = float(os.getenv('LIKE_DIGEST_ACTIVE_WINDOW', '120'))  # "currently browsing"
+
+
+class LikeDigestScheduler:
+    """Schedules one digest flush per recipient per collection window"""
+
+    def __init__(self, window: float = LIKE_DIGEST_WINDOW, active_window: float = LIKE_DIGEST_ACTIVE_WINDOW):
+        self.window = window
+        self.active_window = active_window
+        self._due: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._application = None
+        self._flush: Optional[Callable[[int, Any], Awaitable[Any]]] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of recipients waiting for a digest"""
+        return len(self._due)
+
+    async def start(self, application, flush: Callable[[int, Any], Awaitable[Any]],
+                    load_pending: Optional[Callable[[], Iterable[int]]] = None):
+        """Start the scheduler; `flush(user_id, application)` sends one recipient's digest.
+
+        `load_pending()` returns recipients whose likes were stored but never sent
+        (a restart, crash or deploy lost their in-memory schedule); each gets a digest.
+        """
+        self._application = application
+        self._flush = flush
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Like digest scheduler started (window {self.window:.0f}s)")
+        if load_pending is not None:
+            try:
+                recipients = await asyncio.to_thread(load_pending)
+            except Exception as e:
+                logger.error(f"Could not load pending like digests: {e}")
+                return
+            for user_id in recipients:
+                self.schedule(user_id)
+            if recipients:
+                logger.info(f"Rescheduled {len(recipients)} pending like digests")
+
+    async def stop(self):
+        """Stop the scheduler and hand every pending digest to the dispatcher"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for user_id in list(self._due):
+            self._submit(user_id)
+        self._due.clear()
+        self._heap.clear()
+
+    def is_active(self, user_id: int) -> bool:
+        """Whether the recipient interacted with the bot recently enough to notify right away"""
+        processor = getattr(self._application, 'update_processor', None)
+        seen_within = getattr(processor, 'seen_within', None)
+        return bool(seen_within and seen_within(user_id, self.active_window))
+
+    def schedule(self, user_id: int):
+        """Make sure a digest for `user_id` goes out when the current window closes"""
+        if user_id in self._due:
+            return
+        due = time.monotonic() + self.window
+        self._due[user_id] = due
+        heapq.heappush(self._heap, (due, user_id))
+        self._wakeup.set()
+
+    def _submit(self, user_id: int):
+        message_dispatcher.submit(self._flush, user_id, self._application, priority=PRIORITY_NOTIFICATION)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, user_id = heapq.heappop(self._heap)
+                self._due.pop(user_id, None)
+                self._submit(user_id)
+
+
+# Global instance
+like_digest = LikeDigestScheduler()
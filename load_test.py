@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Update-replay load tester for Alt3r Bot
+Runs a local stand-in for the Telegram Bot API (getUpdates, sendMessage,
+sendPhoto, editMessageText, answerCallbackQuery, ...) as an aiohttp app
+and simulates N concurrent users who register, browse, like and message
+with realistic think times. The bot is pointed at the stand-in through
+TELEGRAM_API_BASE_URL; the report covers end-to-end latency (update
+delivered -> first bot reply), throughput and error rates.
+
+Usage:
+    python generate_dataset.py --users 10000 --replace   # registered users to log in as
+    python load_test.py --users 200 --duration 120        # spawns main.py against the stand-in
+    python load_test.py --no-spawn ...                    # bot already running with TELEGRAM_API_BASE_URL
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+LOAD_TOKEN = '123456:load-test'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Alt3r Load', 'username': 'alt3r_load_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+REGISTERED_ID_START = 900_000_000  # generate_dataset.DEFAULT_ID_START
+NEW_USER_ID_START = 1_900_000_000  # unregistered users go through the questionnaire
+REPLY_TIMEOUT = 15.0  # seconds without any bot reply counts as a timeout
+SETTLE_TIME = 0.3  # collect follow-up messages this long after the first reply
+
+# Relative preference of a simulated user for inline buttons, by callback_data prefix
+BUTTON_WEIGHTS = [
+    ('like_', 6.0), ('next_profile', 4.0), ('skip_', 3.0), ('browse_profiles', 5.0),
+    ('browse_all_profiles', 1.0), ('continue_browsing', 2.0), ('my_likes', 1.5),
+    ('view_like_', 1.0), ('like_back_', 1.5), ('send_message', 0.7), ('message_', 0.5),
+    ('search_by_traits', 0.8), ('compatibility_search', 0.8), ('recommendations', 0.8),
+    ('my_profile', 0.6), ('back_to_menu', 1.0), ('lang_', 0.5),
+]
+# Never pressed: destructive, paid or admin actions
+AVOID_PREFIXES = ('confirm_delete', 'delete_', 'confirm_recreate', 'recreate', 'stars_', 'ton_', 'pay',
+                  'premium', 'admin', 'report', 'feedback', 'support')
+PROMPT_ANSWERS = [
+    (('сколько вам лет', 'how old', 'возраст', 'age'), lambda rng: str(rng.randint(18, 45))),
+    (('город', 'city', 'местоположение', 'location'), lambda rng: rng.choice(['Москва', 'Санкт-Петербург', 'Казань'])),
+    (('обращаться', 'name', 'имя'), lambda rng: rng.choice(['Аня', 'Макс', 'Лиза', 'Илья'])),
+    (('о себе', 'about yourself', 'bio'), lambda rng: 'Люблю книги, музыку и долгие прогулки.'),
+]
+CHAT_LINES = ['Привет! Как дела?', 'Мне понравилась твоя анкета 🙂', 'Чем увлекаешься?', 'Hi there!']
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+class FakeBotAPI:
+    """Minimal Bot API server: queues simulated updates, records every bot call per chat"""
+
+    def __init__(self):
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        self._updates: List[Dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._inboxes: Dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.polls = 0
+
+    # --- simulated users -> bot ---
+
+    def push_update(self, update: Dict):
+        update['update_id'] = next(self._update_ids)
+        self._updates.append(update)
+        self._new_updates.set()
+
+    def inbox(self, chat_id: int) -> asyncio.Queue:
+        return self._inboxes[chat_id]
+
+    # --- bot -> stand-in ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = await self._params(request)
+        self.calls[method] += 1
+        handler = getattr(self, f"api_{method.lower()}", None)
+        result = await handler(params) if handler else self._default(method, params)
+        return web.json_response({'ok': True, 'result': result})
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, str):
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    params[key] = value
+        return params
+
+    async def api_getme(self, params):
+        return BOT_USER
+
+    async def api_getupdates(self, params):
+        self.polls += 1
+        offset = int(params.get('offset') or 0)
+        self._updates = [u for u in self._updates if u['update_id'] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self._updates[:limit]
+
+    def _default(self, method: str, params: Dict[str, Any]):
+        chat_id = params.get('chat_id')
+        if not method.startswith(('send', 'edit', 'copy')) or chat_id is None:
+            return True
+        message = {
+            'message_id': params.get('message_id') or next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text') or params.get('caption') or '',
+        }
+        if isinstance(params.get('reply_markup'), dict):
+            message['reply_markup'] = params['reply_markup']
+        if method in ('sendPhoto', 'sendVideo', 'sendAnimation'):
+            kind = {'sendPhoto': 'photo', 'sendVideo': 'video', 'sendAnimation': 'animation'}[method]
+            media = {'file_id': f"load-{message['message_id']}", 'file_unique_id': f"u{message['message_id']}",
+                     'width': 640, 'height': 640, 'duration': 1}
+            message[kind] = [media] if kind == 'photo' else media
+            message['caption'] = message.pop('text')
+        self._inboxes[int(chat_id)].put_nowait((time.perf_counter(), method, message))
+        return message
+
+    async def api_sendmediagroup(self, params):
+        self._default('sendMessage', {'chat_id': params.get('chat_id'), 'text': ''})
+        return []
+
+
+class VirtualUser:
+    """Scripted-but-reactive user: answers prompts, presses weighted buttons, thinks between actions"""
+
+    def __init__(self, user_id: int, api: FakeBotAPI, rng: random.Random, stats: 'Stats', think_scale: float):
+        self.user_id = user_id
+        self.api = api
+        self.rng = rng
+        self.stats = stats
+        self.think_scale = think_scale
+        self.last_message: Optional[Dict] = None
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f"Load{user_id % 10000}", 'language_code': 'ru'}
+
+    def _message(self, **fields) -> Dict:
+        return {'message_id': next(self.api._message_ids), 'date': int(time.time()),
+                'chat': {'id': self.user_id, 'type': 'private'}, 'from': self.user, **fields}
+
+    async def send_text(self, text: str, kind: str):
+        message = self._message(text=text)
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        await self._act({'message': message}, kind)
+
+    async def send_photo(self):
+        photo = [{'file_id': f"user-photo-{self.user_id}", 'file_unique_id': f"up{self.user_id}",
+                  'width': 800, 'height': 800}]
+        await self._act({'message': self._message(photo=photo)}, 'photo')
+
+    async def press(self, data: str):
+        query = {'id': str(next(self.api._message_ids)), 'from': self.user, 'chat_instance': str(self.user_id),
+                 'data': data, 'message': self.last_message}
+        await self._act({'callback_query': query}, f"cb:{data.rstrip('0123456789_')}")
+
+    async def _act(self, update: Dict, kind: str):
+        inbox = self.api.inbox(self.user_id)
+        while not inbox.empty():
+            inbox.get_nowait()
+        sent = time.perf_counter()
+        self.api.push_update(update)
+        try:
+            received, _, message = await asyncio.wait_for(inbox.get(), REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats.record(kind, None, False)
+            return
+        # Gather the rest of the reply burst (e.g. profile card after a "like sent" notice)
+        burst = [message]
+        while True:
+            try:
+                burst.append((await asyncio.wait_for(inbox.get(), SETTLE_TIME))[2])
+            except asyncio.TimeoutError:
+                break
+        # React to the last message offering buttons, else to the last message
+        self.last_message = next((m for m in reversed(burst) if m.get('reply_markup')), burst[-1])
+        error_reply = any('❌' in (m.get('text') or m.get('caption') or '') for m in burst)
+        self.stats.record(kind, received - sent, error_reply)
+
+    def _choose_button(self, markup: Dict) -> Optional[str]:
+        buttons = [b for row in markup.get('inline_keyboard', []) for b in row if b.get('callback_data')]
+        weighted = []
+        for button in buttons:
+            data = button['callback_data']
+            if data.startswith(AVOID_PREFIXES):
+                continue
+            weight = next((w for prefix, w in BUTTON_WEIGHTS if data.startswith(prefix)), 0.2)
+            weighted.append((data, weight))
+        if not weighted:
+            return None
+        return self.rng.choices([d for d, _ in weighted], [w for _, w in weighted])[0]
+
+    async def step(self):
+        message = self.last_message or {}
+        markup = message.get('reply_markup') or {}
+        text = (message.get('text') or message.get('caption') or '').lower()
+
+        if markup.get('inline_keyboard'):
+            data = self._choose_button(markup)
+            if data:
+                return await self.press(data)
+        if markup.get('keyboard'):
+            options = [b['text'] if isinstance(b, dict) else b for row in markup['keyboard'] for b in row]
+            options = [o for o in options if 'назад' not in o.lower() and 'back' not in o.lower()] or options
+            if options:
+                return await self.send_text(self.rng.choice(options), 'reply_keyboard')
+        if any(word in text for word in ('фото', 'photo', 'видео', 'video')):
+            return await self.send_photo()
+        for keywords, answer in PROMPT_ANSWERS:
+            if any(word in text for word in keywords):
+                return await self.send_text(answer(self.rng), 'answer')
+        if self.rng.random() < 0.3:
+            return await self.send_text('/menu', 'command')
+        return await self.send_text(self.rng.choice(CHAT_LINES), 'text')
+
+    async def run(self, deadline: float):
+        await asyncio.sleep(self.rng.uniform(0, 5 * self.think_scale))  # staggered arrival
+        await self.send_text('/start', 'command')
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.rng.lognormvariate(0.5, 0.6) * self.think_scale)  # ~1.6s median
+            await self.step()
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        self.error_replies = 0
+        self.started = time.perf_counter()
+
+    def record(self, kind: str, latency: Optional[float], error_reply: bool):
+        if latency is None:
+            self.timeouts[kind] += 1
+        else:
+            self.latencies[kind].append(latency)
+        self.error_replies += bool(error_reply)
+
+    def report(self, api: FakeBotAPI) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        everything = [x for values in self.latencies.values() for x in values]
+        answered = len(everything)
+        timeouts = sum(self.timeouts.values())
+        total = answered + timeouts
+        per_kind = {
+            kind: {'count': len(values), 'p50_ms': round(percentile(values, 0.5) * 1000, 1),
+                   'p95_ms': round(percentile(values, 0.95) * 1000, 1), 'timeouts': self.timeouts.get(kind, 0)}
+            for kind, values in sorted(self.latencies.items(), key=lambda kv: -len(kv[1]))
+        }
+        return {
+            'duration_s': round(elapsed, 1),
+            'actions': total,
+            'throughput_per_s': round(answered / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(everything, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(everything, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(everything, 0.99) * 1000, 1),
+            'timeout_rate': round(timeouts / total, 4) if total else 0.0,
+            'error_reply_rate': round(self.error_replies / total, 4) if total else 0.0,
+            'bot_api_calls': dict(api.calls),
+            'by_action': per_kind,
+        }
+
+
+async def spawn_bot(base_url: str, extra_env: Dict[str, str]) -> asyncio.subprocess.Process:
+    env = dict(os.environ, TELEGRAM_API_BASE_URL=base_url, TELEGRAM_BOT_TOKEN=LOAD_TOKEN,
+               BOT_MODE='polling', BOT_POLL_INTERVAL='0', PORT=os.getenv('LOAD_TEST_OPS_PORT', '8001'),
+               **extra_env)
+    return await asyncio.create_subprocess_exec(sys.executable, 'main.py', env=env)
+
+
+async def run(args) -> Dict[str, Any]:
+    api = FakeBotAPI()
+    runner = web.AppRunner(api.app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    base_url = f"http://{args.host}:{args.port}"
+    print(f"🧪 Fake Bot API listening on {base_url}")
+
+    bot = None
+    if not args.no_spawn:
+        bot = await spawn_bot(base_url, {})
+        print(f"🤖 Started bot (pid {bot.pid}), waiting for it to poll...")
+    while api.polls == 0:
+        if bot is not None and bot.returncode is not None:
+            raise SystemExit(f"Bot exited with code {bot.returncode} before polling")
+        await asyncio.sleep(0.2)
+
+    rng = random.Random(args.seed)
+    stats = Stats()
+    new_users = int(args.users * args.new_user_ratio)
+    users = [VirtualUser(NEW_USER_ID_START + rng.randrange(10 ** 7) if i < new_users else args.user_id_start + i,
+                         api, random.Random(rng.random()), stats, args.think_scale)
+             for i in range(args.users)]
+    print(f"👥 Running {args.users} users ({new_users} new) for {args.duration}s...")
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(user.run(deadline) for user in users))
+    report = stats.report(api)
+
+    if bot is not None:
+        bot.terminate()
+        try:
+            await asyncio.wait_for(bot.wait(), 15)
+        except asyncio.TimeoutError:
+            bot.kill()
+    await runner.cleanup()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test Alt3r against a fake Telegram Bot API")
+    parser.add_argument('--users', type=int, default=50, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=60, help="seconds of simulated activity")
+    parser.add_argument('--think-scale', type=float, default=1.0, help="multiplier on think times (0 = no pauses)")
+    parser.add_argument('--new-user-ratio', type=float, default=0.2, help="share of users that register from scratch")
+    parser.add_argument('--user-id-start', type=int, default=REGISTERED_ID_START,
+                        help="first registered user id (generate_dataset range)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--no-spawn', action='store_true', help="don't start main.py; use an already running bot")
+    parser.add_argument('--output', help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(f"\n📊 {report['actions']} actions in {report['duration_s']}s "
+          f"({report['throughput_per_s']}/s answered)")
+    print(f"   latency p50 {report['p50_ms']}ms  p95 {report['p95_ms']}ms  p99 {report['p99_ms']}ms")
+    print(f"   timeouts {report['timeout_rate']:.2%}  error replies {report['error_reply_rate']:.2%}")
+    for kind, row in list(report['by_action'].items())[:12]:
+        print(f"   {kind:<28}{row['count']:>6}  p50 {row['p50_ms']:>8}ms  p95 {row['p95_ms']:>8}ms  timeouts {row['timeouts']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Event-loop monitor for Alt3r Bot
+A probe task measures how late the loop runs a due timer (scheduling lag);
+a watchdog thread notices when the loop stops ticking and samples the loop
+thread's stack, tagged with the handler and callback data being run, so
+stalls caused by blocking code can be traced to the code path responsible.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional, Tuple
+
+from metrics import LOOP_LAG, SLOW_CALLBACKS, handler_in_flight
+
+logger = logging.getLogger(__name__)
+
+LOOP_PROBE_INTERVAL = float(os.getenv('LOOP_PROBE_INTERVAL', '0.5'))
+LOOP_SLOW_THRESHOLD = float(os.getenv('LOOP_SLOW_THRESHOLD', '0.25'))  # seconds the loop may block
+LAG_WINDOW_SAMPLES = 20  # loop_lag reports the worst of the last ~10 seconds
+STACK_DEPTH = 12
+
+
+@dataclass
+class SlowCallback:
+    at: float  # wall-clock time the stall ended
+    duration: float
+    handler: str = 'unknown'
+    callback_data: Optional[str] = None
+    task: Optional[str] = None
+    stack: List[str] = field(default_factory=list)
+
+
+class LoopMonitor:
+    """Scheduling-lag probe plus stack-sampling watchdog for blocking code"""
+
+    def __init__(self, interval: float = LOOP_PROBE_INTERVAL, threshold: float = LOOP_SLOW_THRESHOLD,
+                 keep: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.slow_callbacks: Deque[SlowCallback] = deque(maxlen=keep)
+        self._lag_samples: Deque[float] = deque(maxlen=LAG_WINDOW_SAMPLES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._beat = 0.0  # monotonic time of the probe's last wake-up
+        self._sample: Optional[Tuple[float, SlowCallback]] = None  # (beat it stalled after, sample)
+
+    @property
+    def loop_lag(self) -> float:
+        """Worst scheduling delay over the recent window (seconds)"""
+        return max(self._lag_samples, default=0.0)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start the probe task and watchdog thread on the running loop (idempotent)"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (slow threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - due)
+            previous_beat, self._beat = self._beat, time.monotonic()
+            self._lag_samples.append(lag)
+            LOOP_LAG.observe(value=lag)
+            if lag > self.threshold:
+                sample = self._sample
+                self._record(lag, sample[1] if sample and sample[0] == previous_beat else None)
+
+    def _record(self, lag: float, sample: Optional[SlowCallback]):
+        event = sample or SlowCallback(at=0.0, duration=0.0)
+        event.at = time.time()
+        event.duration = lag
+        self.slow_callbacks.append(event)
+        SLOW_CALLBACKS.inc(event.handler)
+        where = event.stack[-1].strip() if event.stack else 'no stack sample'
+        logger.warning(f"🐢 Event loop blocked {lag * 1000:.0f}ms in {event.handler} "
+                       f"(task={event.task}, data={event.callback_data!r}) at {where}")
+
+    def _watch(self):
+        """Watchdog thread: sample the loop thread's stack once per stall"""
+        poll = max(self.threshold / 2, 0.01)
+        while not self._stopping.wait(poll):
+            beat = self._beat
+            if time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if self._sample is not None and self._sample[0] == beat:
+                continue  # this stall is already sampled
+            self._sample = (beat, self._take_sample())
+
+    def _take_sample(self) -> SlowCallback:
+        sample = SlowCallback(at=0.0, duration=0.0)
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        tagged = handler_in_flight(task) if task is not None else None
+        if tagged is not None:
+            sample.handler, sample.callback_data = tagged
+        if task is not None:
+            sample.task = task.get_name()
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is not None:
+            sample.stack = [
+                f"{os.path.basename(f.filename)}:{f.lineno} in {f.name}"
+                for f in traceback.extract_stack(frame)[-STACK_DEPTH:]
+            ]
+        return sample
+
+    def report(self, limit: int = 5) -> str:
+        """Plain-text summary of loop lag and the most recent slow callbacks"""
+        lines = [f"Loop lag (max over ~10s): {self.loop_lag * 1000:.1f}ms",
+                 f"Slow threshold: {self.threshold * 1000:.0f}ms",
+                 f"Slow callbacks recorded: {len(self.slow_callbacks)}"]
+        for event in list(self.slow_callbacks)[-limit:][::-1]:
+            stamp = time.strftime('%H:%M:%S', time.localtime(event.at))
+            lines.append(f"\n{stamp} {event.duration * 1000:.0f}ms {event.handler}"
+                         + (f" [{event.callback_data}]" if event.callback_data else "")
+                         + (f" ({event.task})" if event.task and event.handler == 'unknown' else ""))
+            lines.extend(f"  {frame}" for frame in event.stack[-4:])
+        return '\n'.join(lines)
+
+
+# Global instance
+loop_monitor = LoopMonitor()
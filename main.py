@@ -8,11 +8,10 @@ import os
 import json
 import logging
 import asyncio
-import requests
-import aiohttp
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import re
+from functools import lru_cache
 # Removed unused imports - using process_manager now
 
 from telegram import (
@@ -22,15 +21,26 @@ from telegram import (
 )
 from telegram.ext import (
     ApplicationBuilder, ContextTypes, CommandHandler, 
-    MessageHandler, CallbackQueryHandler, ConversationHandler, filters
+    MessageHandler, CallbackQueryHandler, ConversationHandler, TypeHandler, filters
 )
 from dotenv import load_dotenv
-from keep_alive import start_keep_alive
 from database_manager import db_manager
 # User model import for type hints in is_profile_complete function
-from models import User
+from models import User, engine, IS_SQLITE
 from db_operations import db
 from process_manager import process_manager
+from http_client import http_client, CircuitBreaker, hedged_first
+from update_processor import PerUserUpdateProcessor, AdmissionQueue
+from message_dispatcher import message_dispatcher, rate_limiter, PRIORITY_MATCH, PRIORITY_MESSAGE
+from like_digest import like_digest
+from followups import schedule_followup, supersede_followups
+from callback_router import CallbackRouter
+from web_server import web_server, webhook_enabled, webhook_url, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS
+from loop_monitor import loop_monitor
+from migrations import check_schema
+from metrics import BROWSE_CANDIDATES, QUEUE_DEPTH, instrument_engine, instrument_handlers, track_lru_cache
+from geo_index import geo_index, haversine_km, distance_band, batch_distances_km, NO_BAND, CityProximityTable
+from geo_index import warm_up as warm_up_geo
 
 load_dotenv()
 
@@ -48,10 +58,7 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN or BOT_TOKEN environment variable not set")
 
-# Initialize PostgreSQL database
-logger.info("Starting with PostgreSQL database")
-
-# Removed legacy TinyDB compatibility - now using pure PostgreSQL
+logger.info(f"Starting with {'SQLite' if IS_SQLITE else 'PostgreSQL'} database")
 
 # AI session tracking and performance caching
 ai_sessions = {}
@@ -226,10 +233,7 @@ ND_SYMPTOMS = {
     }
 }
 
-# Import language texts from translations.py and merge with local ones
-from translations import TEXTS as IMPORTED_TEXTS
-
-# Local TEXTS with missing keys
+# Local TEXTS with missing keys; merged over translations.py on first use (see get_texts)
 LOCAL_TEXTS = {
     "ru": {
         "welcome": "🧠 Добро пожаловать в Alt3r!\n\nЭто бот для знакомств нейроотличных людей. Здесь вы можете найти понимание, поддержку и настоящие связи с теми, кто разделяет ваш опыт.\n\n✨ Давайте создадим вашу анкету!",
@@ -691,12 +695,16 @@ LOCAL_TEXTS = {
     }
 }
 
-# Merge IMPORTED_TEXTS with LOCAL_TEXTS (LOCAL_TEXTS takes priority for missing keys)
-TEXTS = {
-    "ru": {**IMPORTED_TEXTS.get("ru", {}), **LOCAL_TEXTS["ru"]},
-    "en": {**IMPORTED_TEXTS.get("en", {}), **LOCAL_TEXTS["en"]}
-}
+@lru_cache(maxsize=1)
+def get_texts():
+    """translations.py TEXTS merged with LOCAL_TEXTS (LOCAL_TEXTS wins); loaded on the first lookup"""
+    from translations import TEXTS as IMPORTED_TEXTS
+    return {
+        "ru": {**IMPORTED_TEXTS.get("ru", {}), **LOCAL_TEXTS["ru"]},
+        "en": {**IMPORTED_TEXTS.get("en", {}), **LOCAL_TEXTS["en"]}
+    }
 
+@lru_cache(maxsize=4096)
 def normalize_city(city_input):
     """Normalize city names to handle different languages/spellings with typo correction"""
     city_lower = city_input.lower().strip()
@@ -1249,12 +1257,12 @@ def normalize_city(city_input):
 # ===== NEW COMPREHENSIVE CITY HANDLING SYSTEM =====
 
 import unicodedata
-import math
 
 def strip_diacritics(s: str) -> str:
     """Remove diacritics/accents from text for ASCII conversion"""
     return "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
 
+@lru_cache(maxsize=4096)
 def city_slug(city: str) -> str:
     """Create canonical city slug for consistent matching across languages"""
     if not city:
@@ -1310,27 +1318,22 @@ async def get_coordinates_from_city(city: str):
     if not city or not city.strip():
         return None
     
-    import aiohttp
-    
     # Normalize city for better geocoding results
     normalized_city = normalize_city(city.strip())
     
-    urls = [
-        f"https://nominatim.openstreetmap.org/search?q={normalized_city}&format=json&limit=1",
+    services = [
+        ("https://nominatim.openstreetmap.org/search", {"q": normalized_city, "format": "json", "limit": 1}),
     ]
     headers = {"User-Agent": "Alt3r Dating Bot / CityGeocode"}
 
-    for url in urls:
+    for url, params in services:
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if isinstance(data, list) and data:
-                            lat = float(data[0]["lat"])
-                            lon = float(data[0]["lon"])
-                            logger.info(f"Forward geocoded {city} -> {normalized_city} -> ({lat}, {lon})")
-                            return lat, lon
+            data = await http_client.get_json(url, params=params, headers=headers)
+            if isinstance(data, list) and data:
+                lat = float(data[0]["lat"])
+                lon = float(data[0]["lon"])
+                logger.info(f"Forward geocoded {city} -> {normalized_city} -> ({lat}, {lon})")
+                return lat, lon
         except Exception as e:
             logger.error(f"Geocoding service error for {city}: {e}")
             continue
@@ -1338,74 +1341,62 @@ async def get_coordinates_from_city(city: str):
     logger.warning(f"Forward geocoding failed for: {city}")
     return None
 
+# Fallback city-to-coordinates mapping for major cities (normalized lowercase names)
+CITY_COORDINATES = {
+    # Russia
+    "москва": (55.7558, 37.6176), "moscow": (55.7558, 37.6176),
+    "санкт-петербург": (59.9343, 30.3351), "saint petersburg": (59.9343, 30.3351),
+    "питер": (59.9343, 30.3351), "spb": (59.9343, 30.3351),
+    "екатеринбург": (56.8431, 60.6454), "yekaterinburg": (56.8431, 60.6454),
+    "новосибирск": (55.0084, 82.9357), "novosibirsk": (55.0084, 82.9357),
+    "казань": (55.8304, 49.0661), "kazan": (55.8304, 49.0661),
+    
+    # Poland
+    "warszawa": (52.2297, 21.0122), "warsaw": (52.2297, 21.0122),
+    "kraków": (50.0647, 19.9450), "krakow": (50.0647, 19.9450),
+    "wrocław": (51.1079, 17.0385), "wroclaw": (51.1079, 17.0385),
+    "gdańsk": (54.3520, 18.6466), "gdansk": (54.3520, 18.6466),
+    "poznań": (52.4064, 16.9252), "poznan": (52.4064, 16.9252),
+    "łódź": (51.7592, 19.4550), "lodz": (51.7592, 19.4550),
+    
+    # Ukraine
+    "київ": (50.4501, 30.5234), "kyiv": (50.4501, 30.5234), "kiev": (50.4501, 30.5234),
+    "львів": (49.8397, 24.0297), "lviv": (49.8397, 24.0297), "львов": (49.8397, 24.0297),
+    "одеса": (46.4825, 30.7233), "odesa": (46.4825, 30.7233), "одесса": (46.4825, 30.7233),
+    "харків": (49.9935, 36.2304), "kharkiv": (49.9935, 36.2304), "харьков": (49.9935, 36.2304),
+    
+    # Germany
+    "berlin": (52.5200, 13.4050), "берлин": (52.5200, 13.4050),
+    "munich": (48.1351, 11.5820), "münchen": (48.1351, 11.5820), "мюнхен": (48.1351, 11.5820),
+    "hamburg": (53.5511, 9.9937), "гамбург": (53.5511, 9.9937),
+    "cologne": (50.9375, 6.9603), "köln": (50.9375, 6.9603),
+    
+    # Other European capitals
+    "paris": (48.8566, 2.3522), "париж": (48.8566, 2.3522),
+    "london": (51.5074, -0.1278), "лондон": (51.5074, -0.1278),
+    "madrid": (40.4168, -3.7038), "мадрид": (40.4168, -3.7038),
+    "rome": (41.9028, 12.4964), "рим": (41.9028, 12.4964),
+    "amsterdam": (52.3676, 4.9041), "амстердам": (52.3676, 4.9041),
+    "vienna": (48.2082, 16.3738), "вена": (48.2082, 16.3738),
+    "prague": (50.0755, 14.4378), "прага": (50.0755, 14.4378),
+    
+    # North America
+    "new york": (40.7128, -74.0060), "нью-йорк": (40.7128, -74.0060),
+    "los angeles": (34.0522, -118.2437), "лос-анджелес": (34.0522, -118.2437),
+    "chicago": (41.8781, -87.6298), "чикаго": (41.8781, -87.6298),
+    "toronto": (43.6532, -79.3832), "торонто": (43.6532, -79.3832),
+}
+
 def get_city_coordinates(city: str):
     """Fallback city-to-coordinates mapping for major cities"""
     if not city:
         return None
     
-    c = normalize_city(city).lower()
-    table = {
-        # Russia
-        "москва": (55.7558, 37.6176), "moscow": (55.7558, 37.6176),
-        "санкт-петербург": (59.9343, 30.3351), "saint petersburg": (59.9343, 30.3351),
-        "питер": (59.9343, 30.3351), "spb": (59.9343, 30.3351),
-        "екатеринбург": (56.8431, 60.6454), "yekaterinburg": (56.8431, 60.6454),
-        "новосибирск": (55.0084, 82.9357), "novosibirsk": (55.0084, 82.9357),
-        "казань": (55.8304, 49.0661), "kazan": (55.8304, 49.0661),
-        
-        # Poland
-        "warszawa": (52.2297, 21.0122), "warsaw": (52.2297, 21.0122),
-        "kraków": (50.0647, 19.9450), "krakow": (50.0647, 19.9450),
-        "wrocław": (51.1079, 17.0385), "wroclaw": (51.1079, 17.0385),
-        "gdańsk": (54.3520, 18.6466), "gdansk": (54.3520, 18.6466),
-        "poznań": (52.4064, 16.9252), "poznan": (52.4064, 16.9252),
-        "łódź": (51.7592, 19.4550), "lodz": (51.7592, 19.4550),
-        
-        # Ukraine
-        "київ": (50.4501, 30.5234), "kyiv": (50.4501, 30.5234), "kiev": (50.4501, 30.5234),
-        "львів": (49.8397, 24.0297), "lviv": (49.8397, 24.0297), "львов": (49.8397, 24.0297),
-        "одеса": (46.4825, 30.7233), "odesa": (46.4825, 30.7233), "одесса": (46.4825, 30.7233),
-        "харків": (49.9935, 36.2304), "kharkiv": (49.9935, 36.2304), "харьков": (49.9935, 36.2304),
-        
-        # Germany
-        "berlin": (52.5200, 13.4050), "берлин": (52.5200, 13.4050),
-        "munich": (48.1351, 11.5820), "münchen": (48.1351, 11.5820), "мюнхен": (48.1351, 11.5820),
-        "hamburg": (53.5511, 9.9937), "гамбург": (53.5511, 9.9937),
-        "cologne": (50.9375, 6.9603), "köln": (50.9375, 6.9603),
-        
-        # Other European capitals
-        "paris": (48.8566, 2.3522), "париж": (48.8566, 2.3522),
-        "london": (51.5074, -0.1278), "лондон": (51.5074, -0.1278),
-        "madrid": (40.4168, -3.7038), "мадрид": (40.4168, -3.7038),
-        "rome": (41.9028, 12.4964), "рим": (41.9028, 12.4964),
-        "amsterdam": (52.3676, 4.9041), "амстердам": (52.3676, 4.9041),
-        "vienna": (48.2082, 16.3738), "вена": (48.2082, 16.3738),
-        "prague": (50.0755, 14.4378), "прага": (50.0755, 14.4378),
-        
-        # North America
-        "new york": (40.7128, -74.0060), "нью-йорк": (40.7128, -74.0060),
-        "los angeles": (34.0522, -118.2437), "лос-анджелес": (34.0522, -118.2437),
-        "chicago": (41.8781, -87.6298), "чикаго": (41.8781, -87.6298),
-        "toronto": (43.6532, -79.3832), "торонто": (43.6532, -79.3832),
-    }
-    return table.get(c)
+    return CITY_COORDINATES.get(normalize_city(city).lower())
 
 def calculate_distance_km(lat1, lon1, lat2, lon2):
     """Calculate distance between two coordinates using Haversine formula"""
-    if None in [lat1, lon1, lat2, lon2]:
-        return float('inf')
-    
-    R = 6371.0  # Earth radius in km
-    
-    p1 = math.radians(lat1)
-    p2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlmb = math.radians(lon2 - lon1)
-    
-    a = math.sin(dphi/2)**2 + math.cos(p1) * math.cos(p2) * math.sin(dlmb/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    return R * c
+    return haversine_km(lat1, lon1, lat2, lon2)
 
 NEARBY_KM = 25  # Consider users within 25km as nearby
 
@@ -1438,78 +1429,114 @@ def is_nearby(user_a, user_b):
         user_a.get("city", ""), user_b.get("city", "")
     )
 
+# City slugs grouped by region, used for proximity when GPS coordinates are missing
+CITY_REGIONS = {
+    "russia": {"moscow", "saint-petersburg", "kazan", "yekaterinburg", "novosibirsk", "nizhny-novgorod", "samara", "ufa"},
+    "poland": {"warsaw", "krakow", "wroclaw", "gdansk", "poznan", "lodz", "katowice", "szczecin", "bialystok", "lublin"},
+    "ukraine": {"kyiv", "lviv", "kharkiv", "odesa", "dnipro"},
+    "germany": {"berlin", "munich", "hamburg", "cologne", "frankfurt", "stuttgart", "dusseldorf"},
+    "france": {"paris", "lyon", "marseille", "toulouse", "nice", "nantes", "strasbourg", "bordeaux"},
+    "uk": {"london", "manchester", "birmingham", "liverpool", "leeds", "glasgow", "edinburgh"},
+    "usa-east": {"new-york", "boston", "philadelphia", "washington", "atlanta", "miami"},
+    "usa-west": {"los-angeles", "san-francisco", "seattle", "portland", "san-diego"},
+    "usa-central": {"chicago", "detroit", "milwaukee", "minneapolis", "cleveland"},
+}
+
+_city_proximity_table = None
+
+def get_city_proximity_table() -> CityProximityTable:
+    """Slug->region map and city-to-city proximity matrix, compiled once on first use"""
+    global _city_proximity_table
+    if _city_proximity_table is None:
+        centroids = {}
+        for name, coords in CITY_COORDINATES.items():
+            slug = city_slug(name)
+            if slug:
+                centroids.setdefault(slug, coords)
+        # Some names slug to '' (normalized to Cyrillic); find their centroid by the region's slug instead
+        for members in CITY_REGIONS.values():
+            for slug in members:
+                coords = CITY_COORDINATES.get(slug.replace('-', ' '))
+                if coords and slug not in centroids:
+                    centroids[slug] = coords
+        _city_proximity_table = CityProximityTable(CITY_REGIONS, centroids)
+        logger.info(f"City proximity table compiled for {len(_city_proximity_table)} cities")
+    return _city_proximity_table
+
 def get_regional_proximity_by_slug(city1: str, city2: str) -> bool:
     """Updated regional proximity using city slugs for consistent matching"""
-    c1, c2 = city_slug(city1), city_slug(city2)
-    
-    regions = {
-        "russia": {"moscow", "saint-petersburg", "kazan", "yekaterinburg", "novosibirsk", "nizhny-novgorod", "samara", "ufa"},
-        "poland": {"warsaw", "krakow", "wroclaw", "gdansk", "poznan", "lodz", "katowice", "szczecin", "bialystok", "lublin"},
-        "ukraine": {"kyiv", "lviv", "kharkiv", "odesa", "dnipro"},
-        "germany": {"berlin", "munich", "hamburg", "cologne", "frankfurt", "stuttgart", "dusseldorf"},
-        "france": {"paris", "lyon", "marseille", "toulouse", "nice", "nantes", "strasbourg", "bordeaux"},
-        "uk": {"london", "manchester", "birmingham", "liverpool", "leeds", "glasgow", "edinburgh"},
-        "usa-east": {"new-york", "boston", "philadelphia", "washington", "atlanta", "miami"},
-        "usa-west": {"los-angeles", "san-francisco", "seattle", "portland", "san-diego"},
-        "usa-central": {"chicago", "detroit", "milwaukee", "minneapolis", "cleveland"},
-    }
-    
-    return any(c1 in region and c2 in region for region in regions.values())
+    return get_city_proximity_table().same_region(city_slug(city1), city_slug(city2))
+
+# City slug backfill settings
+CITY_SLUG_BATCH_SIZE = int(os.getenv('CITY_SLUG_BATCH_SIZE', '500'))
+CITY_SLUG_GEOCODE_INTERVAL = float(os.getenv('CITY_SLUG_GEOCODE_INTERVAL', '1.0'))  # Nominatim allows ~1 req/s
 
 async def migrate_existing_city_slugs():
-    """ONE-TIME MIGRATION: Add city_slug to all existing users without it"""
+    """Background backfill of city_slug (and missing coordinates) for existing users.
+
+    Works through users WHERE city_slug IS NULL in keyset-paginated batches and
+    writes each batch with bulk UPDATEs. Processed rows stop matching the filter,
+    so a restart resumes where the previous run stopped. Cities that produce no
+    slug are stored as '' so they are not picked up again.
+    """
     try:
-        logger.info("🔄 Starting city_slug migration for existing users...")
-        
-        all_users = db.get_all_users()
+        logger.info("🔄 Starting background city_slug migration...")
+        last_user_id = 0
         updated_count = 0
-        processed_count = 0
-        
-        for user in all_users:
-            processed_count += 1
-            user_id = user.get("user_id")
-            city = user.get("city", "")
-            existing_slug = user.get("city_slug", "")
-            
-            # Skip if user already has a city_slug or no city
-            if existing_slug or not city:
-                continue
-                
-            # Generate city_slug for existing user
-            slug = city_slug(city)
-            
-            if slug:
-                # Try forward geocoding for coordinates if missing
-                coords_updated = False
-                if not user.get("latitude") or not user.get("longitude"):
-                    try:
-                        coords = await get_coordinates_from_city(city)
-                        if coords:
-                            lat, lon = coords
-                            db.create_or_update_user(user_id, {
-                                "city_slug": slug,
-                                "latitude": lat,
-                                "longitude": lon
-                            })
-                            coords_updated = True
-                            logger.info(f"✅ Updated user {user_id}: city='{city}' -> slug='{slug}' + coords ({lat}, {lon})")
-                        else:
-                            db.create_or_update_user(user_id, {"city_slug": slug})
-                            logger.info(f"✅ Updated user {user_id}: city='{city}' -> slug='{slug}' (no coords)")
-                    except Exception as e:
-                        logger.warning(f"Coords lookup failed for {city}: {e}")
-                        db.create_or_update_user(user_id, {"city_slug": slug})
-                        logger.info(f"✅ Updated user {user_id}: city='{city}' -> slug='{slug}' (coords failed)")
-                else:
-                    # Just add the slug
-                    db.create_or_update_user(user_id, {"city_slug": slug})
-                    logger.info(f"✅ Updated user {user_id}: city='{city}' -> slug='{slug}'")
-                
-                updated_count += 1
-        
-        logger.info(f"🎉 City slug migration completed! Processed {processed_count} users, updated {updated_count} users.")
+        geocoded_count = 0
+        coords_cache = {}  # slug -> (lat, lon) or None, shared across batches
+        last_geocode = 0.0
+        loop = asyncio.get_running_loop()
+
+        while True:
+            rows = await asyncio.to_thread(
+                db_manager.get_users_missing_city_slug, last_user_id, CITY_SLUG_BATCH_SIZE
+            )
+            if not rows:
+                break
+
+            updates = []
+            for user_id, city, latitude, longitude in rows:
+                slug = city_slug(city)
+                update_row = {"user_id": user_id, "city_slug": slug}
+
+                if slug and (latitude is None or longitude is None):
+                    if slug not in coords_cache:
+                        coords = get_city_coordinates(city)
+                        if coords is None:
+                            # Rate-limit external geocoding across the whole run
+                            wait = last_geocode + CITY_SLUG_GEOCODE_INTERVAL - loop.time()
+                            if wait > 0:
+                                await asyncio.sleep(wait)
+                            last_geocode = loop.time()
+                            try:
+                                coords = await get_coordinates_from_city(city)
+                            except Exception as e:
+                                logger.warning(f"Coords lookup failed for {city}: {e}")
+                                coords = None
+                            geocoded_count += 1
+                        coords_cache[slug] = coords
+                    coords = coords_cache[slug]
+                    if coords:
+                        update_row["latitude"], update_row["longitude"] = coords
+
+                updates.append(update_row)
+
+            located = await asyncio.to_thread(db_manager.bulk_update_city_slugs, updates)
+            # Back on the event loop: GeoIndex is not safe to mutate from the worker thread
+            if geo_index.loaded:
+                for user_id, latitude, longitude in located:
+                    geo_index.upsert(user_id, latitude, longitude)
+            updated_count += len(updates)
+            last_user_id = rows[-1][0]
+            logger.info(f"City slug migration: {updated_count} users updated (last user_id {last_user_id})")
+
+        logger.info(f"🎉 City slug migration completed! Updated {updated_count} users, {geocoded_count} geocoding lookups.")
         return True
-        
+
+    except asyncio.CancelledError:
+        logger.info("City slug migration interrupted, will resume on next start")
+        raise
     except Exception as e:
         logger.error(f"❌ City slug migration failed: {e}")
         return False
@@ -1540,55 +1567,68 @@ async def safe_edit_message(query, text, reply_markup=None):
             logger.warning(f"Message edit failed with error: {e}")
             return False
 
+# Reverse geocoding providers are raced with hedging: the next provider starts
+# after GEOCODE_HEDGE_DELAY seconds without an answer, the first valid city wins
+GEOCODE_HEDGE_DELAY = float(os.getenv('GEOCODE_HEDGE_DELAY', '0.8'))
+GEOCODE_PROVIDER_TIMEOUT = float(os.getenv('GEOCODE_PROVIDER_TIMEOUT', '6'))
+
+async def _reverse_geocode_nominatim(latitude: float, longitude: float) -> Optional[str]:
+    """Reverse geocode via OpenStreetMap Nominatim"""
+    data = await http_client.get_json(
+        "https://nominatim.openstreetmap.org/reverse",
+        params={'lat': latitude, 'lon': longitude, 'format': 'json', 'accept-language': 'en'},
+        headers={'User-Agent': 'Alt3r Dating Bot'},
+        timeout=GEOCODE_PROVIDER_TIMEOUT,
+        retries=0
+    )
+    address = data.get('address', {}) if isinstance(data, dict) else {}
+    return (address.get('city') or 
+            address.get('town') or 
+            address.get('village') or 
+            address.get('municipality') or 
+            address.get('county') or 
+            address.get('state'))
+
+async def _reverse_geocode_bigdatacloud(latitude: float, longitude: float) -> Optional[str]:
+    """Reverse geocode via BigDataCloud"""
+    data = await http_client.get_json(
+        "https://api.bigdatacloud.net/data/reverse-geocode-client",
+        params={'latitude': latitude, 'longitude': longitude, 'localityLanguage': 'en'},
+        timeout=GEOCODE_PROVIDER_TIMEOUT,
+        retries=0
+    )
+    if not isinstance(data, dict):
+        return None
+    return (data.get('locality') or 
+            data.get('city') or 
+            data.get('principalSubdivision'))
+
+# Providers in preference order, each behind its own circuit breaker
+REVERSE_GEOCODERS = [
+    (CircuitBreaker("nominatim"), _reverse_geocode_nominatim),
+    (CircuitBreaker("bigdatacloud"), _reverse_geocode_bigdatacloud),
+]
+
 async def get_city_from_coordinates(latitude: float, longitude: float) -> str:
-    """Get city name from GPS coordinates using reverse geocoding"""
-    try:
-        import aiohttp
-        
-        # Try multiple geocoding services for better reliability
-        services = [
-            {
-                'url': f"https://nominatim.openstreetmap.org/reverse?lat={latitude}&lon={longitude}&format=json&accept-language=en",
-                'headers': {'User-Agent': 'Alt3r Dating Bot'}
-            },
-            {
-                'url': f"https://api.bigdatacloud.net/data/reverse-geocode-client?latitude={latitude}&longitude={longitude}&localityLanguage=en",
-                'headers': {}
-            }
-        ]
-        
-        for service in services:
+    """Get city name from GPS coordinates using hedged reverse geocoding"""
+    def make_call(breaker, provider):
+        async def call():
             try:
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                    async with session.get(service['url'], headers=service['headers']) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            
-                            # Handle OpenStreetMap Nominatim response
-                            if 'address' in data:
-                                address = data.get('address', {})
-                                city = (address.get('city') or 
-                                       address.get('town') or 
-                                       address.get('village') or 
-                                       address.get('municipality') or 
-                                       address.get('county') or 
-                                       address.get('state'))
-                                       
-                                if city and city != "Unknown Location":
-                                    return normalize_city(city)
-                            
-                            # Handle BigDataCloud response
-                            elif 'locality' in data:
-                                city = (data.get('locality') or 
-                                       data.get('city') or 
-                                       data.get('principalSubdivision'))
-                                       
-                                if city and city != "Unknown Location":
-                                    return normalize_city(city)
-                                    
+                city = await breaker.call(lambda: provider(latitude, longitude))
             except Exception as service_error:
-                logger.error(f"Error with geocoding service {service['url']}: {service_error}")
-                continue
+                logger.error(f"Error with geocoding service {breaker.name}: {service_error!r}")
+                return None
+            if city and city != "Unknown Location":
+                return normalize_city(city)
+            return None
+        return call
+
+    try:
+        # Skip providers whose circuit is open so a failing one doesn't use up a hedge slot
+        calls = [make_call(breaker, provider) for breaker, provider in REVERSE_GEOCODERS if breaker.allow()]
+        city = await hedged_first(calls, GEOCODE_HEDGE_DELAY)
+        if city:
+            return city
         
         # If all services fail, return a generic message
         logger.error(f"All geocoding services failed for coordinates: {latitude}, {longitude}")
@@ -1637,7 +1677,8 @@ def get_text(user_id: int, key: str) -> str:
     """Get localized text for user"""
     user = db.get_user(user_id)
     lang = user.get('lang', 'ru') if user else "ru"
-    return TEXTS.get(lang, TEXTS["ru"]).get(key, key)
+    texts = get_texts()
+    return texts.get(lang, texts["ru"]).get(key, key)
 
 def create_smart_text(text: str, max_length: int = 18) -> str:
     """
@@ -2733,508 +2774,17 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     data = query.data
     
-    logger.info(f"🔍 Callback received: user_id={user_id}, data='{data}'")
+    logger.debug(f"🔍 Callback received: user_id={user_id}, data='{data}'")
 
     if not data:
         logger.warning(f"❌ Empty callback data from user {user_id}")
         return
 
     try:
-        if data == "view_profile":
-            await show_user_profile(query, user_id)
-        elif data == "browse_profiles":
-            await browse_profiles(query, context, user_id)
-        elif data == "browse_all_profiles":
-            # Clear previous browsing data and start browsing
-            if context.user_data:
-                context.user_data.pop('browsing_profiles', None)
-                context.user_data.pop('current_profile_index', None)
-                context.user_data['browse_started'] = True
-            await start_browsing_profiles(query, context, user_id)
-        elif data == "change_photo":
-            await start_change_photo(query, context, user_id)
-        elif data == "change_bio":
-            await start_change_bio(query, context, user_id)
-        elif data == "change_name":
-            await start_change_name(query, context, user_id)
-        elif data == "change_city":
-            logger.info(f"🏙️ Change city button clicked by user {user_id}")
-            try:
-                await start_change_city(query, context, user_id)
-                logger.info(f"✅ start_change_city completed successfully for user {user_id}")
-            except Exception as city_error:
-                logger.error(f"❌ Error in start_change_city for user {user_id}: {city_error}")
-                raise
-        elif data == "change_city_setting":
-            await start_change_city_setting(query, context, user_id)
-        elif data == "my_likes":
-            await show_my_likes_direct(query, context, user_id)
-        elif data == "profile_settings":
-            await show_profile_settings_menu(query, user_id)
-        elif data == "feedback":
-            # Open Telegram channel for feedback
-            await query.edit_message_text(
-                "📝 Обратная связь\n\nПрисоединяйтесь к нашему каналу для обратной связи и обновлений:",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("📢 Alt3r Channel", url="https://t.me/Alt3rchannel")],
-                    [InlineKeyboardButton(get_text(user_id, "back_button"), callback_data="back_to_menu")]
-                ])
-            )
-        elif data == "statistics":
-            await show_statistics(query, user_id)
-        elif data == "support_project":
-            await show_support_menu(query, user_id)
-        elif data == "back_to_menu":
-            # Clear any conversation state and lingering keyboards
-            if context.user_data:
-                context.user_data.clear()
-            
-            # Ultra-fast direct menu transition
-            await safe_edit_message(
-                query,
-                get_text(user_id, "main_menu"),
-                get_main_menu(user_id)
-            )
-        elif data.startswith("like_back_"):
-            parts = data.split("_", 2)
-            if len(parts) < 3:
-                await query.answer("❌ Ошибка обработки.")
-                return
-            try:
-                target_id = int(parts[2])
-                await handle_like_back(query, context, user_id, target_id)
-            except Exception as e:
-                logger.error(f"Error parsing like_back callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки.")
-                return
-        elif data.startswith("like_incoming_"):
-            # Handle incoming like callbacks - like someone back
-            try:
-                profile_id = int(data.split("_")[2])
-                await handle_like_back(query, context, user_id, profile_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing like_incoming callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data.startswith("like_"):
-            try:
-                # Format: like_410177871  
-                profile_id = int(data.split("_")[1])
-                await handle_like_profile(query, context, user_id, profile_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing like callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data.startswith("pass_incoming_"):
-            # Handle incoming pass callbacks first - more specific match
-            try:
-                profile_id = int(data.split("_")[2])
-                await handle_decline_like(query, user_id, profile_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing pass_incoming callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data.startswith("pass_"):
-            try:
-                # Format: pass_410177871
-                await handle_pass_profile(query, context, user_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing pass callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data == "prev_profile":
-            logger.info(f"📱 Navigation: User {user_id} pressed PREV button")
-            await show_previous_profile(query, context, user_id)
-        elif data == "next_profile":
-            logger.info(f"📱 Navigation: User {user_id} pressed NEXT button")
-            await show_next_profile(query, context, user_id)
-        elif data == "no_action":
-            await query.answer()  # Just acknowledge the callback, do nothing
-        elif data == "continue_browsing":
-            # Continue browsing profiles from where we left off
-            profiles = context.user_data.get('browsing_profiles', [])
-            current_index = context.user_data.get('current_profile_index', 0)
-            if profiles and current_index < len(profiles):
-                await show_profile_card(query, context, user_id, profiles[current_index])
-            else:
-                await browse_profiles(query, context, user_id)
-        elif data.startswith("send_message_"):
-            try:
-                target_id = int(data.split("_")[2])
-                await start_message_to_user(query, context, user_id, target_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing send_message callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data.startswith("send_video_"):
-            target_id = int(data.split("_")[2])
-            await start_video_to_user(query, context, user_id, target_id)
-        elif data.startswith("view_match_profile_"):
-            target_id = int(data.split("_")[3])
-            await show_detailed_match_profile(query, user_id, target_id)
-        elif data.startswith("view_incoming_profile_"):
-            target_id = int(data.split("_")[3])
-            await show_incoming_profile(query, user_id, target_id)
-        elif data.startswith("like_back_"):
-            parts = data.split("_", 2)
-            if len(parts) < 3:
-                await query.answer("❌ Ошибка обработки.")
-                return
-            try:
-                target_id = int(parts[2])
-                await handle_like_back(query, context, user_id, target_id)
-            except Exception as e:
-                logger.error(f"Error parsing like_back callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки.")
-                return
-        elif data.startswith("decline_like_"):
-            parts = data.split("_", 2)
-            if len(parts) < 3:
-                await query.answer("❌ Ошибка обработки.")
-                return
-            try:
-                target_id = int(parts[2])
-                await handle_decline_like(query, user_id, target_id)
-            except Exception as e:
-                logger.error(f"Error parsing decline_like callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки.")
-                return
-
-
-        elif data == "view_mutual_matches":
-            await show_mutual_matches(query, context, user_id)
-        elif data == "view_incoming_likes":
-            await show_incoming_likes_browse(query, context, user_id)
-        elif data == "prev_mutual_match":
-            await navigate_mutual_matches(query, context, user_id, -1)
-        elif data == "next_mutual_match":
-            await navigate_mutual_matches(query, context, user_id, 1)
-        elif data == "manage_symptoms":
-            await show_nd_traits_menu(query, user_id)
-        elif data == "manage_symptoms_detailed":
-            await show_detailed_symptoms_menu(query, user_id)
-        
-        elif data == "add_nd_traits":
-            await show_add_traits_menu(query, user_id)
-        elif data.startswith("toggle_trait_"):
-            trait_key = data.split("toggle_trait_")[1]
-            await toggle_nd_trait(query, user_id, trait_key)
-        elif data.startswith("toggle_symptom_"):
-            symptom_key = data.split("toggle_symptom_")[1]
-            await toggle_nd_symptom(query, user_id, symptom_key)
-        elif data.startswith("reg_trait_"):
-            trait_key = data.split("reg_trait_")[1]
-            await toggle_registration_trait(query, context, user_id, trait_key)
-        elif data.startswith("reg_symptom_"):
-            symptom_key = data.split("reg_symptom_")[1]
-            await toggle_registration_symptom(query, context, user_id, symptom_key)
-        elif data == "reg_traits_done":
-            return await show_registration_nd_symptoms(query, context, user_id)
-        elif data == "reg_traits_skip":
-            return await show_registration_nd_symptoms(query, context, user_id)
-        elif data == "reg_symptoms_done":
-            return await finish_nd_registration(query, context, user_id)
-        elif data == "reg_symptoms_skip":
-            return await finish_nd_registration(query, context, user_id)
-        elif data == "reg_traits_back":
-            # Go back to bio step
-            keyboard = [
-                [KeyboardButton(get_text(user_id, "btn_skip"))],
-                [KeyboardButton(get_text(user_id, "back_button"))]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-            
-            await query.message.reply_text(
-                get_text(user_id, "questionnaire_bio"),
-                reply_markup=reply_markup
-            )
-            
-            try:
-                await query.delete_message()
-            except:
-                pass
-                
-            return BIO
-        elif data == "reg_symptoms_back":
-            # Go back to traits selection
-            await show_registration_nd_traits(query, context, user_id)
-        elif data == "save_traits":
-            try:
-                await query.edit_message_text(
-                    "✅ Особенности сохранены!",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 К настройкам", callback_data="manage_symptoms")
-                    ]])
-                )
-            except Exception:
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                await query.message.reply_text(
-                    "✅ Особенности сохранены!",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 К настройкам", callback_data="manage_symptoms")
-                    ]])
-                )
-        elif data == "save_symptoms":
-            try:
-                await query.edit_message_text(
-                    "✅ Характеристики сохранены!",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 К настройкам", callback_data="manage_symptoms")
-                    ]])
-                )
-            except Exception:
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                await query.message.reply_text(
-                    "✅ Характеристики сохранены!",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 К настройкам", callback_data="manage_symptoms")
-                    ]])
-                )
-        elif data == "search_by_traits":
-            await search_by_traits(query, context, user_id)
-        elif data == "next_nd_result":
-            await show_next_nd_result(query, context, user_id)
-        elif data == "pass_nd_profile":
-            await show_next_nd_result(query, context, user_id)
-        elif data == "compatibility_search":
-            await compatibility_search(query, context, user_id)
-        elif data == "recommendations":
-            await show_recommendations(query, context, user_id)
-        elif data == "next_compatibility":
-            await show_next_compatibility_result(query, context, user_id)
-        elif data == "prev_compatibility":
-            await show_prev_compatibility_result(query, context, user_id)
-        elif data == "pass_compatibility":
-            await show_next_compatibility_result(query, context, user_id)
-        elif data == "next_recommendation":
-            await show_next_recommendation_result(query, context, user_id)
-        elif data == "pass_recommendation":
-            await show_next_recommendation_result(query, context, user_id)
-        elif data == "next_incoming_like":
-            await show_next_incoming_like(query, context, user_id)
-        elif data.startswith("report_user_"):
-            try:
-                reported_user_id = int(data.split("_")[2])
-                await handle_report_user(query, context, user_id, reported_user_id)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing report_user callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data.startswith("report_reason_"):
-            try:
-                # Format: report_reason_spam_12345678
-                parts = data.split("_", 3)
-                reason = parts[2]
-                reported_user_id = int(parts[3])
-                await submit_user_report(query, context, user_id, reported_user_id, reason)
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing report_reason callback data '{data}': {e}")
-                await query.answer("❌ Ошибка обработки. Попробуйте еще раз.")
-                return
-        elif data == "admin_panel":
-            await show_admin_panel(query, user_id)
-        elif data == "admin_reports":
-            await show_admin_reports(query, user_id)
-        elif data == "admin_users":
-            await show_admin_users(query, user_id)
-        
-        elif data.startswith("interest_"):
-            interest = data.split("interest_")[1]
-            db.create_or_update_user(user_id, {'interest': interest})
-            await query.edit_message_text(
-                "✅ Предпочтения обновлены!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 К настройкам", callback_data="profile_settings")
-                ]])
-            )
-        elif data == "recreate_profile":
-            await confirm_recreate_profile(query, user_id)
-        elif data == "confirm_recreate":
-            # Start profile recreation
-            user = db.get_user(user_id)
-            current_lang = user.get('lang', 'ru') if user else 'ru'
-
-            # Keep the language setting but clear all other profile data
-            user_lang = user.get('lang', 'ru') if user else 'ru'
-
-            # Clear essential profile fields directly in the database to trigger registration flow
-            try:
-                from database_manager import db_manager
-                from models import User
-                
-                # Reset critical profile fields to NULL/empty to force re-registration
-                session = db_manager.get_session()
-                user_obj = session.query(User).filter_by(user_id=user_id).first()
-                if user_obj:
-                    user_obj.name = None
-                    user_obj.age = None  
-                    user_obj.gender = None
-                    user_obj.city = None
-                    user_obj.bio = None
-                    user_obj.photos = []
-                    user_obj.photo_id = None
-                    user_obj.media_type = None
-                    user_obj.media_id = None
-                    user_obj.nd_traits = []
-                    user_obj.nd_symptoms = []
-                    user_obj.lang = user_lang
-                    session.commit()
-                session.close()
-                
-                logger.info(f"✅ Profile cleared for user {user_id} - ready for recreation")
-                    
-            except Exception as e:
-                logger.error(f"Error clearing profile for user {user_id}: {e}")
-                # Fallback to previous method
-                reset_data = {
-                    'lang': user_lang,
-                    'photos': [],
-                    'nd_traits': [],
-                    'nd_symptoms': []
-                }
-                db.create_or_update_user(user_id, reset_data)
-
-            # Clear conversation data
-            if context.user_data:
-                context.user_data.clear()
-
-            if current_lang == 'en':
-                welcome_text = "🔄 Profile Recreation Started!\n\n✨ Let's create your new profile. We'll go through all the steps again.\n\nTo restart the profile creation process, please send /start"
-            else:
-                welcome_text = "🔄 Начинаем заполнение анкеты заново!\n\n✨ Давайте создадим вашу новую анкету. Мы пройдем все шаги заново.\n\nЧтобы начать создание анкеты, отправьте /start"
-
-            try:
-                await query.edit_message_text(welcome_text)
-            except:
-                await query.message.reply_text(welcome_text)
-        elif data == "reset_matches":
-            await confirm_reset_matches(query, user_id)
-        elif data == "confirm_reset_matches":
-            await reset_user_matches(query, user_id)
-        elif data == "confirm_delete":
-            # Delete user account
-            user = db.get_user(user_id)
-            user_lang = user.get('lang', 'ru') if user else 'ru'
-            
-            if user_lang == 'en':
-                delete_message = "🗑️ Account deleted.\n\nGoodbye! Use /start if you want to return."
-            else:
-                delete_message = "🗑️ Аккаунт удален.\n\nДо свидания! Используйте /start если захотите вернуться."
-            
-            db.delete_user(user_id)
-            await query.edit_message_text(delete_message)
-        elif data == "feedback_complaint":
-            await start_feedback(query, context, user_id, "complaint")
-        elif data == "feedback_suggestion":
-            await start_feedback(query, context, user_id, "suggestion")
-        elif data == "feedback_support":
-            await start_feedback(query, context, user_id, "support")
-        elif data == "rate_app":
-            await show_rating_menu(query, user_id)
-        elif data == "change_language":
-            await change_language(query, user_id)
-        elif data == "change_city_setting":
-            await start_change_city_setting(query, context, user_id)
-        elif data == "change_interest_setting":
-            await start_change_interest_setting(query, context, user_id)
-        elif data == "delete_account":
-            await confirm_delete_account(query, user_id)
-        elif data == "detailed_stats":
-            await show_detailed_stats(query, user_id)
-        elif data == "continue_profile":
-            await continue_profile_creation(query, context, user_id)
-        elif data == "browse_anyway":
-            context.user_data['browse_started'] = True
-            context.user_data['use_filters'] = False
-            await start_browsing_profiles(query, context, user_id)
-        elif data == "browse_all_unfiltered":
-            context.user_data['browse_started'] = True
-            context.user_data['use_filters'] = False
-            await start_browsing_unfiltered_profiles(query, context, user_id)
-        elif data.startswith("lang_"):
-            lang = data.split("_")[1]
-            db.update_user(user_id, {'lang': lang})
-            
-            # Check if this is a new user who needs to create a profile
-            user = db.get_user(user_id)
-            
-            if lang == 'ru':
-                success_text = "✅ Язык установлен: Русский"
-            else:
-                success_text = "✅ Language set: English"
-            
-            await query.edit_message_text(success_text)
-            
-            # If user has no profile data, start profile creation
-            if user and not is_profile_complete_dict(user):
-                await asyncio.sleep(1)  # Brief pause
-                welcome_text = get_text(user_id, "welcome")
-                age_text = get_text(user_id, "questionnaire_age")
-                
-                # Start profile creation with proper language in single message
-                if lang == 'en':
-                    back_btn = "🔙 Back to main menu"
-                else:
-                    back_btn = "🔙 Назад к главному меню"
-                
-                keyboard = [[KeyboardButton(back_btn)]]
-                reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-                
-                combined_text = f"{welcome_text}\n\n{age_text}"
-                await query.message.reply_text(combined_text, reply_markup=reply_markup)
-                
-                # Set conversation state properly
-                if context.user_data:
-                    context.user_data.clear()
-                context.user_data['in_conversation'] = True
-                context.user_data['language_selected'] = True
-                # Note: We can't return a state here since this is in a callback handler
-            else:
-                # User has complete profile, show main menu
-                await asyncio.sleep(1)
-                await query.message.reply_text(
-                    get_text(user_id, "main_menu"),
-                    reply_markup=get_main_menu(user_id)
-                )
-        elif data.startswith("rate_app_"):
-            rating = int(data.split("_")[2])
-            await save_app_rating(query, user_id, rating)
-        # Payment method selection
-        elif data == "payment_method_stars":
-            await show_stars_amounts(query, user_id)
-        elif data == "payment_method_ton":
-            await show_ton_amounts(query, user_id)
-        
-        # Telegram Stars payments
-        elif data.startswith("stars_"):
-            amount_str = data.split("_")[1]
-            if amount_str == "custom":
-                await start_custom_stars_amount(query, context, user_id)
-            else:
-                amount = int(amount_str)
-                await send_stars_payment_invoice(update, context, user_id, amount)
-        
-        # TON payments
-        elif data.startswith("ton_"):
-            amount_str = data.split("_")[1]
-            if amount_str == "custom":
-                await start_custom_ton_amount(query, context, user_id)
-            else:
-                amount = float(amount_str)
-                await send_ton_payment_invoice(query, user_id, amount, context)
-        
-        # TON payment status check
-        elif data.startswith("check_ton_"):
-            payment_id = data.split("check_ton_")[1]
-            await check_ton_payment_status(query, user_id, payment_id)
-        else:
+        matched, result = await callback_router.dispatch(update, context, user_id, data)
+        if not matched:
             await query.edit_message_text("Функция в разработке")
+        return result
 
     except Exception as e:
         logger.error(f"Error in handle_callback: {e}")
@@ -3257,6 +2807,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except:
                 pass
 
+
 async def show_user_profile(query, user_id):
     """Show user's own profile"""
     user = db.get_user(user_id)
@@ -3448,69 +2999,170 @@ async def browse_profiles(query, context, user_id):
     context.user_data['browse_started'] = True
     await start_browsing_profiles(query, context, user_id)
 
-import math
-
-def calculate_distance_km(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    if not all([lat1, lon1, lat2, lon2]):
-        return float('inf')
-    
-    # Convert latitude and longitude from degrees to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    # Radius of earth in kilometers
-    r = 6371
-    
-    return c * r
-
-def calculate_location_priority(current_user, other_user):
-    """Calculate location priority using NEW comprehensive city handling system"""
-    # Use new comprehensive is_nearby function first for binary nearby check
-    if is_nearby(current_user, other_user):
-        # If nearby (within 25km or same city slug), check for more granular distances
-        current_lat = current_user.get('latitude')
-        current_lon = current_user.get('longitude')
-        other_lat = other_user.get('latitude')
-        other_lon = other_user.get('longitude')
-        
-        if all([current_lat, current_lon, other_lat, other_lon]):
-            distance_km = calculate_distance_km(current_lat, current_lon, other_lat, other_lon)
-            
-            if distance_km <= 5:   # Same neighborhood
-                return 0
-            elif distance_km <= 25:  # Same city/metro area  
-                return 1
-        
-        # If no GPS but is_nearby returned True (slug match or regional proximity)
-        return 1  # Same city/region
-    
-    # Not nearby - check broader geographic patterns
-    current_lat = current_user.get('latitude')
-    current_lon = current_user.get('longitude')
-    other_lat = other_user.get('latitude')
-    other_lon = other_user.get('longitude')
-    
-    if all([current_lat, current_lon, other_lat, other_lon]):
-        distance_km = calculate_distance_km(current_lat, current_lon, other_lat, other_lon)
-        
-        if distance_km <= 100:  # Same region
-            return 2
-        elif distance_km <= 500:  # Same country/state
-            return 3
-        elif distance_km <= 2000:  # Same continent
-            return 4
-        else:
-            return 5  # Different continents
+def calculate_location_priority(current_user, other_user, distance_km=None):
+    """Calculate location priority band (0-5) using GPS distance with city-based fallbacks
+    
+    distance_km may be passed in when it is already known (e.g. from compute_location_bands).
+    """
+    if distance_km is None:
+        distance_km = calculate_distance_km(
+            current_user.get('latitude'), current_user.get('longitude'),
+            other_user.get('latitude'), other_user.get('longitude')
+        )
+    
+    # Both users have GPS: 5/25/100/500/2000 km bands
+    if distance_km != float('inf'):
+        return distance_band(distance_km)
+    
+    # No GPS: O(1) lookup in the precomputed city-to-city proximity table
+    current_slug = current_user.get('city_slug') or city_slug(current_user.get('city') or '')
+    other_slug = other_user.get('city_slug') or city_slug(other_user.get('city') or '')
+    band = get_city_proximity_table().band(current_slug, other_slug)
+    if band is not None:
+        return band
+    
+    if current_slug and other_slug and current_slug == other_slug:
+        return 1  # Same city
     
     # Fallback: use enhanced city slug matching
     return calculate_city_proximity(current_user, other_user)
 
+def compute_location_bands(current_user, candidates):
+    """Distances (km) and location priority bands for many candidates in one NumPy pass
+    
+    Missing GPS coordinates fall back to city centroid coordinates. Entries that
+    still can't be resolved get NO_BAND and should use calculate_location_priority.
+    """
+    def centroid(user):
+        return get_city_coordinates(user.get('city', '') or user.get('city_slug', '')) or (None, None)
+    
+    fallback = [
+        centroid(c) if c.get('latitude') is None or c.get('longitude') is None else (None, None)
+        for c in candidates
+    ]
+    own_fallback = (None, None)
+    if current_user.get('latitude') is None or current_user.get('longitude') is None:
+        own_fallback = centroid(current_user)
+    
+    return batch_distances_km(
+        current_user.get('latitude'), current_user.get('longitude'),
+        [c.get('latitude') for c in candidates], [c.get('longitude') for c in candidates],
+        [lat for lat, _ in fallback], [lon for _, lon in fallback],
+        own_fallback[0], own_fallback[1]
+    )
+
+def format_location_line(current_user, profile):
+    """Profile card location line with a distance/proximity badge"""
+    city_display = profile['city']
+    distances, bands = compute_location_bands(current_user, [profile])
+    
+    # Show GPS-based distance when both users shared their location
+    has_gps = all(
+        value is not None for value in (
+            current_user.get('latitude'), current_user.get('longitude'),
+            profile.get('latitude'), profile.get('longitude')
+        )
+    )
+    if has_gps:
+        distance_km = float(distances[0])
+        
+        if distance_km < 1:
+            return f"📍 *{city_display}* 🏠 (<1км)\n"
+        elif distance_km < 25:
+            return f"📍 *{city_display}* 🏠 ({distance_km:.0f}км)\n"
+        elif distance_km < 100:
+            return f"📍 *{city_display}* 🌆 ({distance_km:.0f}км)\n"
+        elif distance_km < 500:
+            return f"📍 *{city_display}* 🌍 ({distance_km:.0f}км)\n"
+        else:
+            return f"📍 *{city_display}* ✈️ ({distance_km:.0f}км)\n"
+    
+    # Fallback to the priority band (city centroids or city name matching)
+    location_priority = int(bands[0])
+    if location_priority == NO_BAND:
+        location_priority = calculate_location_priority(current_user, profile)
+    
+    if location_priority == 0:
+        # Same city - add local indicator
+        return f"📍 *{city_display}* 🏠\n"
+    elif location_priority <= 2:
+        # Same country/region - add regional indicator
+        return f"📍 *{city_display}* 🌍\n"
+    # Different country - just show city
+    return f"📍 *{city_display}*\n"
+
+# Nearby browsing: candidates come from the geo index when enough users are close by
+BROWSE_RADIUS_KM = float(os.getenv('BROWSE_RADIUS_KM', '2000'))
+BROWSE_MIN_NEARBY = int(os.getenv('BROWSE_MIN_NEARBY', '50'))
+BROWSE_MAX_CANDIDATES = int(os.getenv('BROWSE_MAX_CANDIDATES', '1000'))
+
+def is_browsable(current_user, user):
+    """Hard filters shared by every browse mode: complete profile, same side of 18"""
+    if not (user.get('name') and user.get('age') and user.get('city')
+            and (user.get('photos') or user.get('media_id'))):
+        return False
+    return (current_user.get('age', 18) >= 18) == (user.get('age', 18) >= 18)
+
+def matches_gender_preference(current_user, user):
+    """Whether `user`'s gender is one `current_user` is looking for"""
+    interest = current_user.get("interest", "both")
+    if interest in ["both", "Всё равно", "Doesn't matter"]:
+        return True
+    potential_gender = (user.get("gender") or "").lower()
+    if current_user.get('lang', 'ru') == "ru":
+        male, female = "парень", "девуш"
+    else:
+        male, female = "guy", "girl"
+    return (interest == "male" and male in potential_gender) or (interest == "female" and female in potential_gender)
+
+def load_browse_candidates(current_user, excluded_ids, preferred=None):
+    """Load candidate profiles for browsing
+    
+    Uses the spatial index to fetch the nearest users when the current user
+    has GPS coordinates and enough people are nearby, plus users in the same
+    city who never shared a location; otherwise falls back to scanning every
+    user. Index results are filtered before the BROWSE_MAX_CANDIDATES cap, and
+    the index is paged until that many `preferred` profiles are found.
+    """
+    lat = current_user.get('latitude')
+    lon = current_user.get('longitude')
+    
+    if geo_index.loaded and lat is not None and lon is not None:
+        nearby = geo_index.within(lat, lon, BROWSE_RADIUS_KM, exclude=excluded_ids)
+        if len(nearby) >= BROWSE_MIN_NEARBY:
+            rank = {user_id: position for position, (_, user_id) in enumerate(nearby)}
+            matches, others = [], []
+            for start in range(0, len(nearby), BROWSE_MAX_CANDIDATES):
+                page = db.get_users_by_ids([user_id for _, user_id in nearby[start:start + BROWSE_MAX_CANDIDATES]])
+                for user in sorted(page, key=lambda u: rank[u['user_id']]):
+                    if not is_browsable(current_user, user):
+                        continue
+                    if preferred is None or preferred(user):
+                        matches.append(user)
+                    elif len(others) < BROWSE_MAX_CANDIDATES:
+                        others.append(user)
+                if len(matches) >= BROWSE_MAX_CANDIDATES:
+                    break
+            candidates = matches[:BROWSE_MAX_CANDIDATES]
+            candidates += others[:BROWSE_MAX_CANDIDATES - len(candidates)]
+            
+            # Same-city profiles without GPS are invisible to the index
+            slug = current_user.get('city_slug') or city_slug(current_user.get('city') or '')
+            if slug:
+                candidates += [
+                    user for user in db.get_unlocated_users_by_city_slug(slug, BROWSE_MAX_CANDIDATES)
+                    if user['user_id'] not in excluded_ids and is_browsable(current_user, user)
+                ]
+            logger.info(f"Nearby candidates from geo index: {len(candidates)} within {BROWSE_RADIUS_KM:.0f}km "
+                        f"or in {slug or 'no city'}")
+            BROWSE_CANDIDATES.observe('geo_index', value=len(candidates))
+            return candidates
+    
+    all_users = db.get_all_users()
+    logger.info(f"Total users in database: {len(all_users)}")
+    BROWSE_CANDIDATES.observe('full_scan', value=len(all_users))
+    return all_users
+
 def calculate_city_proximity(current_user, other_user):
     """Calculate proximity based on city names with better normalization"""
     current_city = current_user.get('city', '').strip()
@@ -3536,9 +3188,6 @@ async def start_browsing_unfiltered_profiles(query, context, user_id):
     """Start browsing ALL profiles without gender filtering but with smart prioritization"""
     current_user = db.get_user(user_id)
     
-    # Get all users except current user
-    all_users = db.get_all_users()
-    logger.info(f"Total users in database: {len(all_users)}")
     
     current_age = current_user.get("age", 18)
     current_city = current_user.get("city", "").lower()
@@ -3550,10 +3199,16 @@ async def start_browsing_unfiltered_profiles(query, context, user_id):
     excluded_ids = sent_likes.union(declined_likes)
     excluded_ids.add(user_id)  # Exclude self
     
+    # Nearest users via the spatial index (or everyone as a fallback)
+    all_users = load_browse_candidates(current_user, excluded_ids)
+    
+    # Distance bands for every candidate in one vectorized pass
+    _, location_bands = compute_location_bands(current_user, all_users)
+    
     # Collect all profiles with comprehensive scoring
     scored_profiles = []
     
-    for user in all_users:
+    for index, user in enumerate(all_users):
         if user['user_id'] in excluded_ids:
             continue
             
@@ -3578,7 +3233,9 @@ async def start_browsing_unfiltered_profiles(query, context, user_id):
         score = 0
         
         # 1. LOCATION PROXIMITY (Primary for unfiltered) - GPS-based scoring
-        location_priority = calculate_location_priority(current_user, user)
+        location_priority = int(location_bands[index])
+        if location_priority == NO_BAND:
+            location_priority = calculate_location_priority(current_user, user)
         
         # Convert priority to score (lower priority = higher score)
         location_score_map = {
@@ -3675,9 +3332,6 @@ async def start_browsing_profiles(query, context, user_id):
     """Start browsing profiles with improved matching logic and graceful fallbacks"""
     current_user = db.get_user(user_id)
     
-    # Get all users except current user
-    all_users = db.get_all_users()
-    logger.info(f"Total users in database: {len(all_users)}")
     
     current_age = current_user.get("age", 18)
     current_gender = current_user.get("gender", "")
@@ -3692,10 +3346,17 @@ async def start_browsing_profiles(query, context, user_id):
     excluded_ids = sent_likes.union(declined_likes)
     excluded_ids.add(user_id)  # Exclude self
     
+    # Nearest users via the spatial index (or everyone as a fallback)
+    all_users = load_browse_candidates(current_user, excluded_ids,
+                                       preferred=lambda user: matches_gender_preference(current_user, user))
+    
+    # Distance bands for every candidate in one vectorized pass
+    _, location_bands = compute_location_bands(current_user, all_users)
+    
     # Collect all potential profiles with scoring
     potential_profiles = []
     
-    for user in all_users:
+    for index, user in enumerate(all_users):
         if user['user_id'] in excluded_ids:
             continue
             
@@ -3707,7 +3368,6 @@ async def start_browsing_profiles(query, context, user_id):
             continue
             
         potential_age = user.get("age", 18)
-        potential_gender = user.get("gender", "")
         potential_city = user.get("city", "").lower()
         potential_traits = set(user.get('nd_traits', []))
         
@@ -3722,29 +3382,14 @@ async def start_browsing_profiles(query, context, user_id):
         reasons = []
         
         # 1. GENDER COMPATIBILITY (Primary priority)
-        gender_match = False
-        if current_interest in ["both", "Всё равно", "Doesn't matter"]:
-            gender_match = True
-            score += 100  # High base score for "any gender"
-        else:
-            # Check gender preference match
-            if current_lang == "ru":
-                if current_interest == "male" and "парень" in potential_gender.lower():
-                    gender_match = True
-                    score += 100
-                elif current_interest == "female" and "девуш" in potential_gender.lower():
-                    gender_match = True
-                    score += 100
-            else:
-                if current_interest == "male" and "guy" in potential_gender.lower():
-                    gender_match = True
-                    score += 100
-                elif current_interest == "female" and "girl" in potential_gender.lower():
-                    gender_match = True
-                    score += 100
+        gender_match = matches_gender_preference(current_user, user)
+        if gender_match:
+            score += 100
         
         # 2. LOCATION PROXIMITY (Secondary priority)
-        location_priority = calculate_location_priority(current_user, user)
+        location_priority = int(location_bands[index])
+        if location_priority == NO_BAND:
+            location_priority = calculate_location_priority(current_user, user)
         
         # Convert priority to score and add reasons
         if location_priority == 0:
@@ -4000,40 +3645,7 @@ async def show_profile_card(query, context, user_id, profile):
     profile_text = f"👤 *{profile['name']}*, {profile['age']} лет\n"
     
     # Add location with distance/proximity indicator
-    city_display = profile['city']
-    
-    # Try to show GPS-based distance first
-    current_lat = current_user.get('latitude')
-    current_lon = current_user.get('longitude')
-    profile_lat = profile.get('latitude')
-    profile_lon = profile.get('longitude')
-    
-    if all([current_lat, current_lon, profile_lat, profile_lon]):
-        distance_km = calculate_distance_km(current_lat, current_lon, profile_lat, profile_lon)
-        
-        if distance_km < 1:
-            profile_text += f"📍 *{city_display}* 🏠 (<1км)\n"
-        elif distance_km < 25:
-            profile_text += f"📍 *{city_display}* 🏠 ({distance_km:.0f}км)\n"
-        elif distance_km < 100:
-            profile_text += f"📍 *{city_display}* 🌆 ({distance_km:.0f}км)\n"
-        elif distance_km < 500:
-            profile_text += f"📍 *{city_display}* 🌍 ({distance_km:.0f}км)\n"
-        else:
-            profile_text += f"📍 *{city_display}* ✈️ ({distance_km:.0f}км)\n"
-    else:
-        # Fallback to old priority system
-        location_priority = calculate_location_priority(current_user, profile)
-        
-        if location_priority == 0:
-            # Same city - add local indicator
-            profile_text += f"📍 *{city_display}* 🏠\n"
-        elif location_priority <= 2:
-            # Same country/region - add regional indicator  
-            profile_text += f"📍 *{city_display}* 🌍\n"
-        else:
-            # Different country - just show city
-            profile_text += f"📍 *{city_display}*\n"
+    profile_text += format_location_line(current_user, profile)
 
     # Add ND traits display
     nd_traits = profile.get('nd_traits', [])
@@ -4119,10 +3731,7 @@ async def handle_like_profile(query, context, user_id, target_id):
             )
             
             # Send mutual match notification to the other user
-            try:
-                await send_mutual_match_notification(target_id, context.application, current_user)
-            except Exception as notification_error:
-                logger.error(f"Failed to send mutual match notification: {notification_error}")
+            message_dispatcher.submit(send_mutual_match_notification, target_id, context.application, current_user, priority=PRIORITY_MATCH)
         else:
             try:
                 # Send like confirmation as new message
@@ -4132,16 +3741,14 @@ async def handle_like_profile(query, context, user_id, target_id):
                         InlineKeyboardButton("⏭️ Далее", callback_data="next_profile")
                     ]])
                 )
-                # Send notification to target user
-                try:
-                    await send_like_notification(target_id, context.application, user_id)
-                except Exception as notification_error:
-                    logger.error(f"Failed to send like notification: {notification_error}")
+                # Notify an active target right away, otherwise fold the like into a digest
+                if like_digest.is_active(target_id):
+                    message_dispatcher.submit(send_immediate_like_notification, target_id, context.application, user_id)
+                else:
+                    like_digest.schedule(target_id)
                 
-                # Wait a moment before showing next profile
-                await asyncio.sleep(1)
-                # Show next profile as new message
-                await show_next_profile_as_new_message(query, context, user_id)
+                # Show next profile as new message after a moment
+                schedule_followup(context, user_id, 1, show_next_profile_as_new_message, query, context, user_id)
             except Exception:
                 pass
 
@@ -4547,37 +4154,7 @@ async def show_incoming_like_card(query, context, user_id, profile):
         profile_text += f"👤 *{profile['name']}*, {profile['age']} лет\n"
         
         # Add location with distance/proximity indicator if available
-        city_display = profile['city']
-        
-        # Try to show GPS-based distance first
-        current_lat = current_user.get('latitude')
-        current_lon = current_user.get('longitude')
-        profile_lat = profile.get('latitude')
-        profile_lon = profile.get('longitude')
-        
-        if all([current_lat, current_lon, profile_lat, profile_lon]):
-            distance_km = calculate_distance_km(current_lat, current_lon, profile_lat, profile_lon)
-            
-            if distance_km < 1:
-                profile_text += f"📍 *{city_display}* 🏠 (<1км)\n"
-            elif distance_km < 25:
-                profile_text += f"📍 *{city_display}* 🏠 ({distance_km:.0f}км)\n"
-            elif distance_km < 100:
-                profile_text += f"📍 *{city_display}* 🌆 ({distance_km:.0f}км)\n"
-            elif distance_km < 500:
-                profile_text += f"📍 *{city_display}* 🌍 ({distance_km:.0f}км)\n"
-            else:
-                profile_text += f"📍 *{city_display}* ✈️ ({distance_km:.0f}км)\n"
-        else:
-            # Fallback to old priority system
-            location_priority = calculate_location_priority(current_user, profile)
-            
-            if location_priority == 0:
-                profile_text += f"📍 *{city_display}* 🏠\n"
-            elif location_priority <= 2:
-                profile_text += f"📍 *{city_display}* 🌍\n"
-            else:
-                profile_text += f"📍 *{city_display}*\n"
+        profile_text += format_location_line(current_user, profile)
 
         # Add ND traits display
         nd_traits = profile.get('nd_traits', [])
@@ -5249,7 +4826,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 is_match = user_id in target_sent_likes
 
                 # Send message with sender's profile to target user
-                await send_message_with_profile(context.bot, target_id, sender, message_text, is_match)
+                message_dispatcher.submit(send_message_with_profile, context.bot, target_id, sender, message_text, is_match,
+                                          priority=PRIORITY_MESSAGE)
 
                 # Send confirmation to sender
                 if is_match:
@@ -5258,11 +4836,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         reply_markup=get_main_menu(user_id)
                     )
                     
-                    # Send mutual match notification to target
-                    try:
-                        await send_mutual_match_notification(target_id, context.application, sender)
-                    except Exception as notification_error:
-                        logger.error(f"Failed to send mutual match notification: {notification_error}")
+                    # Send mutual match notification to target, queued behind the message itself
+                    message_dispatcher.submit(send_mutual_match_notification, target_id, context.application, sender,
+                                              priority=PRIORITY_MESSAGE)
                 else:
                     await update.message.reply_text(
                         "✅ Лайк и сообщение отправлены!",
@@ -5342,10 +4918,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     )
                     
                     # Send mutual match notification
-                    try:
-                        await send_mutual_match_notification(target_id, context.application, sender)
-                    except Exception as notification_error:
-                        logger.error(f"Failed to send mutual match notification: {notification_error}")
+                    message_dispatcher.submit(send_mutual_match_notification, target_id, context.application, sender, priority=PRIORITY_MATCH)
                 else:
                     await update.message.reply_text(
                         "✅ Лайк и видео-сообщение отправлены!",
@@ -5583,6 +5156,12 @@ async def debug_profiles(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(debug_text)
 
+async def show_loop_stalls(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin command: event-loop lag and the latest slow callbacks with stack samples"""
+    if not is_admin(update.effective_user.id):
+        return
+    await update.message.reply_text(f"🐢 Event loop\n\n{loop_monitor.report()}")
+
 async def show_nd_traits_menu(query, user_id):
     """Show neurodivergent traits management menu"""
     user = db.get_user(user_id)
@@ -6572,7 +6151,7 @@ async def change_language(query, user_id):
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
-async def set_language(query, user_id, lang):
+async def set_language(query, context, user_id, lang):
     """Set user language"""
     db.create_or_update_user(user_id, {'lang': lang})
 
@@ -6596,9 +6175,8 @@ async def set_language(query, user_id, lang):
         )
         
         # Auto-redirect to main menu after 2 seconds to show updated language
-        import asyncio
-        await asyncio.sleep(2)
-        await query.edit_message_text(
+        schedule_followup(
+            context, user_id, 2, query.edit_message_text,
             menu_text,
             reply_markup=get_main_menu(user_id)
         )
@@ -7066,10 +6644,14 @@ async def send_mutual_match_notification(user_id, application, matched_user):
                 parse_mode='Markdown'
             )
             
+        # The match message covers the like itself, keep it out of the next digest
+        if matched_user.get('user_id'):
+            db_manager.pop_unnotified_likes(user_id, [matched_user['user_id']])
         logger.info(f"Mutual match notification sent to user {user_id}")
         
     except Exception as e:
         logger.error(f"Error sending mutual match notification to {user_id}: {e}")
+        raise  # counted as failed by the message dispatcher
 
 async def send_message_with_profile(bot, target_id, sender, message_text, is_match=False):
     """Send message with sender's profile for easy like-back"""
@@ -7174,10 +6756,13 @@ async def send_message_with_profile(bot, target_id, sender, message_text, is_mat
                 parse_mode='Markdown'
             )
             
+        # The message already shows the like, keep it out of the next digest
+        db_manager.pop_unnotified_likes(target_id, [sender['user_id']])
         logger.info(f"Message with profile sent from {sender['user_id']} to {target_id}")
         
     except Exception as e:
         logger.error(f"Error sending message with profile: {e}")
+        raise  # counted as failed by the message dispatcher
 
 async def send_like_notification(user_id, application, sender_id=None):
     """Send notification about new like"""
@@ -7217,7 +6802,51 @@ async def send_like_notification(user_id, application, sender_id=None):
         
     except Exception as e:
         logger.error(f"Error sending like notification to {user_id}: {e}")
-        # Don't re-raise the exception as this shouldn't block the like process
+        raise  # runs in the message dispatcher, off the like handler's path; counted as failed there
+
+async def send_immediate_like_notification(user_id, application, sender_id):
+    """Notify an active user about a single like and mark it as notified"""
+    db_manager.pop_unnotified_likes(user_id, [sender_id])
+    await send_like_notification(user_id, application, sender_id)
+
+async def send_like_digest(user_id, application):
+    """Send one notification covering every like received since the last digest"""
+    try:
+        liker_ids = db_manager.pop_unnotified_likes(user_id)
+        if not liker_ids:
+            return
+        if len(liker_ids) == 1:
+            await send_like_notification(user_id, application, liker_ids[0])
+            return
+
+        user = db.get_user(user_id)
+        if not user:
+            return
+        lang = user.get('lang', 'ru')
+        count = len(liker_ids)
+
+        if lang == 'en':
+            text = f"❤️ {count} people liked your profile!"
+            button_text = "View Likes"
+        else:
+            text = f"❤️ Вашу анкету лайкнули {count} чел.!"
+            button_text = "Посмотреть лайки"
+
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton(button_text, callback_data="my_likes")
+        ]])
+
+        await application.bot.send_message(
+            chat_id=user_id,
+            text=text,
+            reply_markup=keyboard,
+            parse_mode=None
+        )
+        logger.info(f"Like digest ({count} likes) sent to user {user_id}")
+
+    except Exception as e:
+        logger.error(f"Error sending like digest to {user_id}: {e}")
+        raise  # counted as failed by the message dispatcher
 
 async def show_incoming_profile(query, user_id, target_id):
     """Show profile of someone who liked you"""
@@ -7510,10 +7139,7 @@ async def handle_like_back(query, context, user_id, target_id):
                 await query.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
         
         # Send mutual match notification to the other user
-        try:
-            await send_mutual_match_notification(target_id, context.application, current_user)
-        except Exception as notification_error:
-            logger.error(f"Failed to send mutual match notification: {notification_error}")
+        message_dispatcher.submit(send_mutual_match_notification, target_id, context.application, current_user, priority=PRIORITY_MATCH)
 
     except Exception as e:
         logger.error(f"Error in handle_like_back: {e}")
@@ -7571,14 +7197,10 @@ async def handle_like_incoming_profile(query, context, user_id, target_id):
         )
         
         # Send mutual match notification to the other user
-        try:
-            await send_mutual_match_notification(target_id, context.application, current_user)
-        except Exception as notification_error:
-            logger.error(f"Failed to send mutual match notification: {notification_error}")
+        message_dispatcher.submit(send_mutual_match_notification, target_id, context.application, current_user, priority=PRIORITY_MATCH)
 
-        # Wait a moment before showing next profile
-        await asyncio.sleep(2)
-        await show_next_incoming_like(query, context, user_id)
+        # Show next profile after a moment
+        schedule_followup(context, user_id, 2, show_next_incoming_like, query, context, user_id)
 
     except Exception as e:
         logger.error(f"Error in handle_like_incoming_profile: {e}")
@@ -7616,9 +7238,8 @@ async def handle_pass_incoming_profile(query, context, user_id, target_id):
             ]])
         )
 
-        # Wait a moment before showing next profile
-        await asyncio.sleep(1)
-        await show_next_incoming_like(query, context, user_id)
+        # Show next profile after a moment
+        schedule_followup(context, user_id, 1, show_next_incoming_like, query, context, user_id)
 
     except Exception as e:
         logger.error(f"Error passing incoming profile: {e}")
@@ -8125,6 +7746,339 @@ async def send_payment_invoice_from_message(update, user_id, amount):
             ]])
         )
 
+# ===== CALLBACK ROUTES =====
+
+callback_router = CallbackRouter()
+
+# Simple screens
+for _data, _handler in {
+    "view_profile": lambda query, context, user_id: show_user_profile(query, user_id),
+    "browse_profiles": browse_profiles,
+    "change_photo": start_change_photo,
+    "change_bio": start_change_bio,
+    "change_name": start_change_name,
+    "change_city": start_change_city,
+    "change_city_setting": start_change_city_setting,
+    "my_likes": show_my_likes_direct,
+    "profile_settings": lambda query, context, user_id: show_profile_settings_menu(query, user_id),
+    "statistics": lambda query, context, user_id: show_statistics(query, user_id),
+    "support_project": lambda query, context, user_id: show_support_menu(query, user_id),
+    "prev_profile": show_previous_profile,
+    "next_profile": show_next_profile,
+    "view_mutual_matches": show_mutual_matches,
+    "view_incoming_likes": show_incoming_likes_browse,
+    "prev_mutual_match": lambda query, context, user_id: navigate_mutual_matches(query, context, user_id, -1),
+    "next_mutual_match": lambda query, context, user_id: navigate_mutual_matches(query, context, user_id, 1),
+    "manage_symptoms": lambda query, context, user_id: show_nd_traits_menu(query, user_id),
+    "manage_symptoms_detailed": lambda query, context, user_id: show_detailed_symptoms_menu(query, user_id),
+    "add_nd_traits": lambda query, context, user_id: show_add_traits_menu(query, user_id),
+    "reg_traits_done": show_registration_nd_symptoms,
+    "reg_traits_skip": show_registration_nd_symptoms,
+    "reg_symptoms_done": finish_nd_registration,
+    "reg_symptoms_skip": finish_nd_registration,
+    "reg_symptoms_back": show_registration_nd_traits,
+    "search_by_traits": search_by_traits,
+    "next_nd_result": show_next_nd_result,
+    "pass_nd_profile": show_next_nd_result,
+    "compatibility_search": compatibility_search,
+    "recommendations": show_recommendations,
+    "next_compatibility": show_next_compatibility_result,
+    "prev_compatibility": show_prev_compatibility_result,
+    "pass_compatibility": show_next_compatibility_result,
+    "next_recommendation": show_next_recommendation_result,
+    "pass_recommendation": show_next_recommendation_result,
+    "next_incoming_like": show_next_incoming_like,
+    "admin_panel": lambda query, context, user_id: show_admin_panel(query, user_id),
+    "admin_reports": lambda query, context, user_id: show_admin_reports(query, user_id),
+    "admin_users": lambda query, context, user_id: show_admin_users(query, user_id),
+    "recreate_profile": lambda query, context, user_id: confirm_recreate_profile(query, user_id),
+    "reset_matches": lambda query, context, user_id: confirm_reset_matches(query, user_id),
+    "confirm_reset_matches": lambda query, context, user_id: reset_user_matches(query, user_id),
+    "feedback_complaint": lambda query, context, user_id: start_feedback(query, context, user_id, "complaint"),
+    "feedback_suggestion": lambda query, context, user_id: start_feedback(query, context, user_id, "suggestion"),
+    "feedback_support": lambda query, context, user_id: start_feedback(query, context, user_id, "support"),
+    "rate_app": lambda query, context, user_id: show_rating_menu(query, user_id),
+    "change_language": lambda query, context, user_id: change_language(query, user_id),
+    "change_interest_setting": start_change_interest_setting,
+    "delete_account": lambda query, context, user_id: confirm_delete_account(query, user_id),
+    "detailed_stats": lambda query, context, user_id: show_detailed_stats(query, user_id),
+    "continue_profile": continue_profile_creation,
+    "payment_method_stars": lambda query, context, user_id: show_stars_amounts(query, user_id),
+    "payment_method_ton": lambda query, context, user_id: show_ton_amounts(query, user_id),
+}.items():
+    callback_router.add_exact(_data, _handler)
+
+# Parameterized routes: prefix -> handler(query, context, user_id, *typed args)
+callback_router.add_prefix("like_back_", handle_like_back, int)
+callback_router.add_prefix("like_incoming_", handle_like_back, int)
+callback_router.add_prefix("like_", handle_like_profile, int)
+callback_router.add_prefix("pass_incoming_", lambda query, context, user_id, target_id: handle_decline_like(query, user_id, target_id), int)
+callback_router.add_prefix("pass_", lambda query, context, user_id, _target: handle_pass_profile(query, context, user_id))
+callback_router.add_prefix("decline_like_", lambda query, context, user_id, target_id: handle_decline_like(query, user_id, target_id), int)
+callback_router.add_prefix("send_message_", start_message_to_user, int)
+callback_router.add_prefix("send_video_", start_video_to_user, int)
+callback_router.add_prefix("view_match_profile_", lambda query, context, user_id, target_id: show_detailed_match_profile(query, user_id, target_id), int)
+callback_router.add_prefix("view_incoming_profile_", lambda query, context, user_id, target_id: show_incoming_profile(query, user_id, target_id), int)
+callback_router.add_prefix("toggle_trait_", lambda query, context, user_id, key: toggle_nd_trait(query, user_id, key))
+callback_router.add_prefix("toggle_symptom_", lambda query, context, user_id, key: toggle_nd_symptom(query, user_id, key))
+callback_router.add_prefix("reg_trait_", toggle_registration_trait)
+callback_router.add_prefix("reg_symptom_", toggle_registration_symptom)
+callback_router.add_prefix("report_user_", handle_report_user, int)
+callback_router.add_prefix("report_reason_", lambda query, context, user_id, reason, target_id: submit_user_report(query, context, user_id, target_id, reason), str, int)
+callback_router.add_prefix("rate_app_", lambda query, context, user_id, rating: save_app_rating(query, user_id, rating), int)
+callback_router.add_prefix("check_ton_", lambda query, context, user_id, payment_id: check_ton_payment_status(query, user_id, payment_id))
+
+@callback_router.exact("browse_all_profiles")
+async def _route_browse_all_profiles(query, context, user_id):
+    # Clear previous browsing data and start browsing
+    if context.user_data:
+        context.user_data.pop('browsing_profiles', None)
+        context.user_data.pop('current_profile_index', None)
+        context.user_data['browse_started'] = True
+    await start_browsing_profiles(query, context, user_id)
+
+@callback_router.exact("feedback")
+async def _route_feedback(query, context, user_id):
+    # Open Telegram channel for feedback
+    await query.edit_message_text(
+        "📝 Обратная связь\n\nПрисоединяйтесь к нашему каналу для обратной связи и обновлений:",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("📢 Alt3r Channel", url="https://t.me/Alt3rchannel")],
+            [InlineKeyboardButton(get_text(user_id, "back_button"), callback_data="back_to_menu")]
+        ])
+    )
+
+@callback_router.exact("back_to_menu")
+async def _route_back_to_menu(query, context, user_id):
+    # Clear any conversation state and lingering keyboards
+    if context.user_data:
+        context.user_data.clear()
+    
+    # Ultra-fast direct menu transition
+    await safe_edit_message(
+        query,
+        get_text(user_id, "main_menu"),
+        get_main_menu(user_id)
+    )
+
+@callback_router.exact("no_action")
+async def _route_no_action(query, context, user_id):
+    pass  # Already acknowledged, nothing to do
+
+@callback_router.exact("continue_browsing")
+async def _route_continue_browsing(query, context, user_id):
+    # Continue browsing profiles from where we left off
+    profiles = context.user_data.get('browsing_profiles', [])
+    current_index = context.user_data.get('current_profile_index', 0)
+    if profiles and current_index < len(profiles):
+        await show_profile_card(query, context, user_id, profiles[current_index])
+    else:
+        await browse_profiles(query, context, user_id)
+
+@callback_router.exact("reg_traits_back")
+async def _route_reg_traits_back(query, context, user_id):
+    # Go back to bio step
+    keyboard = [
+        [KeyboardButton(get_text(user_id, "btn_skip"))],
+        [KeyboardButton(get_text(user_id, "back_button"))]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+    
+    await query.message.reply_text(
+        get_text(user_id, "questionnaire_bio"),
+        reply_markup=reply_markup
+    )
+    
+    try:
+        await query.delete_message()
+    except:
+        pass
+        
+    return BIO
+
+async def _show_saved_notice(query, text):
+    """Confirm saved traits/symptoms, replacing the message if it cannot be edited"""
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("🔙 К настройкам", callback_data="manage_symptoms")
+    ]])
+    try:
+        await query.edit_message_text(text, reply_markup=keyboard)
+    except Exception:
+        try:
+            await query.delete_message()
+        except:
+            pass
+        await query.message.reply_text(text, reply_markup=keyboard)
+
+callback_router.add_exact("save_traits", lambda query, context, user_id: _show_saved_notice(query, "✅ Особенности сохранены!"))
+callback_router.add_exact("save_symptoms", lambda query, context, user_id: _show_saved_notice(query, "✅ Характеристики сохранены!"))
+
+@callback_router.prefix("interest_")
+async def _route_interest(query, context, user_id, interest):
+    db.create_or_update_user(user_id, {'interest': interest})
+    await query.edit_message_text(
+        "✅ Предпочтения обновлены!",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 К настройкам", callback_data="profile_settings")
+        ]])
+    )
+
+@callback_router.exact("confirm_recreate")
+async def _route_confirm_recreate(query, context, user_id):
+    # Start profile recreation
+    user = db.get_user(user_id)
+    current_lang = user.get('lang', 'ru') if user else 'ru'
+
+    # Keep the language setting but clear all other profile data
+    user_lang = user.get('lang', 'ru') if user else 'ru'
+
+    # Clear essential profile fields directly in the database to trigger registration flow
+    try:
+        from database_manager import db_manager
+        from models import User
+        
+        # Reset critical profile fields to NULL/empty to force re-registration
+        session = db_manager.get_session()
+        user_obj = session.query(User).filter_by(user_id=user_id).first()
+        if user_obj:
+            user_obj.name = None
+            user_obj.age = None  
+            user_obj.gender = None
+            user_obj.city = None
+            user_obj.bio = None
+            user_obj.photos = []
+            user_obj.photo_id = None
+            user_obj.media_type = None
+            user_obj.media_id = None
+            user_obj.nd_traits = []
+            user_obj.nd_symptoms = []
+            user_obj.lang = user_lang
+            session.commit()
+        session.close()
+        
+        logger.info(f"✅ Profile cleared for user {user_id} - ready for recreation")
+            
+    except Exception as e:
+        logger.error(f"Error clearing profile for user {user_id}: {e}")
+        # Fallback to previous method
+        reset_data = {
+            'lang': user_lang,
+            'photos': [],
+            'nd_traits': [],
+            'nd_symptoms': []
+        }
+        db.create_or_update_user(user_id, reset_data)
+
+    # Clear conversation data
+    if context.user_data:
+        context.user_data.clear()
+
+    if current_lang == 'en':
+        welcome_text = "🔄 Profile Recreation Started!\n\n✨ Let's create your new profile. We'll go through all the steps again.\n\nTo restart the profile creation process, please send /start"
+    else:
+        welcome_text = "🔄 Начинаем заполнение анкеты заново!\n\n✨ Давайте создадим вашу новую анкету. Мы пройдем все шаги заново.\n\nЧтобы начать создание анкеты, отправьте /start"
+
+    try:
+        await query.edit_message_text(welcome_text)
+    except:
+        await query.message.reply_text(welcome_text)
+
+@callback_router.exact("confirm_delete")
+async def _route_confirm_delete(query, context, user_id):
+    # Delete user account
+    user = db.get_user(user_id)
+    user_lang = user.get('lang', 'ru') if user else 'ru'
+    
+    if user_lang == 'en':
+        delete_message = "🗑️ Account deleted.\n\nGoodbye! Use /start if you want to return."
+    else:
+        delete_message = "🗑️ Аккаунт удален.\n\nДо свидания! Используйте /start если захотите вернуться."
+    
+    db.delete_user(user_id)
+    await query.edit_message_text(delete_message)
+
+@callback_router.exact("browse_anyway")
+async def _route_browse_anyway(query, context, user_id):
+    context.user_data['browse_started'] = True
+    context.user_data['use_filters'] = False
+    await start_browsing_profiles(query, context, user_id)
+
+@callback_router.exact("browse_all_unfiltered")
+async def _route_browse_all_unfiltered(query, context, user_id):
+    context.user_data['browse_started'] = True
+    context.user_data['use_filters'] = False
+    await start_browsing_unfiltered_profiles(query, context, user_id)
+
+@callback_router.prefix("lang_")
+async def _route_lang(query, context, user_id, lang):
+    db.update_user(user_id, {'lang': lang})
+    
+    # Check if this is a new user who needs to create a profile
+    user = db.get_user(user_id)
+    
+    if lang == 'ru':
+        success_text = "✅ Язык установлен: Русский"
+    else:
+        success_text = "✅ Language set: English"
+    
+    await query.edit_message_text(success_text)
+    
+    # If user has no profile data, start profile creation
+    if user and not is_profile_complete_dict(user):
+        welcome_text = get_text(user_id, "welcome")
+        age_text = get_text(user_id, "questionnaire_age")
+        
+        # Start profile creation with proper language in single message
+        if lang == 'en':
+            back_btn = "🔙 Back to main menu"
+        else:
+            back_btn = "🔙 Назад к главному меню"
+        
+        keyboard = [[KeyboardButton(back_btn)]]
+        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        
+        combined_text = f"{welcome_text}\n\n{age_text}"
+        # Sent directly, not as a follow-up: a tap during the delay would cancel it and leave no age prompt
+        await query.message.reply_text(combined_text, reply_markup=reply_markup)
+        
+        # Set conversation state properly
+        if context.user_data:
+            context.user_data.clear()
+        context.user_data['in_conversation'] = True
+        context.user_data['language_selected'] = True
+        # Note: We can't return a state here since this is in a callback handler
+    else:
+        # User has complete profile, show main menu
+        schedule_followup(
+            context, user_id, 1, query.message.reply_text,
+            get_text(user_id, "main_menu"),
+            reply_markup=get_main_menu(user_id)
+        )
+
+@callback_router.prefix("stars_", pass_update=True)
+async def _route_stars(update, context, user_id, amount_str):
+    if amount_str == "custom":
+        await start_custom_stars_amount(update.callback_query, context, user_id)
+    else:
+        amount = int(amount_str)
+        await send_stars_payment_invoice(update, context, user_id, amount)
+
+@callback_router.prefix("ton_")
+async def _route_ton(query, context, user_id, amount_str):
+    if amount_str == "custom":
+        await start_custom_ton_amount(query, context, user_id)
+    else:
+        amount = float(amount_str)
+        await send_ton_payment_invoice(query, user_id, amount, context)
+
+def warm_up_subsystems():
+    """Load what startup skips (NumPy, payments) once updates are flowing, off the event loop"""
+    warm_up_geo()
+    get_city_proximity_table()  # ~1s of city-name normalization, otherwise paid by the first no-GPS browse
+    get_texts()
+    import payment_system  # noqa: F401 - logs payment configuration status on load
+
+
 async def main():
     """Main function to run the bot"""
     from telegram.request import HTTPXRequest
@@ -8133,24 +8087,44 @@ async def main():
     import signal
     import sys
     
-    # Setup robust process management
-    if not process_manager.acquire_lock():
+    # Single-instance guard; with INSTANCE_STANDBY this waits as a hot standby until the leader exits
+    if not await process_manager.wait_for_lock():
         logger.error("Could not acquire process lock - another instance may be running")
         sys.exit(1)
     
-    # Setup signal handlers for clean shutdown
+    # SIGTERM/SIGINT request an orderly shutdown instead of exiting mid-loop
     process_manager.setup_signal_handlers()
     
     # Configure request with better timeout and retry settings
     request = HTTPXRequest(
-        connection_pool_size=1,
-        pool_timeout=10.0,
-        read_timeout=10.0,
-        write_timeout=10.0,
-        connect_timeout=10.0
+        connection_pool_size=int(os.getenv('BOT_POOL_SIZE', '32')),
+        pool_timeout=float(os.getenv('BOT_POOL_TIMEOUT', '10')),
+        read_timeout=float(os.getenv('BOT_READ_TIMEOUT', '10')),
+        write_timeout=float(os.getenv('BOT_WRITE_TIMEOUT', '10')),
+        connect_timeout=float(os.getenv('BOT_CONNECT_TIMEOUT', '10'))
     )
     
-    application = ApplicationBuilder().token(TOKEN).request(request).build()
+    # Different users are processed in parallel, each user's updates stay in order
+    update_processor = PerUserUpdateProcessor(
+        max_concurrent_updates=int(os.getenv('BOT_CONCURRENT_UPDATES', '64')),
+        max_pending_updates=int(os.getenv('BOT_MAX_PENDING_UPDATES', '512'))
+    )
+    
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .request(request)
+        .concurrent_updates(update_processor)
+        # Updates past BOT_MAX_PENDING_UPDATES wait here; a full queue pauses polling
+        .update_queue(AdmissionQueue(update_processor))
+        .rate_limiter(rate_limiter)
+    )
+    # Alternative Bot API server (self-hosted telegram-bot-api, or load_test.py's stand-in)
+    api_base_url = os.getenv('TELEGRAM_API_BASE_URL', '').rstrip('/')
+    if api_base_url:
+        builder = builder.base_url(f"{api_base_url}/bot").base_file_url(f"{api_base_url}/file/bot")
+        logger.info(f"Using Bot API server at {api_base_url}")
+    application = builder.build()
     
     # Set bot commands
     async def post_init(application):
@@ -8161,8 +8135,29 @@ async def main():
             BotCommand("help", "❓ Помощь / Help")
         ]
         await application.bot.set_my_commands(commands)
+        # Warm up the shared outbound HTTP client (geocoding, TON API)
+        await http_client.start()
+        await message_dispatcher.start()
+        await like_digest.start(application, send_like_digest, db_manager.get_users_with_unnotified_likes)
+        # Schema changes are applied by `python migrations.py upgrade`, not here
+        check_schema(engine)
+        # Build the spatial index used for nearby browsing
+        try:
+            geo_index.load(db_manager.get_user_locations())
+        except Exception as e:
+            logger.warning(f"Geo index load failed, browsing will scan all users: {e}")
+    
+    # Long-running jobs started once polling is up; cancelled on shutdown
+    background_tasks = []
+
+    async def post_shutdown(application):
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await http_client.close()
     
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
 
     # Conversation handler for profile creation
     conv_handler = ConversationHandler(
@@ -8215,6 +8210,8 @@ async def main():
     )
 
     # Add handlers
+    # A new update from a user cancels their pending follow-up (next card, menu refresh)
+    application.add_handler(TypeHandler(Update, supersede_followups), group=-1)
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler("restart", restart))
     # Note: menu handler already registered in conv_handler - no need to duplicate
@@ -8222,6 +8219,7 @@ async def main():
     application.add_handler(CommandHandler("language", show_language_command))
     application.add_handler(CommandHandler("help", show_help_command))
     application.add_handler(CommandHandler("debug", debug_profiles))
+    application.add_handler(CommandHandler("perf", show_loop_stalls))
     
     # Add payment handlers for Telegram Stars and TON
     from telegram.ext import PreCheckoutQueryHandler
@@ -8232,17 +8230,35 @@ async def main():
     application.add_handler(CallbackQueryHandler(handle_callback))
     application.add_handler(MessageHandler(filters.ALL, handle_message))
 
-    # Start keep-alive server
-    start_keep_alive()
+    # Metrics: handler latencies, SQL statements, caches and queue depths
+    instrument_handlers(application)
+    instrument_engine(engine)
+    track_lru_cache('normalize_city', normalize_city)
+    track_lru_cache('city_slug', city_slug)
+    # PTB hands updates to tasks immediately, so the backlog lives in the processor, not the queue
+    QUEUE_DEPTH.set_function('updates', fn=lambda: update_processor.backlog(application.update_queue))
+    QUEUE_DEPTH.set_function('updates_waiting', fn=lambda: application.update_queue.qsize())
+
+    use_webhook = webhook_enabled()
+    if use_webhook and not WEBHOOK_URL:
+        logger.error("BOT_MODE=webhook requires WEBHOOK_URL, falling back to polling")
+        use_webhook = False
+    if use_webhook and not WEBHOOK_SECRET:
+        logger.error("BOT_MODE=webhook requires WEBHOOK_SECRET - refusing to accept unauthenticated updates")
+        process_manager.release_lock()
+        sys.exit(1)
+    
+    # Ops endpoints (and webhook updates) share one server on the bot's loop
+    web_server.monitor(application, engine)
+    if use_webhook:
+        web_server.enable_webhook(application)
+    loop_monitor.start()
+    await web_server.start()
     
-    # Run one-time migration for existing users (NEW)
-    try:
-        await migrate_existing_city_slugs()
-    except Exception as e:
-        logger.warning(f"Migration failed but bot will continue: {e}")
-
     # Initialize the application
     await application.initialize()
+    # post_init/post_shutdown only fire automatically under run_polling(), so call them here
+    await post_init(application)
     
     # Run the bot
     logger.info("Starting Alt3r bot...")
@@ -8252,21 +8268,39 @@ async def main():
     while retry_count < max_retries:
         try:
             logger.info(f"Attempt {retry_count + 1}/{max_retries} to start bot...")
-            # Start polling manually using the updater
             await application.start()
-            await application.updater.start_polling(
-                drop_pending_updates=True,
-                timeout=15,  # Wait up to 15 seconds for new updates
-                poll_interval=2.0  # Wait 2 seconds between polling attempts
-            )
-            # Keep the bot running
+            web_server.set_ready(True)
+            if use_webhook:
+                await application.bot.set_webhook(
+                    url=webhook_url(),
+                    secret_token=WEBHOOK_SECRET,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=True
+                )
+                logger.info(f"Receiving updates via webhook at {webhook_url()}")
+            else:
+                # Start polling manually using the updater
+                await application.updater.start_polling(
+                    drop_pending_updates=True,
+                    timeout=15,  # Wait up to 15 seconds for new updates
+                    poll_interval=float(os.getenv('BOT_POLL_INTERVAL', '2.0'))  # Wait between polling attempts
+                )
+            # Backfill city slugs and load deferred subsystems without delaying startup
+            if not background_tasks:
+                background_tasks.append(asyncio.create_task(migrate_existing_city_slugs()))
+                background_tasks.append(asyncio.create_task(asyncio.to_thread(warm_up_subsystems)))
+            # Keep the bot running until SIGTERM/SIGINT (or lost leadership), then shut down in order
             try:
-                import asyncio
-                await asyncio.Event().wait()  # Wait indefinitely
-            except KeyboardInterrupt:
-                logger.info("Bot stopped by user")
+                await process_manager.shutdown_requested.wait()
+                logger.info("Shutdown requested, stopping bot...")
             finally:
-                await application.updater.stop()
+                web_server.set_ready(False)
+                if not use_webhook:
+                    await application.updater.stop()
+                # Flush pending digests and queued notifications while the bot can still send
+                await like_digest.stop()
+                await message_dispatcher.stop()
                 await application.stop()
             break
         except Conflict as e:
@@ -8274,7 +8308,6 @@ async def main():
             logger.warning(f"Bot conflict detected (attempt {retry_count}): {e}")
             if retry_count < max_retries:
                 logger.info("Waiting 5 seconds before retry...")
-                import asyncio
                 await asyncio.sleep(5)
             else:
                 logger.error("Max retries reached. Another bot instance may be running.")
@@ -8292,6 +8325,9 @@ async def main():
     
     # Final cleanup
     await application.shutdown()
+    await post_shutdown(application)
+    await web_server.stop()
+    await loop_monitor.stop()
     process_manager.release_lock()
     logger.info("Bot shutdown complete")
 
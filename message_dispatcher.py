@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Outbound message dispatcher for Alt3r Bot
+Keeps Bot API traffic inside Telegram's flood limits: a rate limiter with
+global and per-chat token buckets (interactive replies ahead of background
+notifications, automatic RetryAfter backoff, jittered retries), and a
+priority queue that delivers notifications off the handler's critical path.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import itertools
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.ext import BaseRateLimiter
+
+from metrics import BOT_API_LATENCY, BOT_API_ERRORS, DISPATCH_LATENCY, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits: ~30 messages/s overall, ~1 message/s per private chat
+DISPATCH_GLOBAL_RATE = float(os.getenv('DISPATCH_GLOBAL_RATE', '30'))
+DISPATCH_NOTIFY_RATE = float(os.getenv('DISPATCH_NOTIFY_RATE', '20'))  # share left for notifications
+DISPATCH_CHAT_RATE = float(os.getenv('DISPATCH_CHAT_RATE', '1'))
+DISPATCH_CHAT_BURST = int(os.getenv('DISPATCH_CHAT_BURST', '3'))
+DISPATCH_MAX_RETRIES = int(os.getenv('DISPATCH_MAX_RETRIES', '3'))
+DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', '8'))
+DISPATCH_QUEUE_SIZE = int(os.getenv('DISPATCH_QUEUE_SIZE', '10000'))
+
+# Priorities (lower runs first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_MATCH = 1
+PRIORITY_MESSAGE = 2
+PRIORITY_NOTIFICATION = 3
+
+# Priority of the Bot API calls made by the current task
+_current_priority: ContextVar[int] = ContextVar('dispatch_priority', default=PRIORITY_INTERACTIVE)
+
+# Transport failures that guarantee the request never reached Telegram
+_NOT_SENT = (httpx.PoolTimeout, httpx.ConnectTimeout, httpx.ConnectError)
+
+
+def _safe_to_retry(endpoint: str, error: NetworkError) -> bool:
+    """Whether a call that failed with a network error can be repeated without side effects"""
+    if not endpoint.startswith('send'):
+        return True  # edits, answers and reads can be repeated
+    # A send that timed out or dropped mid-request may already have been delivered
+    return isinstance(error.__cause__, _NOT_SENT)
+
+
+class TokenBucket:
+    """Reservation-style token bucket: callers reserve a token and sleep until it is due"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Take one token and return how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """Hold all reservations for `seconds` (after a RetryAfter)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        now = time.monotonic()
+        return (self.tokens + (now - self.updated) * self.rate >= self.capacity
+                and now >= self.blocked_until)
+
+
+class DispatchRateLimiter(BaseRateLimiter[int]):
+    """PTB rate limiter applying global and per-chat token buckets to every Bot API call.
+
+    Background calls (priority above PRIORITY_INTERACTIVE) also draw from a
+    smaller notification bucket, which leaves headroom in the global budget
+    for interactive replies. RetryAfter pauses the affected bucket and the
+    call is retried; network errors are retried with jittered backoff, except
+    for sends that may already have been delivered. BadRequest is never retried.
+    """
+
+    def __init__(self, global_rate: float = DISPATCH_GLOBAL_RATE,
+                 notify_rate: float = DISPATCH_NOTIFY_RATE,
+                 chat_rate: float = DISPATCH_CHAT_RATE,
+                 chat_burst: int = DISPATCH_CHAT_BURST,
+                 max_retries: int = DISPATCH_MAX_RETRIES):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._notify = TokenBucket(notify_rate, notify_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[int, TokenBucket] = {}
+        self._max_retries = max_retries
+        self.retry_after_count = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # Forget chats whose bucket has fully refilled
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle}
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    @staticmethod
+    async def _timed_call(endpoint, callback, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception as e:
+            BOT_API_ERRORS.inc(endpoint, type(e).__name__)
+            raise
+        finally:
+            BOT_API_LATENCY.observe(endpoint, value=time.perf_counter() - started)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = _current_priority.get() if rate_limit_args is None else rate_limit_args
+        chat_bucket = None
+        chat_id = data.get('chat_id')
+        if endpoint.startswith('send') and chat_id is not None:
+            try:
+                chat_bucket = self._chat_bucket(int(chat_id))
+            except (TypeError, ValueError):
+                pass
+
+        attempt = 0
+        while True:
+            wait = self._global.reserve()
+            if priority > PRIORITY_INTERACTIVE:
+                wait = max(wait, self._notify.reserve())
+            if chat_bucket is not None:
+                wait = max(wait, chat_bucket.reserve())
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                return await self._timed_call(endpoint, callback, args, kwargs)
+            except RetryAfter as e:
+                self.retry_after_count += 1
+                if attempt >= self._max_retries:
+                    raise
+                delay = float(e.retry_after) + random.uniform(0, 0.5)
+                logger.warning(f"Flood control on {endpoint} (chat {chat_id}), retrying in {delay:.1f}s")
+                (chat_bucket or self._global).block(delay)
+            except BadRequest:
+                # Deterministic 400s ("message is not modified", "query is too old") fail the same way again
+                raise
+            except (TimedOut, NetworkError) as e:
+                if attempt >= self._max_retries or not _safe_to_retry(endpoint, e):
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            attempt += 1
+
+
+class MessageDispatcher:
+    """Priority queue of outbound notification jobs drained by a worker pool"""
+
+    def __init__(self, workers: int = DISPATCH_WORKERS, maxsize: int = DISPATCH_QUEUE_SIZE):
+        self.workers = workers
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize)
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        """Start the worker pool (idempotent)"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"Message dispatcher started with {self.workers} workers")
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued jobs `timeout` seconds to drain, then stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Message dispatcher stopped with {self.queue_depth} jobs pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, func: Callable[..., Awaitable[Any]], *args,
+               priority: int = PRIORITY_NOTIFICATION) -> bool:
+        """Queue `func(*args)` for background delivery; returns False if the queue is full"""
+        try:
+            self._queue.put_nowait((priority, next(self._seq), time.monotonic(), func, args))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Dispatch queue full, dropping {getattr(func, '__name__', func)}")
+            return False
+
+    async def _worker(self):
+        while True:
+            priority, _, enqueued, func, args = await self._queue.get()
+            token = _current_priority.set(priority)
+            try:
+                await func(*args)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dispatch job {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                _current_priority.reset(token)
+                latency = time.monotonic() - enqueued
+                self._latencies.append(latency)
+                DISPATCH_LATENCY.observe(priority, value=latency)
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, outcome counters and delivery latency percentiles"""
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> Optional[float]:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+        return {
+            'queue_depth': self.queue_depth,
+            'sent': self.sent,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'latency_p50': pct(0.5),
+            'latency_p95': pct(0.95),
+        }
+
+
+# Global instances
+rate_limiter = DispatchRateLimiter()
+message_dispatcher = MessageDispatcher()
+
+QUEUE_DEPTH.set_function('dispatch', fn=lambda: message_dispatcher.queue_depth)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Metrics for Alt3r Bot
+A small Prometheus-compatible registry (counters, gauges, histograms with
+labels) rendered in the text exposition format, plus helpers that
+instrument handlers and the SQLAlchemy engine.
+"""
+
+import time
+import asyncio
+import logging
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Current value per label set, either set directly or read from callbacks at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, *labels, fn: Callable[[], float]):
+        """Evaluate `fn()` on every scrape"""
+        self._callbacks[self._key(labels)] = fn
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, fn in list(self._callbacks.items()):
+            try:
+                items.append((key, fn()))
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Bucketed distribution per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., +Inf, sum
+
+    def observe(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += n
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+    def time(self, *labels):
+        """Context manager observing the elapsed wall time"""
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Text exposition format (Prometheus 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Global registry and the bot's metrics
+registry = Registry()
+
+HANDLER_LATENCY = registry.histogram(
+    'bot_handler_duration_seconds', 'Time spent in update handlers', ['handler'])
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Update handlers that raised', ['handler'])
+CALLBACK_LATENCY = registry.histogram(
+    'bot_callback_route_duration_seconds', 'Time spent per callback route', ['route'])
+CALLBACK_ERRORS = registry.counter(
+    'bot_callback_route_errors_total', 'Callback routes that raised', ['route'])
+DB_QUERIES = registry.counter(
+    'bot_db_queries_total', 'SQL statements executed', ['operation'])
+DB_QUERY_LATENCY = registry.histogram(
+    'bot_db_query_duration_seconds', 'SQL statement execution time', ['operation'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+BOT_API_LATENCY = registry.histogram(
+    'bot_api_request_duration_seconds', 'Telegram Bot API call latency', ['endpoint'])
+BOT_API_ERRORS = registry.counter(
+    'bot_api_errors_total', 'Telegram Bot API call failures', ['endpoint', 'error'])
+DISPATCH_LATENCY = registry.histogram(
+    'bot_dispatch_delivery_seconds', 'Queue-to-delivery time of background notifications', ['priority'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+BROWSE_CANDIDATES = registry.histogram(
+    'bot_browse_candidates', 'Candidate profiles loaded per browse', ['source'],
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, 100000))
+QUEUE_DEPTH = registry.gauge(
+    'bot_queue_depth', 'Items waiting in internal queues', ['queue'])
+CACHE_HITS = registry.gauge(
+    'bot_cache_hits', 'Cache hits since start', ['cache'])
+CACHE_MISSES = registry.gauge(
+    'bot_cache_misses', 'Cache misses since start', ['cache'])
+CACHE_HIT_RATIO = registry.gauge(
+    'bot_cache_hit_ratio', 'Cache hits / lookups since start', ['cache'])
+LOOP_LAG = registry.histogram(
+    'bot_event_loop_lag_seconds', 'Delay between a timer being due and the loop running it',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+SLOW_CALLBACKS = registry.counter(
+    'bot_slow_callbacks_total', 'Loop stalls longer than the slow-callback threshold', ['handler'])
+HANDLERS_IN_FLIGHT = registry.gauge(
+    'bot_handlers_in_flight', 'Handler callbacks currently running')
+UPDATE_QUERIES = registry.histogram(
+    'bot_db_queries_per_update', 'SQL statements issued while processing one update', ['handler'],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, 500))
+UPDATE_DB_TIME = registry.histogram(
+    'bot_db_seconds_per_update', 'Total SQL time while processing one update', ['handler'])
+QUERY_BUDGET_EXCEEDED = registry.counter(
+    'bot_db_query_budget_exceeded_total', 'Updates that issued more statements than the budget', ['handler'])
+REPEATED_QUERIES = registry.counter(
+    'bot_db_repeated_query_total', 'Updates repeating one statement shape (N+1 suspects)', ['handler'])
+
+# Called as observer(statement, seconds) after every SQL statement
+QUERY_OBSERVERS: List[Callable[[str, float], None]] = []
+
+# Task -> (handler name, callback data) of the handler that task is running
+_in_flight: Dict[Any, Tuple[str, Optional[str]]] = {}
+HANDLERS_IN_FLIGHT.set_function(fn=lambda: len(_in_flight))
+
+
+def handler_in_flight(task) -> Optional[Tuple[str, Optional[str]]]:
+    """(handler, callback data) of the instrumented handler `task` is running, if any"""
+    return _in_flight.get(task)
+
+
+def track_lru_cache(name: str, cached_fn):
+    """Export hit/miss counters and hit ratio of a functools.lru_cache function"""
+    def ratio():
+        info = cached_fn.cache_info()
+        lookups = info.hits + info.misses
+        return info.hits / lookups if lookups else 0.0
+
+    CACHE_HITS.set_function(name, fn=lambda: cached_fn.cache_info().hits)
+    CACHE_MISSES.set_function(name, fn=lambda: cached_fn.cache_info().misses)
+    CACHE_HIT_RATIO.set_function(name, fn=ratio)
+
+
+def timed_handler(callback, name: Optional[str] = None):
+    """Wrap a PTB handler callback so its latency and failures are recorded"""
+    label = name or getattr(callback, '__name__', repr(callback))
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        task = asyncio.current_task()
+        query = getattr(update, 'callback_query', None)
+        _in_flight[task] = (label, getattr(query, 'data', None))
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(label)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(label, value=time.perf_counter() - started)
+            _in_flight.pop(task, None)
+
+    wrapper.__wrapped_handler__ = True
+    return wrapper
+
+
+def instrument_handlers(application):
+    """Time every registered handler callback, including those nested in ConversationHandlers"""
+    from telegram.ext import ConversationHandler
+
+    def wrap(handler):
+        if isinstance(handler, ConversationHandler):
+            for nested in handler.entry_points + handler.fallbacks:
+                wrap(nested)
+            for state_handlers in handler.states.values():
+                for nested in state_handlers:
+                    wrap(nested)
+        elif hasattr(handler, 'callback') and not getattr(handler.callback, '__wrapped_handler__', False):
+            handler.callback = timed_handler(handler.callback)
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            wrap(handler)
+
+
+def instrument_engine(engine):
+    """Count and time every SQL statement executed through `engine`"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        DB_QUERIES.inc(operation)
+        DB_QUERY_LATENCY.observe(operation, value=elapsed)
+        for observer in QUERY_OBSERVERS:
+            observer(statement, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
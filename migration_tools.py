@@ -11,17 +11,90 @@ Features:
 - Zero-downtime migration support
 """
 
+import io
+import gzip
 import json
 import os
+import time
 import psycopg2
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from psycopg2 import sql
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 import subprocess
 import shutil
 
+from migrations import upgrade as upgrade_schema
+
+try:
+    import zstandard
+except ImportError:  # optional: backups fall back to gzip
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+BACKUP_FORMAT_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+DELTAS_DIR = 'deltas'  # incremental backups live inside their base backup
+BACKUP_FETCH_SIZE = 5000  # rows per server-side cursor round trip
+BACKUP_JOBS = int(os.getenv('BACKUP_JOBS', '3'))  # tables exported/restored in parallel
+BACKUP_COMPRESSION = os.getenv('BACKUP_COMPRESSION', 'zstd' if zstandard else 'gzip')
+COMPRESSION_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz', 'none': ''}
+BACKUP_DELTA_OVERLAP = int(os.getenv('BACKUP_DELTA_OVERLAP', '300'))  # seconds re-read before the watermark
+
+# Table -> upsert key, columns left to the target's defaults, whether existing rows are
+# overwritten, and the column that marks changed rows (None: append-only table)
+BACKUP_TABLES = {
+    'users': {'key': 'user_id', 'skip': ('id',), 'update': True, 'changed': 'updated_at'},
+    'feedback': {'key': 'id', 'skip': (), 'update': False, 'changed': None},
+    'ai_sessions': {'key': 'id', 'skip': (), 'update': False, 'changed': None},
+}
+
+# (opener of an NDJSON stream, keys deleted before it is applied)
+RestoreStep = Tuple[Callable[[], BinaryIO], List[int]]
+
+
+def _open_backup_file(path: str, mode: str) -> BinaryIO:
+    """Open a backup table file for 'rb' or 'wb', compressed according to its extension"""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed (pip install zstandard) - needed for .zst backups")
+        raw = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(raw)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def _ndjson_buffer(rows: List[Dict[str, Any]]) -> BinaryIO:
+    """Rows of a legacy JSON backup as an NDJSON stream"""
+    return io.BytesIO(b''.join(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n' for row in rows))
+
+
+def _read_keys(path: str) -> Iterator[int]:
+    with _open_backup_file(path, 'rb') as f:
+        for line in f:
+            yield int(line)
+
+
+def _deleted_keys(previous: Iterable[int], current: Iterable[int]) -> List[int]:
+    """Keys of sorted `previous` missing from sorted `current` (merge, constant memory)"""
+    deleted = []
+    current = iter(current)
+    head = next(current, None)
+    for key in previous:
+        while head is not None and head < key:
+            head = next(current, None)
+        if head != key:
+            deleted.append(key)
+    for _ in current:  # drain: the caller may be writing keys out as they are consumed
+        pass
+    return deleted
+
 class DatabaseMigrator:
     """Handle database backup, restore, and migration operations"""
     
@@ -31,134 +104,211 @@ class DatabaseMigrator:
         self.backup_dir = 'backups'
         os.makedirs(self.backup_dir, exist_ok=True)
     
-    def create_full_backup(self, backup_name: str = None) -> str:
-        """Create complete database backup with timestamp"""
+    def create_full_backup(self, backup_name: str = None, jobs: int = BACKUP_JOBS,
+                           compression: str = BACKUP_COMPRESSION) -> str:
+        """Stream every table to compressed NDJSON, one file per table, in parallel"""
         if not backup_name:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_name = f"alt3r_backup_{timestamp}"
         
-        backup_file = os.path.join(self.backup_dir, f"{backup_name}.json")
+        backup_path = os.path.join(self.backup_dir, backup_name)
+        started = time.monotonic()
         
         try:
-            # Connect to database
-            conn = psycopg2.connect(self.source_db_url)
-            cur = conn.cursor()
-            
-            backup_data = {
-                'metadata': {
-                    'backup_date': datetime.now().isoformat(),
-                    'database_type': 'postgresql',
-                    'bot_version': 'alt3r_v1.0',
-                    'tables': []
-                },
-                'data': {}
-            }
+            manifest = self._write_backup(backup_path, 'full', jobs, compression)
             
-            # Backup users table
-            cur.execute("""
-                SELECT user_id, lang, username, first_name, name, age, gender, 
-                       interest, city, bio, photos, photo_id, media_type, media_id,
-                       latitude, longitude, nd_traits, nd_symptoms, seeking_traits,
-                       likes, sent_likes, received_likes, unnotified_likes, 
-                       declined_likes, ratings, total_rating, rating_count,
-                       created_at, updated_at, last_active
-                FROM users ORDER BY user_id
-            """)
+            logger.info(f"Backup created: {backup_path}")
+            print(f"✅ Complete backup saved: {backup_path}")
+            print(f"   Users: {manifest['tables'].get('users', {}).get('rows', 0)}")
+            print(f"   Tables: {', '.join(manifest['tables'])}")
+            print(f"   Size: {self._backup_size(backup_path, manifest) / 1024 / 1024:.1f} MB "
+                  f"({compression}) in {time.monotonic() - started:.1f}s")
             
-            users_data = []
-            for row in cur.fetchall():
-                user_dict = {
-                    'user_id': row[0],
-                    'lang': row[1],
-                    'username': row[2],
-                    'first_name': row[3],
-                    'name': row[4],
-                    'age': row[5],
-                    'gender': row[6],
-                    'interest': row[7],
-                    'city': row[8],
-                    'bio': row[9],
-                    'photos': row[10],
-                    'photo_id': row[11],
-                    'media_type': row[12],
-                    'media_id': row[13],
-                    'latitude': row[14],
-                    'longitude': row[15],
-                    'nd_traits': row[16],
-                    'nd_symptoms': row[17],
-                    'seeking_traits': row[18],
-                    'likes': row[19],
-                    'sent_likes': row[20],
-                    'received_likes': row[21],
-                    'unnotified_likes': row[22],
-                    'declined_likes': row[23],
-                    'ratings': row[24],
-                    'total_rating': float(row[25]) if row[25] else 0.0,
-                    'rating_count': row[26],
-                    'created_at': row[27].isoformat() if row[27] else None,
-                    'updated_at': row[28].isoformat() if row[28] else None,
-                    'last_active': row[29].isoformat() if row[29] else None
-                }
-                users_data.append(user_dict)
+            return backup_path
             
-            backup_data['data']['users'] = users_data
-            backup_data['metadata']['tables'].append('users')
+        except Exception as e:
+            logger.error(f"Backup failed: {e}")
+            print(f"❌ Backup failed: {e}")
+            return None
+    
+    def create_incremental_backup(self, base_path: str = None, jobs: int = BACKUP_JOBS,
+                                  compression: str = BACKUP_COMPRESSION) -> str:
+        """Back up only what changed since the last backup of a set (base + deltas)"""
+        base_path = base_path or self._latest_full_backup()
+        if not base_path:
+            print("❌ No full backup to build on - run 'backup' first")
+            return None
+        
+        started = time.monotonic()
+        
+        try:
+            previous_path = (self._deltas(base_path) or [base_path])[-1]
+            previous = self._read_manifest(previous_path)
+            delta_path = os.path.join(base_path, DELTAS_DIR, datetime.now().strftime('%Y%m%d_%H%M%S'))
+            manifest = self._write_backup(delta_path, 'delta', jobs, compression, previous_path, previous)
             
-            # Backup feedback table if exists
-            try:
-                cur.execute("SELECT * FROM feedback ORDER BY id")
-                feedback_data = []
-                for row in cur.fetchall():
-                    feedback_dict = {
-                        'id': row[0],
-                        'user_id': row[1],
-                        'feedback_text': row[2],
-                        'created_at': row[3].isoformat() if row[3] else None
-                    }
-                    feedback_data.append(feedback_dict)
-                backup_data['data']['feedback'] = feedback_data
-                backup_data['metadata']['tables'].append('feedback')
-            except:
-                logger.info("Feedback table not found, skipping")
+            logger.info(f"Incremental backup created: {delta_path}")
+            print(f"✅ Incremental backup saved: {delta_path}")
+            for table, entry in manifest['tables'].items():
+                print(f"   {table}: {entry['rows']} changed, {len(entry['deleted'])} deleted")
+            print(f"   Size: {self._backup_size(delta_path, manifest) / 1024:.1f} KB "
+                  f"in {time.monotonic() - started:.1f}s")
             
-            # Backup AI sessions table if exists
-            try:
-                cur.execute("SELECT * FROM ai_sessions ORDER BY id")
-                ai_sessions_data = []
-                for row in cur.fetchall():
-                    session_dict = {
-                        'id': row[0],
-                        'user_id': row[1],
-                        'session_data': row[2],
-                        'created_at': row[3].isoformat() if row[3] else None
-                    }
-                    ai_sessions_data.append(session_dict)
-                backup_data['data']['ai_sessions'] = ai_sessions_data
-                backup_data['metadata']['tables'].append('ai_sessions')
-            except:
-                logger.info("AI sessions table not found, skipping")
+            return delta_path
             
-            # Save backup
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Incremental backup failed: {e}")
+            print(f"❌ Incremental backup failed: {e}")
+            return None
+    
+    def _write_backup(self, backup_path: str, kind: str, jobs: int, compression: str,
+                      previous_path: str = None, previous: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Export all tables (or their changes since `previous`) into backup_path and write its manifest"""
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"unknown compression {compression} (use {', '.join(COMPRESSION_SUFFIXES)})")
+        suffix = COMPRESSION_SUFFIXES[compression]
+        os.makedirs(backup_path, exist_ok=True)
+        
+        # Workers share one exported snapshot so the tables are mutually consistent
+        coordinator = psycopg2.connect(self.source_db_url)
+        try:
+            coordinator.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with coordinator.cursor() as cur:
+                cur.execute("SELECT pg_export_snapshot()")
+                snapshot = cur.fetchone()[0]
             
-            cur.close()
-            conn.close()
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                futures = {
+                    table: pool.submit(self._export_table, table, backup_path, suffix, snapshot,
+                                       previous_path, (previous or {}).get('tables', {}).get(table))
+                    for table in BACKUP_TABLES
+                }
+                entries = {table: future.result() for table, future in futures.items()}
+        finally:
+            coordinator.close()
+        
+        for table, entry in entries.items():
+            if entry is None:
+                logger.info(f"{table} table not found, skipping")
+        
+        manifest = {
+            'format': BACKUP_FORMAT_VERSION,
+            'kind': kind,
+            'backup_date': datetime.now().isoformat(),
+            'database_type': 'postgresql',
+            'bot_version': 'alt3r_v1.0',
+            'compression': compression,
+            'tables': {table: entry for table, entry in entries.items() if entry is not None}
+        }
+        if previous_path:
+            manifest['previous'] = os.path.basename(previous_path)
+        
+        # The manifest is written last: a backup without one is incomplete
+        with open(os.path.join(backup_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return manifest
+    
+    def _export_table(self, table: str, backup_path: str, suffix: str, snapshot: Optional[str],
+                      previous_path: str = None, previous: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Write one table's rows (all, or those changed since `previous`) and its key list
+        through server-side cursors; None if the table is missing"""
+        spec = BACKUP_TABLES[table]
+        key = sql.Identifier(spec['key'])
+        # Append-only tables have no change column: new rows are the ones past the last key
+        marker = sql.Identifier(spec['changed'] or spec['key'])
+        entry = {'file': f"{table}.ndjson{suffix}", 'keys': f"{table}.keys{suffix}", 'rows': 0}
+        
+        conn = psycopg2.connect(self.source_db_url)
+        try:
+            conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with conn.cursor() as cur:
+                if snapshot:
+                    cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                cur.execute("SELECT to_regclass(%s)", (table,))
+                if cur.fetchone()[0] is None:
+                    return None
             
-            logger.info(f"Backup created: {backup_file}")
-            print(f"✅ Complete backup saved: {backup_file}")
-            print(f"   Users: {len(users_data)}")
-            print(f"   Tables: {', '.join(backup_data['metadata']['tables'])}")
+            query = sql.SQL("SELECT {}, row_to_json(t)::text FROM {} t").format(marker, sql.Identifier(table))
+            params = ()
+            watermark = previous.get('watermark') if previous else None
+            if watermark is not None:
+                if spec['changed']:
+                    # Re-read a window before the watermark: updated_at is stamped before commit
+                    watermark = datetime.fromisoformat(watermark)
+                    since = watermark - timedelta(seconds=BACKUP_DELTA_OVERLAP)
+                else:
+                    since = watermark
+                query += sql.SQL(" WHERE {} > %s").format(marker)
+                params = (since,)
+            query += sql.SQL(" ORDER BY {}").format(key)
             
-            return backup_file
+            with conn.cursor(name=f"backup_{table}") as cur, \
+                    _open_backup_file(os.path.join(backup_path, entry['file']), 'wb') as out:
+                cur.itersize = BACKUP_FETCH_SIZE
+                cur.execute(query, params)
+                while True:
+                    batch = cur.fetchmany(BACKUP_FETCH_SIZE)
+                    if not batch:
+                        break
+                    out.write(b''.join(row[1].encode('utf-8') + b'\n' for row in batch))
+                    latest = max((row[0] for row in batch if row[0] is not None), default=None)
+                    if latest is not None and (watermark is None or latest > watermark):
+                        watermark = latest
+                    entry['rows'] += len(batch)
+            entry['watermark'] = watermark.isoformat() if isinstance(watermark, datetime) else watermark
             
-        except Exception as e:
-            logger.error(f"Backup failed: {e}")
-            print(f"❌ Backup failed: {e}")
-            return None
+            # Every backup keeps the full sorted key list; a delta's tombstones are the
+            # keys that were in the previous backup and are gone now
+            previous_keys = (os.path.join(previous_path, previous['keys'])
+                             if previous and previous.get('keys') else None)
+            with conn.cursor(name=f"backup_{table}_keys") as cur, \
+                    _open_backup_file(os.path.join(backup_path, entry['keys']), 'wb') as out:
+                cur.itersize = BACKUP_FETCH_SIZE
+                cur.execute(sql.SQL("SELECT {0} FROM {1} ORDER BY {0}").format(key, sql.Identifier(table)))
+                
+                def current_keys():
+                    while True:
+                        batch = cur.fetchmany(BACKUP_FETCH_SIZE)
+                        if not batch:
+                            return
+                        out.write(b''.join(b'%d\n' % row[0] for row in batch))
+                        yield from (row[0] for row in batch)
+                
+                if previous_keys:
+                    entry['deleted'] = _deleted_keys(_read_keys(previous_keys), current_keys())
+                else:
+                    entry['deleted'] = []
+                    for _ in current_keys():
+                        pass
+            return entry
+        finally:
+            conn.close()
+    
+    def _read_manifest(self, backup_path: str) -> Dict[str, Any]:
+        with open(os.path.join(backup_path, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _deltas(self, base_path: str) -> List[str]:
+        """Complete deltas of a backup set, oldest first"""
+        deltas_path = os.path.join(base_path, DELTAS_DIR)
+        if not os.path.isdir(deltas_path):
+            return []
+        return [os.path.join(deltas_path, name) for name in sorted(os.listdir(deltas_path))
+                if os.path.exists(os.path.join(deltas_path, name, MANIFEST_NAME))]
     
-    def restore_from_backup(self, backup_file: str, target_db_url: str = None) -> bool:
-        """Restore database from backup file"""
+    def _latest_full_backup(self) -> Optional[str]:
+        """Newest complete full backup directory in backup_dir"""
+        candidates = [os.path.join(self.backup_dir, name) for name in os.listdir(self.backup_dir)]
+        candidates = [path for path in candidates if os.path.exists(os.path.join(path, MANIFEST_NAME))]
+        return max(candidates, key=lambda path: self._read_manifest(path)['backup_date'], default=None)
+    
+    def _backup_size(self, backup_path: str, manifest: Dict[str, Any]) -> int:
+        return sum(os.path.getsize(os.path.join(backup_path, entry[name]))
+                   for entry in manifest['tables'].values() for name in ('file', 'keys') if name in entry)
+    
+    def restore_from_backup(self, backup_file: str, target_db_url: str = None, jobs: int = BACKUP_JOBS) -> bool:
+        """Restore database from a backup set (base plus deltas up to the one given),
+        or from a legacy single-file JSON backup"""
         if not os.path.exists(backup_file):
             print(f"❌ Backup file not found: {backup_file}")
             return False
@@ -166,102 +316,28 @@ class DatabaseMigrator:
         target_url = target_db_url or self.target_db_url or self.source_db_url
         
         try:
-            # Load backup data
-            with open(backup_file, 'r', encoding='utf-8') as f:
-                backup_data = json.load(f)
-            
-            conn = psycopg2.connect(target_url)
-            cur = conn.cursor()
-            
-            # Create tables if they don't exist (using schema from models.py)
-            self._create_tables(cur)
-            
-            # Restore users
-            if 'users' in backup_data['data']:
-                users = backup_data['data']['users']
-                for user in users:
-                    # Insert or update user
-                    cur.execute("""
-                        INSERT INTO users (
-                            user_id, lang, username, first_name, name, age, gender,
-                            interest, city, bio, photos, photo_id, media_type, media_id,
-                            latitude, longitude, nd_traits, nd_symptoms, seeking_traits,
-                            likes, sent_likes, received_likes, unnotified_likes,
-                            declined_likes, ratings, total_rating, rating_count,
-                            created_at, updated_at, last_active
-                        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                        ON CONFLICT (user_id) DO UPDATE SET
-                            lang = EXCLUDED.lang,
-                            username = EXCLUDED.username,
-                            first_name = EXCLUDED.first_name,
-                            name = EXCLUDED.name,
-                            age = EXCLUDED.age,
-                            gender = EXCLUDED.gender,
-                            interest = EXCLUDED.interest,
-                            city = EXCLUDED.city,
-                            bio = EXCLUDED.bio,
-                            photos = EXCLUDED.photos,
-                            photo_id = EXCLUDED.photo_id,
-                            media_type = EXCLUDED.media_type,
-                            media_id = EXCLUDED.media_id,
-                            latitude = EXCLUDED.latitude,
-                            longitude = EXCLUDED.longitude,
-                            nd_traits = EXCLUDED.nd_traits,
-                            nd_symptoms = EXCLUDED.nd_symptoms,
-                            seeking_traits = EXCLUDED.seeking_traits,
-                            likes = EXCLUDED.likes,
-                            sent_likes = EXCLUDED.sent_likes,
-                            received_likes = EXCLUDED.received_likes,
-                            unnotified_likes = EXCLUDED.unnotified_likes,
-                            declined_likes = EXCLUDED.declined_likes,
-                            ratings = EXCLUDED.ratings,
-                            total_rating = EXCLUDED.total_rating,
-                            rating_count = EXCLUDED.rating_count,
-                            updated_at = EXCLUDED.updated_at,
-                            last_active = EXCLUDED.last_active
-                    """, (
-                        user['user_id'], user['lang'], user['username'], user['first_name'],
-                        user['name'], user['age'], user['gender'], user['interest'],
-                        user['city'], user['bio'], json.dumps(user['photos']), user['photo_id'],
-                        user['media_type'], user['media_id'], user['latitude'], user['longitude'],
-                        json.dumps(user['nd_traits']), json.dumps(user['nd_symptoms']),
-                        json.dumps(user['seeking_traits']), json.dumps(user['likes']),
-                        json.dumps(user['sent_likes']), json.dumps(user['received_likes']),
-                        json.dumps(user['unnotified_likes']), json.dumps(user['declined_likes']),
-                        json.dumps(user['ratings']), user['total_rating'], user['rating_count'],
-                        user['created_at'], user['updated_at'], user['last_active']
-                    ))
-                
-                print(f"✅ Restored {len(users)} users")
+            sources = self._backup_sources(backup_file)
             
-            # Restore feedback if exists
-            if 'feedback' in backup_data['data']:
-                feedback_items = backup_data['data']['feedback']
-                for item in feedback_items:
-                    cur.execute("""
-                        INSERT INTO feedback (id, user_id, feedback_text, created_at)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (id) DO NOTHING
-                    """, (item['id'], item['user_id'], item['feedback_text'], item['created_at']))
-                
-                print(f"✅ Restored {len(feedback_items)} feedback entries")
+            # Bring the target schema up to date (creates the tables on a fresh database)
+            upgrade_schema(target_url)
             
-            # Restore AI sessions if exists
-            if 'ai_sessions' in backup_data['data']:
-                ai_sessions = backup_data['data']['ai_sessions']
-                for session in ai_sessions:
-                    cur.execute("""
-                        INSERT INTO ai_sessions (id, user_id, session_data, created_at)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (id) DO NOTHING
-                    """, (session['id'], session['user_id'], json.dumps(session['session_data']), session['created_at']))
-                
-                print(f"✅ Restored {len(ai_sessions)} AI sessions")
-            
-            conn.commit()
-            cur.close()
-            conn.close()
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                futures = {
+                    table: pool.submit(self._restore_table, target_url, table, steps)
+                    for table, steps in sources.items()
+                }
+                failed = False
+                for table, future in futures.items():
+                    try:
+                        restored, deleted = future.result()
+                        print(f"✅ Restored {restored} {table} rows" + (f" ({deleted} deleted)" if deleted else ""))
+                    except Exception as e:
+                        failed = True
+                        logger.error(f"Restore of {table} failed: {e}")
+                        print(f"❌ Restore of {table} failed: {e}")
             
+            if failed:
+                return False
             print(f"✅ Database restore completed successfully")
             return True
             
@@ -270,70 +346,98 @@ class DatabaseMigrator:
             print(f"❌ Restore failed: {e}")
             return False
     
-    def _create_tables(self, cursor):
-        """Create database tables if they don't exist"""
-        # Users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id BIGINT PRIMARY KEY,
-                lang VARCHAR(10) DEFAULT 'ru',
-                username VARCHAR(255),
-                first_name VARCHAR(255),
-                name VARCHAR(255),
-                age INTEGER,
-                gender VARCHAR(20),
-                interest VARCHAR(20),
-                city VARCHAR(255),
-                bio TEXT,
-                photos JSON DEFAULT '[]',
-                photo_id VARCHAR(255),
-                media_type VARCHAR(50) DEFAULT 'photo',
-                media_id VARCHAR(255),
-                latitude DECIMAL(10, 8),
-                longitude DECIMAL(11, 8),
-                nd_traits JSON DEFAULT '[]',
-                nd_symptoms JSON DEFAULT '[]',
-                seeking_traits JSON DEFAULT '[]',
-                likes JSON DEFAULT '[]',
-                sent_likes JSON DEFAULT '[]',
-                received_likes JSON DEFAULT '[]',
-                unnotified_likes JSON DEFAULT '[]',
-                declined_likes JSON DEFAULT '[]',
-                ratings JSON DEFAULT '[]',
-                total_rating DECIMAL(3, 2) DEFAULT 0.0,
-                rating_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Feedback table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                feedback_text TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # AI sessions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ai_sessions (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                session_data JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def _backup_chain(self, backup_path: str) -> List[str]:
+        """Backups to replay, base first: a full backup brings all its deltas,
+        a delta brings its base and the deltas before it"""
+        manifest = self._read_manifest(backup_path)
+        if manifest.get('kind') == 'delta':
+            base_path = os.path.dirname(os.path.dirname(os.path.normpath(backup_path)))
+            deltas = self._deltas(base_path)
+            stop = [os.path.normpath(d) for d in deltas].index(os.path.normpath(backup_path))
+            return [base_path] + deltas[:stop + 1]
+        return [backup_path] + self._deltas(backup_path)
+    
+    def _backup_sources(self, backup_file: str) -> Dict[str, List[RestoreStep]]:
+        """Table name -> restore steps (NDJSON stream opener, keys to delete), for both backup formats"""
+        if os.path.isdir(backup_file) or backup_file.endswith(MANIFEST_NAME):
+            backup_path = backup_file if os.path.isdir(backup_file) else os.path.dirname(backup_file)
+            sources: Dict[str, List[RestoreStep]] = {}
+            for path in self._backup_chain(backup_path):
+                for table, entry in self._read_manifest(path)['tables'].items():
+                    if table in BACKUP_TABLES:
+                        sources.setdefault(table, []).append((
+                            partial(_open_backup_file, os.path.join(path, entry['file']), 'rb'),
+                            entry.get('deleted', []),
+                        ))
+            return sources
         
-        # Create indexes
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_city ON users(city)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_age ON users(age)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_user_id ON feedback(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_sessions_user_id ON ai_sessions(user_id)")
+        # Legacy format: one JSON document holding every table
+        with open(backup_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)['data']
+        return {
+            table: [(partial(_ndjson_buffer, rows), [])]
+            for table, rows in data.items() if table in BACKUP_TABLES
+        }
+    
+    def _restore_table(self, target_url: str, table: str, steps: List[RestoreStep]) -> Tuple[int, int]:
+        """Replay one table's backups in a single transaction: tombstones are deleted,
+        each NDJSON file is COPYed into a staging table and upserted in one statement"""
+        spec = BACKUP_TABLES[table]
+        stage = sql.Identifier(f"restore_{table}")
+        conn = psycopg2.connect(target_url)
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s
+                    ORDER BY ordinal_position
+                """, (table,))
+                columns = [row[0] for row in cur.fetchall() if row[0] not in spec['skip']]
+                
+                if spec['update']:
+                    on_conflict = sql.SQL("DO UPDATE SET {}").format(sql.SQL(', ').join(
+                        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c))
+                        for c in columns if c != spec['key']))
+                else:
+                    on_conflict = sql.SQL("DO NOTHING")
+                upsert = sql.SQL("""
+                    INSERT INTO {table} ({columns})
+                    SELECT {values} FROM {stage} s, json_populate_record(NULL::{table}, s.doc) r
+                    ON CONFLICT ({key}) {on_conflict}
+                """).format(
+                    table=sql.Identifier(table),
+                    columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+                    values=sql.SQL(', ').join(sql.SQL("r.{}").format(sql.Identifier(c)) for c in columns),
+                    stage=stage,
+                    key=sql.Identifier(spec['key']),
+                    on_conflict=on_conflict,
+                )
+                
+                cur.execute(sql.SQL("CREATE TEMP TABLE {} (doc json) ON COMMIT DROP").format(stage))
+                restored = deleted = 0
+                for open_stream, deleted_keys in steps:
+                    if deleted_keys:
+                        cur.execute(sql.SQL("DELETE FROM {} WHERE {} = ANY(%s)").format(
+                            sql.Identifier(table), sql.Identifier(spec['key'])), (deleted_keys,))
+                        deleted += cur.rowcount
+                    cur.execute(sql.SQL("TRUNCATE {}").format(stage))
+                    with open_stream() as stream:
+                        # One JSON document per line; CSV with control-character quote/delimiter copies lines verbatim
+                        cur.copy_expert(sql.SQL(
+                            "COPY {} (doc) FROM STDIN WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+                        ).format(stage), stream)
+                    cur.execute(upsert)
+                    restored += cur.rowcount
+                
+                # Explicit ids were inserted, so move the serial past them
+                if 'id' in columns:
+                    cur.execute(sql.SQL(
+                        "SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1)) FROM {} "
+                        "WHERE pg_get_serial_sequence(%s, 'id') IS NOT NULL"
+                    ).format(sql.Identifier(table)), (table, table))
+            return restored, deleted
+        finally:
+            conn.close()
 
 class PlatformMigrator:
     """Handle platform-specific migration tasks"""
@@ -356,7 +460,7 @@ class PlatformMigrator:
             },
             'ports': {
                 'main_bot': 'AUTO',
-                'keep_alive': 8000
+                'web_server': 8000  # PORT: /healthz, /readyz, /metrics and the webhook
             },
             'platform_specific': {
                 'replit': {
@@ -436,7 +540,11 @@ RUN pip install --no-cache-dir -r requirements.txt
 # Copy application code
 COPY . .
 
-# Expose port for keep-alive service
+# Precompile bytecode so restarts don't recompile main.py (~100ms) on every start
+RUN python -m compileall -q .
+
+# Ops/webhook web server (/healthz, /readyz, /metrics, Telegram webhook) listens on PORT
+ENV PORT=8000
 EXPOSE 8000
 
 # Set environment variables
@@ -456,6 +564,7 @@ CMD ["python", "main.py"]
         """Create Heroku-specific files"""
         # Procfile
         with open('Procfile', 'w') as f:
+            f.write("release: python migrations.py upgrade\n")
             f.write("worker: python main.py\n")
         
         # runtime.txt
@@ -498,6 +607,24 @@ def verify_data_integrity(db_url: str = None) -> bool:
         print(f"❌ Data integrity check failed: {e}")
         return False
 
+def _option(args: List[str], name: str, default=None):
+    """Value following `name` in args, if given"""
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return default
+
+def _positional(args: List[str]) -> Optional[str]:
+    """First argument that is neither an option nor an option's value"""
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg.startswith('--'):
+            skip = True
+        else:
+            return arg
+    return None
+
 def main():
     """Main CLI interface for migration tools"""
     import sys
@@ -507,8 +634,14 @@ def main():
 Migration Tools for Alt3r Bot
 
 Commands:
-  backup                    Create full database backup
-  restore <backup_file>     Restore from backup file
+  backup [name]             Create full database backup (compressed NDJSON per table)
+    --jobs N                  tables exported in parallel (default 3)
+    --compression C           zstd, gzip or none (default zstd if installed)
+  backup-incremental [base] Back up rows changed since the last backup of a set
+                            (default: the newest full backup), with tombstones
+  restore <backup>          Restore a backup set (a full backup replays all its deltas,
+                            a delta replays its base and deltas up to it) or a legacy .json file
+    --jobs N                  tables restored in parallel (default 3)
   export-config            Export platform configuration
   create-requirements      Create requirements.txt
   create-dockerfile        Create Dockerfile
@@ -517,23 +650,33 @@ Commands:
   
 Examples:
   python migration_tools.py backup
-  python migration_tools.py restore backups/alt3r_backup_20250803.json
+  python migration_tools.py backup-incremental
+  python migration_tools.py restore backups/alt3r_backup_20250803_120000
   python migration_tools.py export-config
         """)
         return
     
     command = sys.argv[1]
+    args = sys.argv[2:]
+    jobs = int(_option(args, '--jobs', BACKUP_JOBS))
     
     if command == 'backup':
         migrator = DatabaseMigrator()
-        migrator.create_full_backup()
+        migrator.create_full_backup(_positional(args), jobs=jobs,
+                                    compression=_option(args, '--compression', BACKUP_COMPRESSION))
+        
+    elif command == 'backup-incremental':
+        migrator = DatabaseMigrator()
+        migrator.create_incremental_backup(_positional(args), jobs=jobs,
+                                           compression=_option(args, '--compression', BACKUP_COMPRESSION))
         
     elif command == 'restore':
-        if len(sys.argv) < 3:
+        backup_file = _positional(args)
+        if not backup_file:
             print("❌ Please specify backup file")
             return
         migrator = DatabaseMigrator()
-        migrator.restore_from_backup(sys.argv[2])
+        migrator.restore_from_backup(backup_file, jobs=jobs)
         
     elif command == 'export-config':
         platform_migrator = PlatformMigrator()
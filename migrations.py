@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for Alt3r Bot
+Steps run once, in order, and are recorded in the schema_version table.
+Each step is idempotent, so databases created by the old create_all()
+startup path (or by a restore) are brought up to date safely. The bot
+itself never issues DDL; run this before starting a new release.
+
+Usage:
+    python migrations.py upgrade          # apply pending steps
+    python migrations.py upgrade --to 2   # stop after version 2
+    python migrations.py status
+"""
+
+import sys
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_TABLE = 'schema_version'
+MIGRATION_LOCK_ID = 0x616C7433  # pg_advisory_lock key so concurrent runners queue up
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _add_missing_columns(conn: Connection, table: str, columns: Dict[str, str]):
+    existing = {column['name'] for column in inspect(conn).get_columns(table)}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _initial_schema(conn: Connection):
+    """Tables as defined in models.py; existing tables are left untouched"""
+    from models import Base
+    Base.metadata.create_all(bind=conn)
+
+
+def _late_columns(conn: Connection):
+    """Columns added to models.py after tables were first created by database.py's schema"""
+    _add_missing_columns(conn, 'users', {
+        'username': 'VARCHAR(100)',
+        'first_name': 'VARCHAR(100)',
+        'city_slug': 'VARCHAR(100)',
+        'photo_id': 'VARCHAR(200)',
+        'media_type': "VARCHAR(20) DEFAULT 'photo'",
+        'media_id': 'VARCHAR(200)',
+        'latitude': 'FLOAT',
+        'longitude': 'FLOAT',
+        'nd_symptoms': "JSON DEFAULT '[]'",
+        'seeking_traits': "JSON DEFAULT '[]'",
+        'ratings': "JSON DEFAULT '[]'",
+        'total_rating': 'FLOAT DEFAULT 0',
+        'rating_count': 'INTEGER DEFAULT 0',
+        'last_active': 'TIMESTAMP',
+    })
+    _add_missing_columns(conn, 'feedback', {
+        'message': 'TEXT',
+        'resolved': 'BOOLEAN DEFAULT FALSE',
+    })
+
+
+def _indexes(conn: Connection):
+    """Indexes for city matching, activity stats and incremental backups"""
+    for name, column in (('ix_users_city_slug', 'city_slug'),
+                         ('ix_users_last_active', 'last_active'),
+                         ('ix_users_updated_at', 'updated_at')):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON users ({column})"))
+
+
+def _bigint_user_ids(conn: Connection):
+    """Telegram user ids no longer fit in 32 bits (SQLite integers are already 64-bit)"""
+    if conn.dialect.name != 'postgresql':
+        return
+    for table in ('users', 'feedback', 'ai_sessions'):
+        column = next(c for c in inspect(conn).get_columns(table) if c['name'] == 'user_id')
+        if column['type'].__visit_name__ != 'BIGINT':
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN user_id TYPE BIGINT"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'initial_schema', _initial_schema),
+    Migration(2, 'late_columns', _late_columns),
+    Migration(3, 'indexes', _indexes),
+    Migration(4, 'bigint_user_ids', _bigint_user_ids),
+]
+HEAD = MIGRATIONS[-1].version
+
+
+def _engine(bind: Union[Engine, str, None]) -> Tuple[Engine, bool]:
+    """(engine, whether we created it and must dispose of it)"""
+    if bind is None:
+        from models import engine
+        return engine, False
+    if isinstance(bind, str):
+        return create_engine(bind), True
+    return bind, False
+
+
+def _applied_versions(conn: Connection) -> Set[int]:
+    return {row[0] for row in conn.execute(text(f"SELECT version FROM {SCHEMA_VERSION_TABLE}"))}
+
+
+def upgrade(bind: Union[Engine, str, None] = None, target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations up to `target` (default: all); returns the ones applied"""
+    engine, owned = _engine(bind)
+    applied = []
+    try:
+        with engine.connect() as conn:
+            locking = conn.dialect.name == 'postgresql'
+            if locking:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': MIGRATION_LOCK_ID})
+                conn.commit()
+            try:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+                    "version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+                ))
+                done = _applied_versions(conn)
+                conn.commit()
+
+                for migration in MIGRATIONS:
+                    if migration.version in done or (target is not None and migration.version > target):
+                        continue
+                    started = time.monotonic()
+                    with conn.begin():
+                        migration.apply(conn)
+                        conn.execute(
+                            text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name, applied_at) "
+                                 "VALUES (:version, :name, :applied_at)"),
+                            {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()}
+                        )
+                    applied.append(migration)
+                    logger.info(f"✅ Migration {migration.version:03d} {migration.name} applied "
+                                f"in {time.monotonic() - started:.2f}s")
+            finally:
+                if locking:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': MIGRATION_LOCK_ID})
+                    conn.commit()
+    finally:
+        if owned:
+            engine.dispose()
+    return applied
+
+
+def current_version(bind: Union[Engine, str, None] = None) -> Optional[int]:
+    """Highest applied migration, or None if the database was never migrated"""
+    engine, owned = _engine(bind)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")).scalar()
+    except DBAPIError:
+        return None
+    finally:
+        if owned:
+            engine.dispose()
+
+
+def check_schema(bind: Union[Engine, str, None] = None) -> bool:
+    """Startup check (one SELECT, no DDL): warn if migrations are pending"""
+    version = current_version(bind)
+    if version is not None and version >= HEAD:
+        return True
+    logger.warning(f"⚠️ Database schema is at version {version or 0}, this release expects {HEAD} - "
+                   f"run 'python migrations.py upgrade'")
+    return False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Alt3r database schema migrations")
+    sub = parser.add_subparsers(dest='command', required=True)
+    up = sub.add_parser('upgrade', help="apply pending migrations")
+    up.add_argument('--to', type=int, help="stop after this version")
+    sub.add_parser('status', help="show applied and pending migrations")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command == 'upgrade':
+        applied = upgrade(target=args.to)
+        print(f"✅ Schema at version {current_version()} ({len(applied)} migration(s) applied)")
+        return 0
+
+    version = current_version() or 0
+    for migration in MIGRATIONS:
+        mark = '✅' if migration.version <= version else '⏳'
+        print(f"{mark} {migration.version:03d} {migration.name}")
+    return 0 if version >= HEAD else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 """
 Database models for Alt3r Bot
-PostgreSQL models using SQLAlchemy
+PostgreSQL models using SQLAlchemy; SQLite (file or in-memory) is supported
+for local benchmarking, load tests and CI
 """
 
 import os
+import json
+import threading
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text, JSON, Float, ForeignKey
+from sqlalchemy import create_engine, event, Column, BigInteger, Integer, String, Boolean, DateTime, Text, JSON, Float, ForeignKey
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.dialects.postgresql import ARRAY
 
 Base = declarative_base()
@@ -18,7 +23,7 @@ class User(Base):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, unique=True, nullable=False, index=True)
+    user_id = Column(BigInteger, unique=True, nullable=False, index=True)
     lang = Column(String(5), default='ru')
     username = Column(String(100))
     first_name = Column(String(100))
@@ -27,7 +32,7 @@ class User(Base):
     gender = Column(String(10))  # male, female, other
     interest = Column(String(10))  # male, female, both
     city = Column(String(100))
-    city_slug = Column(String(100))  # ASCII/English key for consistent city matching
+    city_slug = Column(String(100), index=True)  # ASCII/English key for consistent city matching
     bio = Column(Text)
     
     # Photo storage - array of Telegram file IDs
@@ -59,8 +64,8 @@ class User(Base):
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    last_active = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # incremental backup watermark
+    last_active = Column(DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f"<User(user_id={self.user_id}, name='{self.name}')>"
@@ -69,7 +74,7 @@ class Feedback(Base):
     __tablename__ = 'feedback'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False, index=True)
     message = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     resolved = Column(Boolean, default=False)
@@ -81,7 +86,7 @@ class AISession(Base):
     __tablename__ = 'ai_sessions'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False, index=True)
     session_date = Column(DateTime, default=datetime.utcnow)
     message_count = Column(Integer, default=0)
     
@@ -91,27 +96,82 @@ class AISession(Base):
 # Database connection
 DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable not set")
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=30,              # Increased pool size for maximum concurrency
-    max_overflow=70,           # Higher overflow for peak usage
-    pool_recycle=1200,         # Recycle every 20 minutes for optimal performance
-    pool_pre_ping=True,        # Validate connections before use (prevents SSL errors)
-    pool_timeout=5,            # Even faster timeout for getting connections
-    echo=False,
-    connect_args={
-        "connect_timeout": 3,   # Ultra-fast connection timeout
-        "application_name": "alt3r_bot_ultra_optimized",
-        "options": "-c statement_timeout=8s"  # Fast query timeout
+    raise ValueError("DATABASE_URL environment variable not set "
+                     "(postgresql://... in production, sqlite:///alt3r.db or sqlite:// for local runs)")
+
+def _json_serializer(value):
+    """JSON columns keep Cyrillic and emoji readable on both backends"""
+    return json.dumps(value, ensure_ascii=False)
+
+class _SerializedStaticPool(StaticPool):
+    """StaticPool that lends its single connection to one checkout at a time.
+
+    The loop thread and asyncio.to_thread workers share the in-memory database;
+    without this, concurrent sessions interleave BEGIN/COMMIT/ROLLBACK on the one
+    sqlite3 connection. The lock is taken before the pool hands out the record,
+    so it has to live here rather than in checkout/checkin events.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+
+    def _do_get(self):
+        self._lock.acquire()
+        try:
+            return super()._do_get()
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def _do_return_conn(self, record):
+        self._lock.release()
+
+def _create_sqlite_engine(url):
+    """SQLite engine: one shared, serialized connection for in-memory databases, WAL for files"""
+    in_memory = url.database in (None, '', ':memory:')
+    options = {
+        'echo': False,
+        'json_serializer': _json_serializer,
+        # Handlers run DB calls from the event loop thread and from asyncio.to_thread workers
+        'connect_args': {'check_same_thread': False, 'timeout': 15},
     }
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    if in_memory:
+        options['poolclass'] = _SerializedStaticPool  # every session must see the same in-memory database
+    sqlite_engine = create_engine(url, **options)
+
+    @event.listens_for(sqlite_engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 
-def create_tables():
-    """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    return sqlite_engine
+
+def _create_postgres_engine(url):
+    return create_engine(
+        url,
+        pool_size=30,              # Increased pool size for maximum concurrency
+        max_overflow=70,           # Higher overflow for peak usage
+        pool_recycle=1200,         # Recycle every 20 minutes for optimal performance
+        pool_pre_ping=True,        # Validate connections before use (prevents SSL errors)
+        pool_timeout=5,            # Even faster timeout for getting connections
+        echo=False,
+        json_serializer=_json_serializer,
+        connect_args={
+            "connect_timeout": 3,   # Ultra-fast connection timeout
+            "application_name": "alt3r_bot_ultra_optimized",
+            "options": "-c statement_timeout=8s"  # Fast query timeout
+        }
+    )
+
+_url = make_url(DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == 'sqlite'
+engine = _create_sqlite_engine(_url) if IS_SQLITE else _create_postgres_engine(_url)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
     """Get database session"""
@@ -4,6 +4,7 @@ Set up your TON wallet and API credentials here
 """
 
 import os
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -43,15 +44,12 @@ def validate_payment_config():
     
     return issues
 
-# Print configuration status on import
-config_issues = validate_payment_config()
-if config_issues:
-    print("⚠️  Payment Configuration Issues:")
-    for issue in config_issues:
-        print(f"   - {issue}")
-    print("\n💡 To fix:")
-    print("   1. Get TON API key from @tonapibot")
-    print("   2. Set your TON wallet address")
-    print("   3. Update environment variables")
-else:
-    print("✅ Payment configuration looks good!")
\ No newline at end of file
+def log_payment_config():
+    """Log configuration status (called when the payment subsystem is first loaded, not on import)"""
+    logger = logging.getLogger(__name__)
+    config_issues = validate_payment_config()
+    if config_issues:
+        logger.warning("⚠️ Payment configuration issues: " + "; ".join(config_issues)
+                       + " - get a TON API key from @tonapibot and set TON_WALLET / TON_API_KEY")
+    else:
+        logger.info("✅ Payment configuration looks good!")
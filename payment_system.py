@@ -11,19 +11,14 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 import aiohttp
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, LabeledPrice
 from telegram.ext import ContextTypes
-from database_manager import DatabaseManager
+from database_manager import db_manager as db
 from translations import get_text
+from http_client import http_client
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize database
-db = DatabaseManager()
-
 class TelegramStarsPayment:
     """Handle Telegram Stars payment processing"""
     
@@ -132,7 +127,8 @@ class TONPayment:
     
     def __init__(self):
         # Import configuration
-        from payment_config import TON_WALLET_ADDRESS, TON_API_KEY, get_ton_api_base
+        from payment_config import TON_WALLET_ADDRESS, TON_API_KEY, get_ton_api_base, log_payment_config
+        log_payment_config()
         
         # TON wallet configuration
         self.ton_wallet = TON_WALLET_ADDRESS
@@ -198,36 +194,34 @@ class TONPayment:
                 "api_key": self.ton_api_key
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"TON API error: {response.status}")
-                        return False
-                    
-                    data = await response.json()
-                    
-                    if not data.get("ok"):
-                        logger.error(f"TON API response not ok: {data}")
-                        return False
-                    
-                    transactions = data.get("result", [])
+            try:
+                data = await http_client.get_json(url, params=params)
+            except aiohttp.ClientResponseError as e:
+                logger.error(f"TON API error: {e.status}")
+                return False
+            
+            if not data.get("ok"):
+                logger.error(f"TON API response not ok: {data}")
+                return False
+            
+            transactions = data.get("result", [])
+            
+            # Check for matching transaction
+            for tx in transactions:
+                in_msg = tx.get("in_msg", {})
+                if not in_msg:
+                    continue
                     
-                    # Check for matching transaction
-                    for tx in transactions:
-                        in_msg = tx.get("in_msg", {})
-                        if not in_msg:
-                            continue
-                            
-                        # Check amount (convert from nanotons)
-                        value_nanotons = int(in_msg.get("value", 0))
-                        value_tons = value_nanotons / 1000000000  # Convert to TON
-                        
-                        # Check comment
-                        message = in_msg.get("message", "")
-                        
-                        if (abs(value_tons - expected_amount) < 0.001 and  # Allow small tolerance
-                            payment_id in message):
-                            return True
+                # Check amount (convert from nanotons)
+                value_nanotons = int(in_msg.get("value", 0))
+                value_tons = value_nanotons / 1000000000  # Convert to TON
+                
+                # Check comment
+                message = in_msg.get("message", "")
+                
+                if (abs(value_tons - expected_amount) < 0.001 and  # Allow small tolerance
+                    payment_id in message):
+                    return True
             
             return False
             
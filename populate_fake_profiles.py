@@ -12,11 +12,9 @@ import os
 import json
 import random
 from datetime import datetime, timedelta
-from database_manager import DatabaseManager
+from database_manager import db_manager
 from models import User
-
-# Initialize database manager
-db_manager = DatabaseManager()
+from migrations import upgrade as upgrade_schema
 
 # Photo file paths for women's profiles (from attached assets)
 WOMEN_PHOTOS = [
@@ -292,6 +290,8 @@ def add_interactions():
 
 def main():
     """Main function to reset and populate profiles"""
+    upgrade_schema()
+    
     print("🗑️  Clearing all existing profiles...")
     clear_all_profiles()
     
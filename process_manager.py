@@ -1,146 +1,204 @@
 #!/usr/bin/env python3
 """
 Process Manager for Alt3r Bot
-Ensures only one bot instance runs at a time
+Ensures only one bot instance runs at a time.
+
+Two lock backends, picked with INSTANCE_LOCK:
+- file (default): a kernel fcntl.flock on a lock file, for single-host
+  deployments. The kernel drops the lock the moment the holder dies, so
+  there are no stale PID files to clean up and no process scans.
+- postgres: a session-level pg advisory lock, for multi-host deployments.
+  The lock is held by a dedicated connection with short TCP keepalives, so
+  the server releases it within seconds when the leader's host vanishes.
+
+With INSTANCE_STANDBY=true a second instance waits as a hot standby and
+takes over as soon as the lock is released, instead of exiting.
 """
 
 import os
-import sys
 import time
+import fcntl
 import signal
-import psutil
+import asyncio
+import hashlib
 import logging
 from pathlib import Path
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+INSTANCE_LOCK = os.getenv('INSTANCE_LOCK', 'file')  # file, postgres or none
+INSTANCE_STANDBY = os.getenv('INSTANCE_STANDBY', 'false').lower() == 'true'
+INSTANCE_LOCK_POLL = float(os.getenv('INSTANCE_LOCK_POLL', '1.0'))  # standby retry / leader check interval
+INSTANCE_LOCK_DIR = os.getenv('INSTANCE_LOCK_DIR', '/tmp')
+# Server-side keepalive for the advisory-lock session: a dead leader host is noticed within
+# idle + interval * count seconds
+INSTANCE_LOCK_KEEPALIVE = (5, 2, 3)
+
+
 class ProcessManager:
-    def __init__(self, process_name="alt3r_bot"):
+    def __init__(self, process_name="alt3r_bot", backend: str = INSTANCE_LOCK):
         self.process_name = process_name
-        self.pid_file = Path(f"/tmp/{process_name}.pid")
-        self.lock_file = Path(f"/tmp/{process_name}.lock")
-        
-    def kill_existing_instances(self):
-        """Kill any existing bot instances"""
-        killed_count = 0
-        current_pid = os.getpid()
-        
-        try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    # Skip current process
-                    if proc.info['pid'] == current_pid:
-                        continue
-                        
-                    # Check if it's a Python process running main.py
-                    if (proc.info['name'] and 'python' in proc.info['name'].lower() and
-                        proc.info['cmdline'] and any('main.py' in cmd for cmd in proc.info['cmdline'])):
-                        
-                        logger.info(f"Killing existing bot instance: PID {proc.info['pid']}")
-                        proc.kill()
-                        proc.wait(timeout=5)  # Wait up to 5 seconds for process to die
-                        killed_count += 1
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
-                except psutil.TimeoutExpired:
-                    # Force kill if graceful kill didn't work
-                    try:
-                        proc.kill()
-                        killed_count += 1
-                    except:
-                        pass
-                        
-        except Exception as e:
-            logger.error(f"Error killing existing instances: {e}")
-            
-        if killed_count > 0:
-            logger.info(f"Killed {killed_count} existing bot instance(s)")
-            time.sleep(2)  # Give processes time to fully terminate
-            
-        return killed_count
-        
-    def acquire_lock(self):
-        """Acquire exclusive lock to prevent multiple instances"""
-        try:
-            current_pid = os.getpid()
-            
-            # Check if lock already exists and if process is still running
-            if self.lock_file.exists():
-                try:
-                    with open(self.lock_file, 'r') as f:
-                        old_pid = int(f.read().strip())
-                    
-                    # If it's the same process (re-entry), allow it
-                    if old_pid == current_pid:
-                        logger.info(f"Lock already held by current process (PID: {current_pid})")
-                        return True
-                    
-                    # Check if the old process is still running
-                    if psutil.pid_exists(old_pid):
-                        logger.error(f"Another instance is already running (PID: {old_pid})")
-                        return False
-                    else:
-                        logger.info(f"Removing stale lock file (PID {old_pid} no longer exists)")
-                        self.lock_file.unlink()
-                        if self.pid_file.exists():
-                            self.pid_file.unlink()
-                            
-                except (ValueError, FileNotFoundError, OSError):
-                    # Invalid or corrupted lock file, remove it
-                    try:
-                        self.lock_file.unlink()
-                        if self.pid_file.exists():
-                            self.pid_file.unlink()
-                    except:
-                        pass
-            
-            # Kill any existing instances that might not have lock files
-            killed_count = self.kill_existing_instances()
-            
-            # Wait a moment after killing processes
-            if killed_count > 0:
-                import time
-                time.sleep(1)
-            
-            # Create new lock files
-            with open(self.lock_file, 'w') as f:
-                f.write(str(current_pid))
-                
-            with open(self.pid_file, 'w') as f:
-                f.write(str(current_pid))
-                
-            logger.info(f"Process lock acquired successfully (PID: {current_pid})")
+        self.backend = backend
+        self.lock_file = Path(INSTANCE_LOCK_DIR) / f"{process_name}.lock"
+        # Advisory lock key: stable 64-bit hash of the instance name
+        self.lock_key = int.from_bytes(hashlib.sha256(process_name.encode()).digest()[:8], 'big', signed=True)
+        self._lock_fd: Optional[int] = None
+        self._lock_conn = None
+        self._watch_task: Optional[asyncio.Task] = None
+        # Set on SIGTERM/SIGINT or lost leadership; main() waits on it and shuts down in order
+        self.shutdown_requested = asyncio.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None or self._lock_conn is not None
+
+    def acquire_lock(self) -> bool:
+        """Try once to become the running instance; False if another one holds the lock"""
+        if self.is_leader:
             return True
-            
+        try:
+            if self.backend == 'none':
+                self._lock_fd = -1
+            elif self.backend == 'postgres':
+                self._try_advisory_lock()
+            else:
+                self._try_flock()
         except Exception as e:
             logger.error(f"Failed to acquire process lock: {e}")
             return False
-    
+        if self.is_leader:
+            logger.info(f"Process lock acquired ({self.backend}, PID: {os.getpid()})")
+        return self.is_leader
+
+    async def wait_for_lock(self, standby: bool = INSTANCE_STANDBY) -> bool:
+        """Acquire the lock; as a standby, keep retrying until the current holder goes away"""
+        if self.acquire_lock():
+            self._start_watch()
+            return True
+        if not standby:
+            logger.error(f"Another instance is already running ({self.describe_holder()})")
+            return False
+
+        logger.info(f"⏸️ Standing by: another instance holds the lock ({self.describe_holder()})")
+        started = time.monotonic()
+        while not self.acquire_lock():
+            await asyncio.sleep(INSTANCE_LOCK_POLL)
+        logger.info(f"▶️ Took over as leader after {time.monotonic() - started:.1f}s standby")
+        self._start_watch()
+        return True
+
+    def describe_holder(self) -> str:
+        if self.backend == 'postgres':
+            return f"advisory lock {self.lock_key}"
+        try:
+            pid = self.lock_file.read_text().strip()
+        except OSError:
+            pid = ''
+        return f"PID {pid}" if pid else str(self.lock_file)
+
+    def _try_flock(self):
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        # PID is informational only; the flock itself is the lock
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+
+    def _try_advisory_lock(self):
+        import psycopg2
+        from sqlalchemy.engine import make_url
+
+        idle, interval, count = INSTANCE_LOCK_KEEPALIVE
+        # libpq does not understand SQLAlchemy driver suffixes such as postgresql+psycopg2://
+        dsn = make_url(os.environ['DATABASE_URL']).set(drivername='postgresql')
+        conn = psycopg2.connect(
+            dsn.render_as_string(hide_password=False),
+            application_name=f"{self.process_name}_leader",
+            connect_timeout=3,
+            keepalives=1, keepalives_idle=idle, keepalives_interval=interval, keepalives_count=count,
+        )
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                # Server-side keepalives make Postgres drop the lock when the leader's host disappears
+                cur.execute(f"SET tcp_keepalives_idle = {idle}; SET tcp_keepalives_interval = {interval}; "
+                            f"SET tcp_keepalives_count = {count}")
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+                acquired = cur.fetchone()[0]
+        except Exception:
+            conn.close()
+            raise
+        if acquired:
+            self._lock_conn = conn
+        else:
+            conn.close()
+
+    def _start_watch(self):
+        """Leader-side check that the advisory-lock session is still alive"""
+        if self.backend == 'postgres' and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while self._lock_conn is not None:
+            await asyncio.sleep(INSTANCE_LOCK_POLL)
+            conn = self._lock_conn
+            if conn is None:
+                return
+            try:
+                await asyncio.to_thread(self._ping, conn)
+            except Exception as e:
+                # The session (and with it the lock) is gone; a standby may already be leader
+                logger.error(f"❌ Lost instance leadership ({e}), shutting down")
+                self._lock_conn = None
+                self.shutdown_requested.set()
+                return
+
+    @staticmethod
+    def _ping(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+
     def release_lock(self):
         """Release the process lock"""
         try:
-            if self.lock_file.exists():
-                self.lock_file.unlink()
-            if self.pid_file.exists():
-                self.pid_file.unlink()
-            logger.info("Process lock released")
+            if self._lock_fd is not None:
+                if self._lock_fd >= 0:
+                    os.ftruncate(self._lock_fd, 0)
+                    os.close(self._lock_fd)  # closing the descriptor drops the flock
+                self._lock_fd = None
+                logger.info("Process lock released")
+            if self._lock_conn is not None:
+                conn, self._lock_conn = self._lock_conn, None
+                conn.close()  # ending the session drops the advisory lock
+                logger.info("Process lock released")
         except Exception as e:
             logger.error(f"Error releasing lock: {e}")
-    
+
     def setup_signal_handlers(self):
-        """Setup signal handlers for clean shutdown"""
-        def signal_handler(signum, frame):
+        """Setup signal handlers for clean shutdown (call from the running event loop).
+
+        SIGTERM/SIGINT only set `shutdown_requested`; main() then stops the bot
+        and releases the lock. A second signal uses the default action, so a
+        stuck shutdown can still be interrupted.
+        """
+        loop = asyncio.get_running_loop()
+
+        def signal_handler(signum):
             logger.info(f"Received signal {signum}, shutting down gracefully...")
-            self.release_lock()
-            sys.exit(0)
-        
-        signal.signal(signal.SIGTERM, signal_handler)
-        signal.signal(signal.SIGINT, signal_handler)
-        
+            loop.remove_signal_handler(signum)
+            self.shutdown_requested.set()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, signal_handler, signum)
+
         # Register cleanup on normal exit
         import atexit
         atexit.register(self.release_lock)
 
 # Global instance
-process_manager = ProcessManager("alt3r_bot")
\ No newline at end of file
+process_manager = ProcessManager("alt3r_bot")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-update SQL accounting for Alt3r Bot
+Counts statements and DB time for each processed update (via a ContextVar
+scope opened by the update processor), tags them with the handler and
+callback route that issued them, and warns when an update exceeds the
+query budget or repeats one statement shape (the N+1 pattern).
+"""
+
+import os
+import re
+import asyncio
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from metrics import (
+    QUERY_OBSERVERS, UPDATE_QUERIES, UPDATE_DB_TIME, QUERY_BUDGET_EXCEEDED, REPEATED_QUERIES,
+    handler_in_flight,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_BUDGET = int(os.getenv('DB_QUERY_BUDGET', '20'))  # statements per update
+DB_REPEAT_THRESHOLD = int(os.getenv('DB_REPEAT_THRESHOLD', '5'))  # same shape this often = N+1 suspect
+
+_PARAM = re.compile(r"%\(\w+\)s|(?<!:):\w+|\$\d+|\?")  # not ::type casts
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Statement shape with parameters, literals and IN-lists collapsed"""
+    shape = _PARAM.sub('?', statement)
+    shape = _LITERAL.sub('?', shape)
+    shape = _LIST.sub('?', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class UpdateQueries:
+    """Statements issued while processing one update"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.handler: Optional[str] = None
+        self.route: Optional[str] = None
+        self.shapes: Counter = Counter()
+
+    @property
+    def tag(self) -> str:
+        handler = self.handler or 'unknown'
+        return f"{handler}:{self.route}" if self.route else handler
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[fingerprint(statement)] += 1
+        if self.handler is None:
+            try:
+                tagged = handler_in_flight(asyncio.current_task())
+            except RuntimeError:  # worker thread (asyncio.to_thread), no task
+                tagged = None
+            if tagged is not None:
+                self.handler = tagged[0]
+
+
+_current: ContextVar[Optional[UpdateQueries]] = ContextVar('update_queries', default=None)
+
+
+def _observe(statement: str, seconds: float):
+    scope = _current.get()
+    if scope is not None:
+        scope.record(statement, seconds)
+
+
+def current_queries() -> Optional[UpdateQueries]:
+    return _current.get()
+
+
+def set_route(route: str):
+    """Tag the current update's queries with the callback route being run"""
+    scope = _current.get()
+    if scope is not None:
+        scope.route = route
+
+
+@contextmanager
+def query_scope(budget: int = DB_QUERY_BUDGET, repeat_threshold: int = DB_REPEAT_THRESHOLD,
+                report: bool = True) -> Iterator[UpdateQueries]:
+    """Count the statements issued inside the block; checked against the budget on exit"""
+    scope = UpdateQueries()
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        if report and scope.count:
+            _report(scope, budget, repeat_threshold)
+
+
+def _report(scope: UpdateQueries, budget: int, repeat_threshold: int):
+    tag = scope.tag
+    UPDATE_QUERIES.observe(tag, value=scope.count)
+    UPDATE_DB_TIME.observe(tag, value=scope.seconds)
+    if scope.count > budget:
+        QUERY_BUDGET_EXCEEDED.inc(tag)
+        logger.warning(f"⚠️ {tag}: {scope.count} queries ({scope.seconds * 1000:.0f}ms) "
+                       f"in one update, budget is {budget}")
+    shape, repeats = scope.shapes.most_common(1)[0]
+    if repeats >= repeat_threshold:
+        REPEATED_QUERIES.inc(tag)
+        logger.warning(f"🔁 N+1 suspect in {tag}: {repeats}x {shape[:160]}")
+
+
+QUERY_OBSERVERS.append(_observe)
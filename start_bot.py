@@ -1,64 +1,51 @@
 #!/usr/bin/env python3
 """
 Safe startup script for Alt3r Bot
-Ensures only one instance runs and handles cleanup
+Reports whether another instance holds the lock, then starts the bot.
+The lock itself is taken by main.py and released by the kernel or the
+database when the holder exits, so there is nothing to kill or clean up.
 """
 
 import os
 import sys
-import time
 import subprocess
-from process_manager import process_manager
+from process_manager import process_manager, INSTANCE_STANDBY
 
 def main():
     print("🚀 Alt3r Bot Safe Startup Script")
     print("=" * 40)
-    
-    # Kill any existing instances
-    print("Step 1: Checking for existing bot instances...")
-    killed_count = process_manager.kill_existing_instances()
-    if killed_count > 0:
-        print(f"   Killed {killed_count} existing instances")
-        time.sleep(2)  # Give processes time to fully terminate
+
+    # Check for a running instance without disturbing it
+    print("Step 1: Checking for a running bot instance...")
+    if process_manager.acquire_lock():
+        process_manager.release_lock()
+        print("   No running instance found")
+    elif INSTANCE_STANDBY:
+        print(f"   Another instance is running ({process_manager.describe_holder()}), starting as standby")
     else:
-        print("   No existing instances found")
-    
-    # Clean up any stale lock files
-    print("Step 2: Cleaning up lock files...")
-    try:
-        if process_manager.lock_file.exists():
-            process_manager.lock_file.unlink()
-            print("   Removed stale lock file")
-        if process_manager.pid_file.exists():
-            process_manager.pid_file.unlink()
-            print("   Removed stale PID file")
-    except:
-        pass
-    
-    print("   Lock files cleaned")
-    
+        print(f"❌ Another instance is already running ({process_manager.describe_holder()})")
+        print("   Stop it first, or set INSTANCE_STANDBY=true to start this one as a hot standby")
+        sys.exit(1)
+
     # Start the bot
-    print("Step 3: Starting Alt3r Bot...")
+    print("Step 2: Starting Alt3r Bot...")
     try:
         # Use subprocess to start main.py
-        result = subprocess.run([sys.executable, "main.py"], 
+        result = subprocess.run([sys.executable, "main.py"],
                               cwd=os.getcwd(),
                               check=False)
-        
+
         if result.returncode == 0:
             print("✅ Bot started successfully")
         else:
             print(f"❌ Bot exited with code {result.returncode}")
-            
+
     except KeyboardInterrupt:
         print("\n⚠️  Startup interrupted by user")
-        print("Cleaning up...")
-        process_manager.release_lock()
         sys.exit(0)
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
-        process_manager.release_lock()
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Startup budget report for Alt3r Bot
+Imports the bot in fresh interpreters under `python -X importtime`, with
+sockets and database connections trapped, and reports where import time
+goes. Fails (exit 1) when the fastest of a few runs exceeds the budget, an
+import opens a network or database connection, or prints to stdout - none of
+which may happen before the bot starts serving.
+
+Usage:
+    python startup_report.py                  # import main, default budget
+    python startup_report.py --budget-ms 900 --top 25 --runs 5
+    python startup_report.py --module main --module payment_system
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import importlib.util
+from typing import Dict, List, Tuple
+
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+# Cold imports vary by a few hundred ms between runs; the budget applies to the fastest
+STARTUP_REPORT_RUNS = int(os.getenv('STARTUP_REPORT_RUNS', '3'))
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FIRST_PARTY = {os.path.splitext(name)[0] for name in os.listdir(ROOT) if name.endswith('.py')}
+
+# Runs in the child interpreter: trap I/O, capture stdout, import the module
+_PROBE = r'''
+import io, sys, json, socket, sqlite3, contextlib, traceback
+
+io_events = []
+
+def _where():
+    frames = [f for f in traceback.extract_stack()[:-2] if '<frozen' not in f.filename]
+    return [f"{f.filename.rsplit('/', 1)[-1]}:{f.lineno} in {f.name}" for f in frames[-4:]]
+
+def _blocked(kind):
+    def trap(*args, **kwargs):
+        io_events.append({'kind': kind, 'where': _where()})
+        raise OSError(f"{kind} during import")
+    return trap
+
+socket.socket.connect = _blocked('socket connect')
+socket.socket.connect_ex = _blocked('socket connect')
+socket.getaddrinfo = _blocked('DNS lookup')
+sqlite3.dbapi2.connect = _blocked('database connection')  # DATABASE_URL is forced to sqlite://
+
+captured = io.StringIO()
+error = None
+with contextlib.redirect_stdout(captured):
+    try:
+        __import__(sys.argv[1])
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+sys.__stdout__.write(json.dumps({'io': io_events, 'stdout': captured.getvalue(), 'error': error}))
+'''
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) rows from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def probe(module: str) -> Dict:
+    env = dict(os.environ)
+    # Never touch a real database or Telegram while measuring
+    env['DATABASE_URL'] = 'sqlite://'
+    env.setdefault('TELEGRAM_BOT_TOKEN', '0:startup-report')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE, module],
+                            capture_output=True, text=True, env=env,
+                            cwd=ROOT)
+    try:
+        report = json.loads(result.stdout)
+    except ValueError:
+        report = {'io': [], 'stdout': result.stdout, 'error': f"probe failed (exit {result.returncode})"}
+    report['rows'] = parse_importtime(result.stderr)
+    return report
+
+
+def stale_bytecode(modules: List[str]) -> List[str]:
+    """First-party modules that will be compiled from source on import (no up-to-date .pyc)"""
+    stale = []
+    for module in modules:
+        source = os.path.join(ROOT, f"{module}.py")
+        cached = importlib.util.cache_from_source(source)
+        if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(source):
+            stale.append(module)
+    return stale
+
+
+def import_ms(module: str, report: Dict) -> float:
+    """Cumulative import time of `module` in one probe, in ms"""
+    return next((cumulative for name, _, cumulative, depth in report['rows']
+                 if name == module and depth == 0), 0) / 1000
+
+
+def print_report(module: str, reports: List[Dict], top: int, budget_ms: float) -> List[str]:
+    report = min(reports, key=lambda r: import_ms(module, r))
+    rows = report['rows']
+    total = import_ms(module, report)
+    failures = []
+
+    runs = ', '.join(f"{import_ms(module, r):.0f}" for r in reports)
+    print(f"\n📦 import {module}: {total:.0f}ms fastest of {len(reports)} runs ({runs}ms), budget {budget_ms:.0f}ms")
+    print(f"\n{'cumulative ms':>14}{'self ms':>9}  module (top {top} by cumulative time)")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    own = sorted((r for r in rows if r[0] in FIRST_PARTY), key=lambda r: -r[1])
+    print(f"\n{'self ms':>14}  first-party module")
+    for name, self_us, _, _ in own[:top]:
+        print(f"{self_us / 1000:>14.1f}  {name}")
+
+    stale = stale_bytecode([r[0] for r in own])
+    if stale:
+        # Not a failure (the first import writes the .pyc) unless bytecode writing is disabled
+        print(f"\n⚠️ Compiled from source on import (no up-to-date .pyc): {', '.join(stale)}"
+              f"\n   Run 'python -m compileall -q .' at build time, especially with PYTHONDONTWRITEBYTECODE set")
+
+    if total > budget_ms:
+        failures.append(f"import took {total:.0f}ms, budget is {budget_ms:.0f}ms")
+    # Errors, I/O and output count in every run, not just the fastest
+    for failure in dict.fromkeys(f for r in reports for f in probe_failures(r)):
+        failures.append(failure)
+    return failures
+
+
+def probe_failures(report: Dict) -> List[str]:
+    failures = []
+    if report.get('error'):
+        failures.append(f"import failed: {report['error']}")
+    for event in report['io']:
+        failures.append(f"{event['kind']} at import: {' <- '.join(reversed(event['where']))}")
+    if report['stdout'].strip():
+        failures.append(f"printed at import: {report['stdout'].strip()[:200]!r}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure Alt3r import time and check for import-time I/O")
+    parser.add_argument('--module', action='append', help="module to import (repeatable, default main)")
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=STARTUP_REPORT_RUNS,
+                        help="fresh-interpreter imports per module; the budget applies to the fastest")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module in args.module or ['main']:
+        reports = [probe(module) for _ in range(max(1, args.runs))]
+        failures += print_report(module, reports, args.top, args.budget_ms)
+
+    if failures:
+        print("\n❌ Startup budget violations:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\n✅ Within startup budget, no I/O or output at import")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
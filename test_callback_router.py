@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the callback router: the route table in main.py must send every
+callback_data to the same branch the old handle_callback if/elif chain did
+"""
+
+import os
+import pytest
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:test')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from callback_router import CallbackRouter, CallbackArgumentError
+from main import callback_router
+
+# The old handle_callback chain, in its original order: ('=', data) for
+# `data == ...` branches, ('^', prefix) for `data.startswith(...)` branches
+OLD_CHAIN = [
+    ('=', "view_profile"), ('=', "browse_profiles"), ('=', "browse_all_profiles"),
+    ('=', "change_photo"), ('=', "change_bio"), ('=', "change_name"), ('=', "change_city"),
+    ('=', "change_city_setting"), ('=', "my_likes"), ('=', "profile_settings"), ('=', "feedback"),
+    ('=', "statistics"), ('=', "support_project"), ('=', "back_to_menu"),
+    ('^', "like_back_"), ('^', "like_incoming_"), ('^', "like_"),
+    ('^', "pass_incoming_"), ('^', "pass_"),
+    ('=', "prev_profile"), ('=', "next_profile"), ('=', "no_action"), ('=', "continue_browsing"),
+    ('^', "send_message_"), ('^', "send_video_"), ('^', "view_match_profile_"),
+    ('^', "view_incoming_profile_"), ('^', "like_back_"), ('^', "decline_like_"),
+    ('=', "view_mutual_matches"), ('=', "view_incoming_likes"), ('=', "prev_mutual_match"),
+    ('=', "next_mutual_match"), ('=', "manage_symptoms"), ('=', "manage_symptoms_detailed"),
+    ('=', "add_nd_traits"),
+    ('^', "toggle_trait_"), ('^', "toggle_symptom_"), ('^', "reg_trait_"), ('^', "reg_symptom_"),
+    ('=', "reg_traits_done"), ('=', "reg_traits_skip"), ('=', "reg_symptoms_done"),
+    ('=', "reg_symptoms_skip"), ('=', "reg_traits_back"), ('=', "reg_symptoms_back"),
+    ('=', "save_traits"), ('=', "save_symptoms"), ('=', "search_by_traits"), ('=', "next_nd_result"),
+    ('=', "pass_nd_profile"), ('=', "compatibility_search"), ('=', "recommendations"),
+    ('=', "next_compatibility"), ('=', "prev_compatibility"), ('=', "pass_compatibility"),
+    ('=', "next_recommendation"), ('=', "pass_recommendation"), ('=', "next_incoming_like"),
+    ('^', "report_user_"), ('^', "report_reason_"),
+    ('=', "admin_panel"), ('=', "admin_reports"), ('=', "admin_users"),
+    ('^', "interest_"),
+    ('=', "recreate_profile"), ('=', "confirm_recreate"), ('=', "reset_matches"),
+    ('=', "confirm_reset_matches"), ('=', "confirm_delete"), ('=', "feedback_complaint"),
+    ('=', "feedback_suggestion"), ('=', "feedback_support"), ('=', "rate_app"),
+    ('=', "change_language"), ('=', "change_interest_setting"), ('=', "delete_account"),
+    ('=', "detailed_stats"), ('=', "continue_profile"), ('=', "browse_anyway"),
+    ('=', "browse_all_unfiltered"),
+    ('^', "lang_"), ('^', "rate_app_"),
+    ('=', "payment_method_stars"), ('=', "payment_method_ton"),
+    ('^', "stars_"), ('^', "ton_"), ('^', "check_ton_"),
+]
+
+# Exact branches the old chain never reached: `pass_` matched them first.
+# The router checks exact routes first, so these now reach their handlers.
+SHADOWED_BY_PASS = {"pass_nd_profile", "pass_compatibility", "pass_recommendation"}
+
+# Sample arguments for each parameterized route
+SAMPLE_ARGS = {
+    "report_reason_": "fake_profile_410177871",
+    "lang_": "ru",
+    "rate_app_": "5",
+    "stars_": "100",
+    "ton_": "1",
+    "check_ton_": "abc123",
+    "interest_": "friendship",
+    "toggle_trait_": "adhd",
+    "toggle_symptom_": "sensory_overload",
+    "reg_trait_": "autism",
+    "reg_symptom_": "burnout",
+}
+
+
+def old_route(data):
+    """Name of the branch the old if/elif chain took for `data`, as the router names it"""
+    for kind, key in OLD_CHAIN:
+        if kind == '=' and data == key:
+            return key
+        if kind == '^' and data.startswith(key):
+            return f"{key}*"
+    return None
+
+
+def sample_callbacks():
+    for kind, key in OLD_CHAIN:
+        yield key if kind == '=' else key + SAMPLE_ARGS.get(key, "410177871")
+
+
+@pytest.mark.parametrize("data", sorted(set(sample_callbacks())))
+def test_route_table_matches_old_chain(data):
+    resolved = callback_router.resolve(data)
+    assert resolved is not None, f"{data} is not routed"
+    expected = data if data in SHADOWED_BY_PASS else old_route(data)
+    assert resolved[0].name == expected
+
+
+def test_shadowed_exact_routes_win_over_prefix():
+    for data in SHADOWED_BY_PASS:
+        assert old_route(data) == "pass_*"
+        assert callback_router.resolve(data)[0].name == data
+
+
+def test_longest_prefix_wins():
+    assert callback_router.resolve("like_back_7")[0].name == "like_back_*"
+    assert callback_router.resolve("like_incoming_7")[0].name == "like_incoming_*"
+    assert callback_router.resolve("like_7")[0].name == "like_*"
+    assert callback_router.resolve("pass_incoming_7")[0].name == "pass_incoming_*"
+    assert callback_router.resolve("check_ton_7")[0].name == "check_ton_*"
+    assert callback_router.resolve("rate_app")[0].name == "rate_app"
+    assert callback_router.resolve("rate_app_4")[0].name == "rate_app_*"
+
+
+def test_unknown_callback_is_not_routed():
+    assert callback_router.resolve("definitely_not_a_route") is None
+    assert callback_router.resolve("") is None
+
+
+def test_typed_arguments():
+    route, args = callback_router.resolve("like_410177871")
+    assert args == [410177871]
+    route, args = callback_router.resolve("report_reason_fake_profile_42")
+    assert args == ["fake_profile", 42]
+    route, args = callback_router.resolve("toggle_symptom_sensory_overload")
+    assert args == ["sensory_overload"]
+
+
+def test_malformed_arguments_raise():
+    with pytest.raises(CallbackArgumentError):
+        callback_router.resolve("like_abc")
+    with pytest.raises(CallbackArgumentError):
+        callback_router.resolve("report_reason_42")
+    with pytest.raises(CallbackArgumentError):
+        callback_router.resolve("report_reason__42")
+
+
+def test_prefix_registration_order_does_not_matter():
+    async def handler(*args):
+        return args
+
+    router = CallbackRouter()
+    router.add_prefix("like_", handler, int)
+    router.add_prefix("like_back_", handler, int)
+    router.add_exact("like_all", handler)
+    assert router.resolve("like_back_1")[0].name == "like_back_*"
+    assert router.resolve("like_1")[0].name == "like_*"
+    assert router.resolve("like_all")[0].name == "like_all"
+    with pytest.raises(CallbackArgumentError):
+        router.resolve("like_")
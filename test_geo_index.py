@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the geo index: radius and nearest-first queries, before and after
+incremental updates, must agree with a brute-force haversine scan
+"""
+
+import math
+import random
+
+import pytest
+
+from geo_index import (
+    GeoIndex, NO_BAND, PRIORITY_BANDS_KM, batch_distances_km, distance_band, haversine_km,
+)
+
+RADII_KM = (5, 25, 100, 500, 2000, 20000)
+
+
+def random_points(rng, count, start_id=1):
+    points = {}
+    for user_id in range(start_id, start_id + count):
+        if rng.random() < 0.7:
+            # Clustered around a few cities so the small radii have hits
+            lat, lon = rng.choice([(55.75, 37.62), (52.23, 21.01), (-33.87, 151.21), (64.15, -21.94)])
+            points[user_id] = (lat + rng.gauss(0, 0.3), lon + rng.gauss(0, 0.3))
+        else:
+            points[user_id] = (math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180))
+    return points
+
+
+def brute_force(points, lat, lon, radius_km, exclude=()):
+    distances = sorted(
+        (haversine_km(lat, lon, plat, plon), user_id)
+        for user_id, (plat, plon) in points.items()
+        if user_id not in exclude
+    )
+    return [(distance, user_id) for distance, user_id in distances if distance <= radius_km]
+
+
+def assert_same(found, expected, radius_km):
+    # Points within rounding distance of the boundary may land on either side
+    tolerance = 1e-6 * max(radius_km, 1.0)
+    found_ids = {user_id for _, user_id in found}
+    expected_ids = {user_id for _, user_id in expected}
+    for distance, user_id in expected:
+        if radius_km - distance > tolerance:
+            assert user_id in found_ids, f"missing user {user_id} at {distance:.3f}km"
+    for distance, user_id in found:
+        assert user_id in expected_ids or distance - radius_km < tolerance, f"extra user {user_id}"
+
+    distances = [distance for distance, _ in found]
+    assert distances == sorted(distances), "results are not nearest first"
+    exact = {user_id: distance for distance, user_id in expected}
+    for distance, user_id in found:
+        if user_id in exact:
+            assert distance == pytest.approx(exact[user_id], abs=1e-6)
+
+
+def check_queries(index, points, rng, queries=40):
+    for _ in range(queries):
+        lat, lon = points[rng.choice(list(points))] if rng.random() < 0.5 else (
+            rng.uniform(-90, 90), rng.uniform(-180, 180))
+        exclude = set(rng.sample(list(points), 5))
+        everyone = brute_force(points, lat, lon, math.inf, exclude)
+        for radius in RADII_KM:
+            found = index.within(lat, lon, radius, exclude=exclude)
+            assert_same(found, [(d, u) for d, u in everyone if d <= radius], radius)
+
+
+def test_within_matches_brute_force():
+    rng = random.Random(1)
+    points = random_points(rng, 2000)
+    index = GeoIndex()
+    index.load((user_id, lat, lon) for user_id, (lat, lon) in points.items())
+    assert len(index) == len(points)
+    check_queries(index, points, rng)
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(2)
+    points = random_points(rng, 1000)
+    index = GeoIndex()
+    index.load((user_id, lat, lon) for user_id, (lat, lon) in points.items())
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        nearest = index.within(lat, lon, 20038)[:5]
+        expected = brute_force(points, lat, lon, 20038)[:5]
+        assert [user_id for _, user_id in nearest] == [user_id for _, user_id in expected]
+
+
+@pytest.mark.parametrize("rebuild_threshold", [10_000, 16])
+def test_within_after_updates(rebuild_threshold):
+    # A high threshold keeps every change in the pending buffer; a low one rebuilds often
+    rng = random.Random(3)
+    points = random_points(rng, 1500)
+    index = GeoIndex(rebuild_threshold=rebuild_threshold)
+    index.load((user_id, lat, lon) for user_id, (lat, lon) in points.items())
+
+    ids = list(points)
+    for user_id in rng.sample(ids, 300):  # moves
+        lat, lon = points[user_id]
+        points[user_id] = (max(-90.0, min(90.0, lat + rng.gauss(0, 2))), lon + rng.gauss(0, 2))
+        index.upsert(user_id, *points[user_id])
+    for user_id in rng.sample(ids, 200):  # removals, including via missing coordinates
+        points.pop(user_id, None)
+        if rng.random() < 0.5:
+            index.remove(user_id)
+        else:
+            index.upsert(user_id, None, None)
+    points.update(random_points(rng, 300, start_id=10_000))  # new users
+    for user_id in range(10_000, 10_300):
+        index.upsert(user_id, *points[user_id])
+
+    assert len(index) == len(points)
+    assert all(user_id in index for user_id in points)
+    check_queries(index, points, rng)
+
+
+def test_within_bands_uses_priority_bands():
+    rng = random.Random(4)
+    points = random_points(rng, 500)
+    index = GeoIndex()
+    index.load((user_id, lat, lon) for user_id, (lat, lon) in points.items())
+    lat, lon = 55.75, 37.62
+    banded = index.within_bands(lat, lon)
+    assert [(d, u) for _, d, u in banded] == index.within(lat, lon, PRIORITY_BANDS_KM[-1])
+    assert all(band == distance_band(distance) for band, distance, _ in banded)
+
+
+def test_batch_distances_match_haversine():
+    rng = random.Random(5)
+    points = list(random_points(rng, 300).values())
+    lats = [lat for lat, _ in points] + [None]
+    lons = [lon for _, lon in points] + [None]
+    distances, bands = batch_distances_km(55.75, 37.62, lats, lons)
+    for (lat, lon), distance, band in zip(points, distances, bands):
+        assert distance == pytest.approx(haversine_km(55.75, 37.62, lat, lon), abs=1e-6)
+        assert band == distance_band(distance)
+    assert math.isnan(distances[-1]) and bands[-1] == NO_BAND
+
+
+def test_batch_distances_fallback_is_city_precision():
+    # Candidate without coordinates falls back to its city centroid, origin is in the same spot
+    distances, bands = batch_distances_km(52.23, 21.01, [None], [None],
+                                          fallback_lats=[52.23], fallback_lons=[21.01])
+    assert distances[0] == pytest.approx(0.0)
+    assert bands[0] == 1
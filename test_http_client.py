@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Tests for the provider circuit breaker and hedged requests in http_client
+"""
+
+import asyncio
+
+import pytest
+
+import http_client as http_module
+from http_client import CircuitBreaker, CircuitOpenError, hedged_first
+
+
+@pytest.fixture
+def clock(fake_clock):
+    # Only the breaker sees the fake clock; hedging runs on the real event loop
+    return fake_clock.install(http_module)
+
+
+async def ok():
+    return 'ok'
+
+
+async def boom():
+    raise RuntimeError('provider down')
+
+
+def call(breaker, factory):
+    return asyncio.run(breaker.call(factory))
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            call(breaker, boom)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            call(breaker, boom)
+        assert breaker.state == 'closed'
+    with pytest.raises(RuntimeError):
+        call(breaker, boom)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=3)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            call(breaker, boom)
+    assert call(breaker, ok) == 'ok'
+    assert breaker.failures == 0
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            call(breaker, boom)
+    assert breaker.state == 'closed'
+
+
+def test_open_circuit_skips_the_provider(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=1, reset_timeout=60)
+    trip(breaker)
+    calls = []
+
+    async def tracked():
+        calls.append(1)
+        return 'ok'
+
+    with pytest.raises(CircuitOpenError):
+        call(breaker, tracked)
+    assert calls == []
+
+
+def test_half_open_success_closes(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=2, reset_timeout=60)
+    trip(breaker)
+    clock.now += 59.9
+    assert breaker.state == 'open'
+    clock.now += 0.1
+    assert breaker.state == 'half_open'
+    assert call(breaker, ok) == 'ok'
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=2, reset_timeout=60)
+    trip(breaker)
+    clock.now += 60
+    with pytest.raises(RuntimeError):
+        call(breaker, boom)
+    # A single failed trial re-opens for a full timeout from now
+    assert breaker.state == 'open'
+    clock.now += 59
+    assert breaker.state == 'open'
+    clock.now += 1
+    assert breaker.state == 'half_open'
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=1, reset_timeout=60)
+    trip(breaker)
+    clock.now += 60
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 'ok'
+
+        trial = asyncio.ensure_future(breaker.call(slow))
+        await asyncio.sleep(0)
+        assert not breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        release.set()
+        return await trial
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_cancelled_trial_is_not_a_failure(clock):
+    breaker = CircuitBreaker('nominatim', failure_threshold=1, reset_timeout=60)
+    trip(breaker)
+    clock.now += 60
+    failures = breaker.failures
+
+    async def scenario():
+        trial = asyncio.ensure_future(breaker.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    assert breaker.failures == failures
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+def test_hedged_first_returns_fast_primary_without_hedging():
+    started = []
+
+    def provider(name, delay, result):
+        async def run():
+            started.append(name)
+            await asyncio.sleep(delay)
+            return result
+        return run
+
+    result = asyncio.run(hedged_first([provider('a', 0, 'A'), provider('b', 0, 'B')], hedge_delay=1.0))
+    assert result == 'A'
+    assert started == ['a']
+
+
+def test_hedged_first_cancels_the_slow_call():
+    state = {}
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state['slow_cancelled'] = True
+            raise
+        return 'slow'
+
+    async def fast():
+        return 'fast'
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await hedged_first([slow, fast], hedge_delay=0.05)
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        # Checked before asyncio.run() cancels leftovers itself
+        assert state.get('slow_cancelled')
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == 'fast'
+    assert elapsed < 1
+
+
+def test_hedged_first_moves_on_after_failure_or_empty_answer():
+    async def empty():
+        return None
+
+    async def answer():
+        return 'B'
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await hedged_first([boom, empty, answer], hedge_delay=5)
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == 'B'
+    assert elapsed < 1  # no hedge timer waits: failures start the next call at once
+
+
+def test_hedged_first_returns_none_when_all_fail():
+    async def empty():
+        return None
+
+    assert asyncio.run(hedged_first([boom, empty], hedge_delay=0.01)) is None
+    assert asyncio.run(hedged_first([], hedge_delay=0.01)) is None
+
+
+def test_hedge_loser_does_not_trip_its_breaker(clock):
+    slow_breaker = CircuitBreaker('slow', failure_threshold=1)
+    fast_breaker = CircuitBreaker('fast', failure_threshold=1)
+
+    async def scenario():
+        result = await hedged_first([
+            lambda: slow_breaker.call(lambda: asyncio.sleep(10)),
+            lambda: fast_breaker.call(ok),
+        ], hedge_delay=0.01)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert slow_breaker.state == 'closed'
+    assert slow_breaker.failures == 0
+    assert fast_breaker.state == 'closed'
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Tests for the outbound rate limiter: token bucket refill, per-chat and
+notification budgets, and RetryAfter backoff
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+import message_dispatcher as dispatch_module
+from message_dispatcher import DispatchRateLimiter, TokenBucket, PRIORITY_INTERACTIVE, PRIORITY_NOTIFICATION
+
+
+@pytest.fixture
+def clock(fake_clock, monkeypatch):
+    monkeypatch.setattr(dispatch_module.random, 'uniform', lambda a, b: 0.0)
+    return fake_clock.install(dispatch_module, sleep=True)
+
+
+def send(limiter, chat_id=1, endpoint='sendMessage', priority=None, callback=None):
+    async def sent(*args, **kwargs):
+        return True
+
+    return asyncio.run(limiter.process_request(callback or sent, (), {}, endpoint,
+                                               {'chat_id': chat_id}, priority))
+
+
+def test_bucket_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Reservations queue up behind each other at 1/rate seconds apiece
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.reserve()
+    assert not bucket.idle
+    clock.now += 1.0  # two tokens back
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    clock.now += 60  # a long pause refills to capacity, not beyond
+    assert bucket.idle
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_bucket_block_holds_reservations(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.block(5)
+    assert bucket.reserve() == pytest.approx(5)
+    assert not bucket.idle
+    clock.now += 2
+    assert bucket.reserve() == pytest.approx(3)
+    # A shorter block never shortens an existing one
+    bucket.block(1)
+    assert bucket.reserve() == pytest.approx(3)
+    clock.now += 3
+    assert bucket.reserve() == 0.0
+
+
+def test_per_chat_limit(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=20, chat_rate=1, chat_burst=3)
+    for _ in range(3):
+        send(limiter, chat_id=1)
+    assert clock.sleeps == []
+    send(limiter, chat_id=1)
+    assert clock.sleeps == [pytest.approx(1.0)]
+    # Another chat has its own budget
+    send(limiter, chat_id=2)
+    assert len(clock.sleeps) == 1
+
+
+def test_non_send_calls_skip_the_chat_bucket(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=20, chat_rate=1, chat_burst=1)
+    for _ in range(5):
+        send(limiter, chat_id=1, endpoint='answerCallbackQuery')
+    assert clock.sleeps == []
+
+
+def test_notifications_use_the_smaller_budget(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=2, chat_rate=100, chat_burst=100)
+    for chat_id in range(2):
+        send(limiter, chat_id=chat_id, priority=PRIORITY_NOTIFICATION)
+    assert clock.sleeps == []
+    send(limiter, chat_id=3, priority=PRIORITY_NOTIFICATION)
+    assert clock.sleeps == [pytest.approx(0.5)]
+    # Interactive replies only draw from the global budget
+    send(limiter, chat_id=4, priority=PRIORITY_INTERACTIVE)
+    assert len(clock.sleeps) == 1
+
+
+def flood_then_ok(retry_after, floods=1):
+    calls = []
+
+    async def callback(*args, **kwargs):
+        calls.append(dispatch_module.time.monotonic())
+        if len(calls) <= floods:
+            raise RetryAfter(retry_after)
+        return True
+
+    return callback, calls
+
+
+def test_retry_after_blocks_the_chat_and_retries(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=20, chat_rate=1, chat_burst=3)
+    callback, calls = flood_then_ok(7)
+    assert send(limiter, chat_id=1, callback=callback) is True
+    assert limiter.retry_after_count == 1
+    assert len(calls) == 2
+    assert calls[1] - calls[0] == pytest.approx(7)
+    # Only the flooded chat was paused, other chats keep sending
+    assert limiter._chat_bucket(1).blocked_until == pytest.approx(calls[0] + 7)
+    assert limiter._global.blocked_until == 0.0
+
+
+def test_retry_after_blocks_concurrent_sends_to_the_chat(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=20, chat_rate=1, chat_burst=3)
+    limiter._chat_bucket(1).block(7)
+    clock.now += 3
+    send(limiter, chat_id=2)
+    assert clock.sleeps == []
+    send(limiter, chat_id=1)
+    assert clock.sleeps == [pytest.approx(4)]
+
+
+def test_retry_after_without_chat_blocks_globally(clock):
+    limiter = DispatchRateLimiter(global_rate=30, notify_rate=20, chat_rate=1, chat_burst=3)
+    callback, calls = flood_then_ok(2)
+    send(limiter, chat_id=None, endpoint='getMe', callback=callback)
+    assert calls[1] - calls[0] == pytest.approx(2)
+    assert limiter._global.blocked_until == pytest.approx(calls[0] + 2)
+
+
+def test_retry_after_gives_up_after_max_retries(clock):
+    limiter = DispatchRateLimiter(max_retries=2)
+    callback, calls = flood_then_ok(1, floods=10)
+    with pytest.raises(RetryAfter):
+        send(limiter, chat_id=1, callback=callback)
+    assert len(calls) == 3
+    assert limiter.retry_after_count == 3
+
+
+def fail_then_ok(make_error, failures=1):
+    calls = []
+
+    async def callback(*args, **kwargs):
+        calls.append(dispatch_module.time.monotonic())
+        if len(calls) <= failures:
+            raise make_error()
+        return True
+
+    return callback, calls
+
+
+def timed_out(cause):
+    """TimedOut as PTB raises it: chained to the httpx timeout"""
+    def make_error():
+        error = TimedOut()
+        error.__cause__ = cause
+        return error
+    return make_error
+
+
+def test_bad_request_is_not_retried(clock):
+    limiter = DispatchRateLimiter()
+    callback, calls = fail_then_ok(lambda: BadRequest("Message is not modified"), failures=10)
+    with pytest.raises(BadRequest):
+        send(limiter, endpoint='editMessageText', callback=callback)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_timed_out_send_is_not_retried(clock):
+    # The message may have been delivered before the response was lost
+    limiter = DispatchRateLimiter()
+    callback, calls = fail_then_ok(timed_out(httpx.ReadTimeout("read timed out")))
+    with pytest.raises(TimedOut):
+        send(limiter, endpoint='sendMessage', callback=callback)
+    assert len(calls) == 1
+
+
+def test_send_that_never_left_is_retried(clock):
+    limiter = DispatchRateLimiter()
+    callback, calls = fail_then_ok(timed_out(httpx.PoolTimeout("pool exhausted")))
+    assert send(limiter, endpoint='sendMessage', callback=callback) is True
+    assert len(calls) == 2
+
+
+def test_timed_out_edit_is_retried(clock):
+    limiter = DispatchRateLimiter()
+    callback, calls = fail_then_ok(timed_out(httpx.ReadTimeout("read timed out")))
+    assert send(limiter, endpoint='editMessageText', callback=callback) is True
+    assert len(calls) == 2
+
+
+def test_dispatcher_counts_failed_jobs():
+    async def delivered():
+        pass
+
+    async def flooded():
+        raise RetryAfter(30)
+
+    async def scenario():
+        dispatcher = dispatch_module.MessageDispatcher(workers=2)
+        await dispatcher.start()
+        dispatcher.submit(delivered)
+        dispatcher.submit(flooded)
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats['sent'], stats['failed'], stats['dropped']) == (1, 1, 0)
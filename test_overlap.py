@@ -9,7 +9,7 @@ sys.path.append('.')
 from process_manager import process_manager
 
 print("🔍 Testing overlap prevention...")
-print(f"Current PID: {process_manager.pid_file}")
+print(f"Lock file: {process_manager.lock_file}")
 
 # Try to acquire lock (should fail if main bot is running)
 if process_manager.acquire_lock():
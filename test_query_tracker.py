@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for per-update SQL accounting: statement fingerprints and the
+budget / N+1 checks run when a query scope closes
+"""
+
+import logging
+
+import pytest
+
+from query_tracker import fingerprint, query_scope, set_route, current_queries
+
+
+@pytest.mark.parametrize("statement, shape", [
+    # Bind parameters in every paramstyle the drivers use
+    ("SELECT * FROM users WHERE telegram_id = %(telegram_id_1)s", "SELECT * FROM users WHERE telegram_id = ?"),
+    ("SELECT * FROM users WHERE telegram_id = :telegram_id", "SELECT * FROM users WHERE telegram_id = ?"),
+    ("SELECT * FROM users WHERE telegram_id = $1", "SELECT * FROM users WHERE telegram_id = ?"),
+    ("SELECT * FROM users WHERE telegram_id = ?", "SELECT * FROM users WHERE telegram_id = ?"),
+    # Inlined literals, including quoted quotes and decimals
+    ("SELECT * FROM users WHERE name = 'O''Brien' AND age > 18.5", "SELECT * FROM users WHERE name = ? AND age > ?"),
+    ("SELECT * FROM users LIMIT 10 OFFSET 20", "SELECT * FROM users LIMIT ? OFFSET ?"),
+    # Whitespace and line breaks
+    ("SELECT id\n  FROM users\n\tWHERE  city_slug = ?  ", "SELECT id FROM users WHERE city_slug = ?"),
+    # Digits inside identifiers are part of the name
+    ("SELECT t2.col_1 FROM table2 t2", "SELECT t2.col_1 FROM table2 t2"),
+    # Postgres casts are not bind parameters
+    ("SELECT unnotified_likes::text FROM users WHERE id = :id", "SELECT unnotified_likes::text FROM users WHERE id = ?"),
+])
+def test_fingerprint_normalises(statement, shape):
+    assert fingerprint(statement) == shape
+
+
+def test_in_lists_of_any_length_share_a_shape():
+    shapes = {
+        fingerprint("SELECT * FROM users WHERE telegram_id IN (%(id_1_1)s)"),
+        fingerprint("SELECT * FROM users WHERE telegram_id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)"),
+        fingerprint("SELECT * FROM users WHERE telegram_id IN (?,?)"),
+        fingerprint("SELECT * FROM users WHERE telegram_id IN (1, 2, 3, 4)"),
+    }
+    assert shapes == {"SELECT * FROM users WHERE telegram_id IN (?)"}
+
+
+def test_different_statements_keep_different_shapes():
+    assert (fingerprint("SELECT * FROM users WHERE telegram_id = 1")
+            != fingerprint("SELECT * FROM likes WHERE telegram_id = 1"))
+    assert (fingerprint("UPDATE users SET bio = :bio WHERE id = :id")
+            != fingerprint("UPDATE users SET name = :name WHERE id = :id"))
+
+
+def test_scope_counts_statements_and_shapes():
+    assert current_queries() is None
+    with query_scope(report=False) as scope:
+        assert current_queries() is scope
+        for user_id in range(3):
+            scope.record(f"SELECT * FROM users WHERE telegram_id = {user_id}", 0.001)
+        scope.record("SELECT count(*) FROM likes", 0.002)
+    assert current_queries() is None
+    assert scope.count == 4
+    assert scope.seconds == pytest.approx(0.005)
+    assert scope.shapes.most_common(1)[0] == ("SELECT * FROM users WHERE telegram_id = ?", 3)
+
+
+def test_set_route_tags_the_scope():
+    set_route("like_*")  # no scope open: ignored
+    with query_scope(report=False) as scope:
+        set_route("like_*")
+    assert scope.route == "like_*"
+    scope.handler = "handle_callback"
+    assert scope.tag == "handle_callback:like_*"
+
+
+def test_report_flags_budget_and_repeats(caplog):
+    with caplog.at_level(logging.WARNING, logger='query_tracker'):
+        with query_scope(budget=5, repeat_threshold=4) as scope:
+            set_route("browse_profiles")
+            for user_id in range(6):
+                scope.record(f"SELECT * FROM users WHERE telegram_id = {user_id}", 0.001)
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("6 queries" in message and "budget is 5" in message for message in messages)
+    assert any("N+1 suspect" in message and "6x" in message for message in messages)
+
+
+def test_report_is_quiet_within_budget(caplog):
+    with caplog.at_level(logging.WARNING, logger='query_tracker'):
+        with query_scope(budget=5, repeat_threshold=4) as scope:
+            for table in ("users", "likes", "matches"):
+                scope.record(f"SELECT * FROM {table} WHERE telegram_id = 1", 0.001)
+    assert caplog.records == []
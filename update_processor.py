@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Update processor for Alt3r Bot
+Processes updates from different users concurrently while keeping each
+user's updates strictly ordered, so per-user state (context.user_data,
+ConversationHandler states) never sees interleaved handlers.
+
+PTB hands every update it takes off `update_queue` to its own task right
+away, so admission happens at the queue: AdmissionQueue only releases an
+update once the processor has room for it. Everything beyond that waits in
+the bounded queue, which in polling mode stops getUpdates until handlers
+catch up.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from query_tracker import query_scope
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update: object) -> Optional[int]:
+    """Serialization key for an update: the user, falling back to the chat"""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Run up to `max_concurrent_updates` handlers at once, one per user at a time.
+
+    Updates waiting for their user's previous update do not count against the
+    running limit; `max_pending_updates` caps how many updates may be admitted
+    (running plus waiting) so a flooding user cannot grow memory without bound.
+    The cap is enforced by AdmissionQueue, which must be the application's
+    update_queue.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: Optional[int] = None):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        self._concurrency = max_concurrent_updates
+        self._max_pending = max(max_pending_updates or max_concurrent_updates * 8, max_concurrent_updates)
+        super().__init__(self._max_pending)
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._waiters: Dict[int, int] = {}
+        self._last_seen: Dict[int, float] = {}
+        self._pruned_at = 0.0
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+        self.in_flight = 0  # admitted and not yet finished
+        self.processed = 0
+        self.last_processed: Optional[float] = None  # monotonic time the last update finished
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._concurrency
+
+    @property
+    def max_pending_updates(self) -> int:
+        return self._max_pending
+
+    @property
+    def saturated(self) -> bool:
+        """Whether new updates have to wait in the queue before being admitted"""
+        return self.in_flight >= self._max_pending
+
+    async def wait_for_capacity(self):
+        while self.saturated:
+            self._capacity.clear()
+            await self._capacity.wait()
+
+    def admit(self):
+        """Count an update as admitted; AdmissionQueue calls this when it hands one out"""
+        self.in_flight += 1
+
+    def _finish(self):
+        self.in_flight = max(self.in_flight - 1, 0)
+        if not self.saturated:
+            self._capacity.set()
+
+    @property
+    def active_users(self) -> int:
+        """Number of users with an update running or waiting"""
+        return len(self._user_locks)
+
+    def seen_within(self, key: int, seconds: float) -> bool:
+        """Whether the user sent an update in the last `seconds`"""
+        last = self._last_seen.get(key)
+        return last is not None and time.monotonic() - last <= seconds
+
+    def _mark_seen(self, key: int):
+        now = time.monotonic()
+        if len(self._last_seen) > 50000 and now - self._pruned_at > 60:
+            # Keep only the last hour of activity
+            self._pruned_at = now
+            self._last_seen = {k: t for k, t in self._last_seen.items() if now - t <= 3600}
+        self._last_seen[key] = now
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_key(update)
+        try:
+            with query_scope():
+                if key is None:
+                    async with self._running:
+                        await coroutine
+                    return
+
+                self._mark_seen(key)
+                await self.run_serialized(key, coroutine)
+        finally:
+            self._finish()
+            self.processed += 1
+            self.last_processed = time.monotonic()
+
+    async def run_serialized(self, key: int, coroutine: Awaitable[Any]) -> Any:
+        """Await `coroutine` in the user's slot, after their earlier updates and follow-ups"""
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = self._user_locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._running:
+                    return await coroutine
+        finally:
+            # Drop the lock once nobody else is queued for this user
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                del self._user_locks[key]
+
+    def backlog(self, queue: asyncio.Queue) -> int:
+        """Updates admitted and not finished, plus those still waiting in `queue`"""
+        return self.in_flight + queue.qsize()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class AdmissionQueue(asyncio.Queue):
+    """Update queue that hands out an update only when `processor` can admit it.
+
+    The application's fetcher is the only consumer, so capacity cannot shrink
+    between the wait and admit(). Defaults to buffering as many updates as the
+    processor admits.
+    """
+
+    def __init__(self, processor: PerUserUpdateProcessor, maxsize: Optional[int] = None):
+        super().__init__(maxsize=processor.max_pending_updates if maxsize is None else maxsize)
+        self.processor = processor
+
+    async def get(self):
+        await self.processor.wait_for_capacity()
+        item = await super().get()
+        if isinstance(item, Update):
+            # Anything else (PTB's stop signal) never reaches the processor
+            self.processor.admit()
+        return item
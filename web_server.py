@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Embedded web server for Alt3r Bot
+aiohttp server running on the bot's own event loop. Receives Telegram
+webhook updates (with secret-token verification and a bounded backlog)
+and serves the ops endpoints: /healthz (loop lag, update flow, DB ping,
+pool saturation), /readyz, /metrics and the status page.
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+
+from metrics import registry, CONTENT_TYPE
+from loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+# Webhook settings (overridable via environment)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()  # 'polling' or 'webhook'
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram').strip('/')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+WEB_PORT = int(os.getenv('PORT', '8000'))
+
+# Health thresholds
+HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', '1.0'))  # seconds
+HEALTH_MAX_UPDATE_STALL = float(os.getenv('HEALTH_MAX_UPDATE_STALL', '120'))  # updates pending, none finished
+HEALTH_DB_TIMEOUT = float(os.getenv('HEALTH_DB_TIMEOUT', '2.0'))
+HEALTH_DB_CACHE_SECONDS = 5.0  # reuse a DB ping result this long
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+STATUS_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Alt3r Bot</title></head>
+<body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
+    <h1>🧠 Alt3r Dating Bot</h1>
+    <p>✅ Bot is Running</p>
+</body>
+</html>
+"""
+
+
+def webhook_enabled() -> bool:
+    """Whether the bot should receive updates via webhook instead of polling"""
+    return BOT_MODE == 'webhook'
+
+
+class WebServer:
+    """aiohttp server sharing the bot's event loop"""
+
+    def __init__(self):
+        self.app = web.Application()
+        self.app.router.add_get('/', self.handle_index)
+        self.app.router.add_get('/healthz', self.handle_healthz)
+        self.app.router.add_get('/readyz', self.handle_readyz)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+        self._application = None
+        self._engine = None
+        self._secret = ''
+        self._ready = False
+        self._ready_since: Optional[float] = None
+        self._db_lock = asyncio.Lock()
+        self._db_status: Dict[str, Any] = {}
+        self._db_checked_at = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._runner is not None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def monitor(self, application, engine=None):
+        """Report health of `application` (update flow) and `engine` (DB ping, pool)"""
+        self._application = application
+        self._engine = engine
+
+    def set_ready(self, ready: bool):
+        """Mark the bot as accepting updates (True once polling/webhook is up)"""
+        self._ready = ready
+        self._ready_since = time.monotonic() if ready else None
+
+    def enable_webhook(self, application, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET):
+        """Accept Telegram updates on POST /<path> and feed them to the application"""
+        if not secret:
+            # Without it anyone who finds the URL can inject updates
+            raise ValueError("Webhook mode requires WEBHOOK_SECRET")
+        self._application = application
+        self._secret = secret
+        self.app.router.add_post(f'/{path}', self.handle_webhook)
+
+    def backlog(self) -> int:
+        """Updates admitted by the processor and not yet finished, plus those still queued"""
+        processor = self._application.update_processor
+        if hasattr(processor, 'backlog'):
+            return processor.backlog(self._application.update_queue)
+        return self._application.update_queue.qsize()
+
+    async def start(self, host: str = WEB_HOST, port: int = WEB_PORT):
+        """Bind and start serving (idempotent)"""
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Web server started on {host}:{port}")
+
+    async def stop(self):
+        """Stop serving and release the port"""
+        self._ready = False
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Web server stopped")
+
+    async def handle_index(self, request: web.Request) -> web.Response:
+        return web.Response(text=STATUS_PAGE, content_type='text/html')
+
+    def _ping_db_sync(self):
+        from sqlalchemy import text
+        with self._engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+
+    async def ping_db(self) -> Dict[str, Any]:
+        """SELECT 1 off the loop, cached for a few seconds so probes cannot load the DB"""
+        async with self._db_lock:
+            if time.monotonic() - self._db_checked_at < HEALTH_DB_CACHE_SECONDS:
+                return self._db_status
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(asyncio.to_thread(self._ping_db_sync), HEALTH_DB_TIMEOUT)
+                self._db_status = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+            except Exception as e:
+                self._db_status = {'ok': False, 'error': type(e).__name__}
+            self._db_checked_at = time.monotonic()
+            return self._db_status
+
+    def pool_status(self) -> Dict[str, Any]:
+        """Checked-out connections versus pool capacity (size + overflow)"""
+        pool = self._engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return {}
+        capacity = pool.size() + max(getattr(pool, '_max_overflow', 0), 0)
+        checked_out = pool.checkedout()
+        return {
+            'checked_out': checked_out,
+            'capacity': capacity,
+            'saturation': round(checked_out / capacity, 3) if capacity else 0.0,
+        }
+
+    async def health(self) -> Dict[str, Any]:
+        """Health report; `healthy` is False if the loop stalls, updates stop flowing or the DB is down"""
+        loop_lag = loop_monitor.loop_lag
+        checks = {'loop_lag': loop_lag <= HEALTH_MAX_LOOP_LAG}
+        report: Dict[str, Any] = {'loop_lag': round(loop_lag, 4), 'ready': self._ready}
+
+        if self._application is not None:
+            processor = self._application.update_processor
+            backlog = self.backlog()
+            last = getattr(processor, 'last_processed', None)
+            now = time.monotonic()
+            report['update_queue'] = self._application.update_queue.qsize()
+            report['updates_in_flight'] = getattr(processor, 'in_flight', None)
+            report['last_update_age'] = round(now - last, 1) if last is not None else None
+            # Idle is fine; updates admitted or waiting with nothing finished for a while is not
+            reference = max(t for t in (last, self._ready_since, 0.0) if t is not None)
+            checks['updates_flowing'] = backlog == 0 or now - reference <= HEALTH_MAX_UPDATE_STALL
+
+        if self._engine is not None:
+            report['db'] = await self.ping_db()
+            report['pool'] = self.pool_status()
+            checks['db'] = report['db'].get('ok', False)
+            checks['pool'] = report['pool'].get('saturation', 0.0) < 1.0
+
+        report['checks'] = checks
+        report['healthy'] = all(checks.values())
+        return report
+
+    async def handle_healthz(self, request: web.Request) -> web.Response:
+        report = await self.health()
+        return web.json_response(report, status=200 if report['healthy'] else 503)
+
+    async def handle_readyz(self, request: web.Request) -> web.Response:
+        return web.Response(text='ready' if self._ready else 'not ready', status=200 if self._ready else 503)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        """Verify, decode and enqueue one webhook update"""
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self._secret):
+            return web.Response(status=403)
+        if not self._ready:
+            # Starting or shutting down; Telegram will redeliver
+            return web.Response(status=503)
+
+        update_queue = self._application.update_queue
+        if self.backlog() >= WEBHOOK_QUEUE_SIZE or update_queue.full():
+            # Telegram redelivers on non-2xx, so shed load instead of buffering without limit
+            logger.warning(f"Webhook backlog full ({WEBHOOK_QUEUE_SIZE}), rejecting update")
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return web.Response(status=400)
+
+        update = Update.de_json(data, self._application.bot)
+        if update is None:
+            return web.Response(status=400)
+        try:
+            update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return web.Response(status=503)
+        return web.Response()
+
+
+def webhook_url(path: str = WEBHOOK_PATH) -> str:
+    """Full public URL Telegram should deliver updates to"""
+    return f"{WEBHOOK_URL.rstrip('/')}/{path}"
+
+
+# Global instance
+web_server = WebServer()